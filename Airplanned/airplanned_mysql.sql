@@ -3,6 +3,9 @@
 -- University Project - Bahrain Focus
 -- Following Exact Schema Diagram - CLEAN VERSION
 -- =====================================================
+-- Drops and recreates airplanned_db. To bring an existing database up to
+-- date without losing data, run: flask --app app upgrade-db
+-- =====================================================
 
 -- MySQL Workbench Forward Engineering
 SET @OLD_UNIQUE_CHECKS=@@UNIQUE_CHECKS, UNIQUE_CHECKS=0;
@@ -55,7 +58,8 @@ CREATE TABLE IF NOT EXISTS `airplanned_db`.`flights` (
   PRIMARY KEY (`flight_id`),
   UNIQUE INDEX `flight_number_UNIQUE` (`flight_number` ASC),
   INDEX `idx_origin_dest` (`origin_country` ASC, `destination_country` ASC),
-  INDEX `idx_departure_date` (`departure_date` ASC))
+  INDEX `idx_departure_date` (`departure_date` ASC),
+  INDEX `idx_updated_at` (`updated_at` ASC))
 ENGINE = InnoDB;
 
 -- -----------------------------------------------------
@@ -70,8 +74,12 @@ CREATE TABLE IF NOT EXISTS `airplanned_db`.`hotels` (
   `contact_info` VARCHAR(255) NULL,
   `price_per_night` DECIMAL(10,2) NOT NULL,
   `availability` INT NOT NULL DEFAULT 0,
+  `total_rooms` INT NULL COMMENT 'NULL until the reconciler adopts availability plus held rooms',
   `created_at` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   PRIMARY KEY (`hotel_id`),
+  UNIQUE INDEX `uq_hotel_name_location` (`hotel_name` ASC, `location` ASC),
+  INDEX `idx_updated_at` (`updated_at` ASC),
   CONSTRAINT `chk_star_rating` CHECK ((`star_rating` >= 1) AND (`star_rating` <= 5)))
 ENGINE = InnoDB;
 
@@ -84,10 +92,14 @@ CREATE TABLE IF NOT EXISTS `airplanned_db`.`car_rentals` (
   `location` VARCHAR(100) NOT NULL,
   `car_types` TEXT NOT NULL,
   `availability` INT NOT NULL DEFAULT 0,
+  `total_cars` INT NULL COMMENT 'NULL until the reconciler adopts availability plus held cars',
   `contact_info` VARCHAR(255) NULL,
   `price_per_day` DECIMAL(10,2) NOT NULL,
   `created_at` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
-  PRIMARY KEY (`rental_id`))
+  `updated_at` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`rental_id`),
+  UNIQUE INDEX `uq_company_location` (`company_name` ASC, `location` ASC),
+  INDEX `idx_updated_at` (`updated_at` ASC))
 ENGINE = InnoDB;
 
 -- -----------------------------------------------------
@@ -106,10 +118,15 @@ CREATE TABLE IF NOT EXISTS `airplanned_db`.`flight_bookings` (
   `passenger_phone` VARCHAR(20) NOT NULL,
   `booking_status` ENUM('Confirmed', 'Cancelled') NULL DEFAULT 'Confirmed',
   `payment_date` DATE NULL,
+  `group_id` CHAR(32) NULL,
   `created_at` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   PRIMARY KEY (`booking_id`),
   INDEX `fk_flight_bookings_users_idx` (`user_id` ASC),
-  INDEX `fk_flight_bookings_flights_idx` (`flight_id` ASC),
+  INDEX `idx_group_id` (`group_id` ASC),
+  INDEX `idx_updated_at` (`updated_at` ASC),
+  INDEX `fk_flight_bookings_flights_idx` (`flight_id` ASC, `booking_status` ASC),
+  INDEX `idx_pending_holds` (`payment_status` ASC, `booking_status` ASC, `created_at` ASC),
   CONSTRAINT `fk_flight_bookings_users`
     FOREIGN KEY (`user_id`)
     REFERENCES `airplanned_db`.`users` (`user_id`)
@@ -138,9 +155,12 @@ CREATE TABLE IF NOT EXISTS `airplanned_db`.`hotel_bookings` (
   `booking_date` DATE NOT NULL,
   `booking_status` ENUM('Confirmed', 'Cancelled', 'Checked-In', 'Checked-Out') NULL DEFAULT 'Confirmed',
   `created_at` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   PRIMARY KEY (`booking_id`),
   INDEX `fk_hotel_bookings_users_idx` (`user_id` ASC),
-  INDEX `fk_hotel_bookings_hotels_idx` (`hotel_id` ASC),
+  INDEX `fk_hotel_bookings_hotels_idx` (`hotel_id` ASC, `booking_status` ASC),
+  INDEX `idx_pending_holds` (`payment_status` ASC, `booking_status` ASC, `created_at` ASC),
+  INDEX `idx_updated_at` (`updated_at` ASC),
   CONSTRAINT `fk_hotel_bookings_users`
     FOREIGN KEY (`user_id`)
     REFERENCES `airplanned_db`.`users` (`user_id`)
@@ -169,9 +189,12 @@ CREATE TABLE IF NOT EXISTS `airplanned_db`.`car_bookings` (
   `booking_date` DATE NOT NULL,
   `booking_status` ENUM('Confirmed', 'Cancelled', 'Picked-Up', 'Returned') NULL DEFAULT 'Confirmed',
   `created_at` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   PRIMARY KEY (`booking_id`),
   INDEX `fk_car_bookings_users_idx` (`user_id` ASC),
-  INDEX `fk_car_bookings_rentals_idx` (`rental_id` ASC),
+  INDEX `fk_car_bookings_rentals_idx` (`rental_id` ASC, `booking_status` ASC),
+  INDEX `idx_pending_holds` (`payment_status` ASC, `booking_status` ASC, `created_at` ASC),
+  INDEX `idx_updated_at` (`updated_at` ASC),
   CONSTRAINT `fk_car_bookings_users`
     FOREIGN KEY (`user_id`)
     REFERENCES `airplanned_db`.`users` (`user_id`)
@@ -182,6 +205,68 @@ CREATE TABLE IF NOT EXISTS `airplanned_db`.`car_bookings` (
     ON DELETE CASCADE)
 ENGINE = InnoDB;
 
+-- -----------------------------------------------------
+-- Table `airplanned_db`.`payment_intents`
+-- One charge attempt; card details are never stored, only the last four digits
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `airplanned_db`.`payment_intents` (
+  `intent_id` INT NOT NULL AUTO_INCREMENT,
+  `user_id` INT NOT NULL,
+  `idempotency_key` VARCHAR(64) NOT NULL,
+  `amount` DECIMAL(10,2) NOT NULL,
+  `status` ENUM('queued', 'processing', 'succeeded', 'failed') NOT NULL DEFAULT 'queued',
+  `card_last4` CHAR(4) NOT NULL,
+  `gateway_reference` VARCHAR(100) NULL,
+  `error` VARCHAR(255) NULL,
+  `attempts` INT NOT NULL DEFAULT 0,
+  `created_at` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`intent_id`),
+  UNIQUE INDEX `idempotency_key_UNIQUE` (`user_id` ASC, `idempotency_key` ASC),
+  CONSTRAINT `fk_payment_intents_users`
+    FOREIGN KEY (`user_id`)
+    REFERENCES `airplanned_db`.`users` (`user_id`)
+    ON DELETE CASCADE)
+ENGINE = InnoDB;
+
+-- -----------------------------------------------------
+-- Table `airplanned_db`.`payments`
+-- One row per booking, pointing at the intent paying for it
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `airplanned_db`.`payments` (
+  `booking_type` ENUM('flight', 'hotel', 'car') NOT NULL,
+  `booking_id` INT NOT NULL,
+  `user_id` INT NOT NULL,
+  `intent_id` INT NOT NULL,
+  `amount` DECIMAL(10,2) NOT NULL,
+  `status` ENUM('processing', 'paid', 'failed') NOT NULL DEFAULT 'processing',
+  `paid_at` TIMESTAMP NULL,
+  `created_at` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`booking_type`, `booking_id`),
+  INDEX `fk_payments_intents_idx` (`intent_id` ASC),
+  INDEX `fk_payments_users_idx` (`user_id` ASC),
+  CONSTRAINT `fk_payments_intents`
+    FOREIGN KEY (`intent_id`)
+    REFERENCES `airplanned_db`.`payment_intents` (`intent_id`)
+    ON DELETE CASCADE,
+  CONSTRAINT `fk_payments_users`
+    FOREIGN KEY (`user_id`)
+    REFERENCES `airplanned_db`.`users` (`user_id`)
+    ON DELETE CASCADE)
+ENGINE = InnoDB;
+
+-- -----------------------------------------------------
+-- Table `airplanned_db`.`job_watermarks`
+-- High-water marks for incremental background jobs
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `airplanned_db`.`job_watermarks` (
+  `job_name` VARCHAR(64) NOT NULL,
+  `watermark` TIMESTAMP NOT NULL,
+  `updated_at` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`job_name`))
+ENGINE = InnoDB;
+
 -- -----------------------------------------------------
 -- Table `airplanned_db`.`support_tickets`
 -- -----------------------------------------------------
@@ -2478,42 +2478,110 @@ def admin_global_search():
 # app.py - AirPlanned Flight Booking System
 # Complete fixed version with car booking and hotel/car payment status functionality
 
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, make_response
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.http import is_resource_modified
 from datetime import datetime, timedelta, time
+from functools import wraps
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
 import mysql.connector
 from mysql.connector import Error
 import json
 import re
 import os
+import hashlib
+import uuid
 from decimal import Decimal
+from bulk import FILTERS as BULK_FILTERS, apply as apply_bulk, init_bulk, preview as preview_bulk
+from cache import FragmentCache
+from assets import init_assets
+from compression import CompressionMiddleware
+from config import init_config, setting
+from database import instrument, init_query_instrumentation, route_query_stats
+from fanout import QueryFanOut
+from holds import init_holds
+from imports import FEEDS, column_names, file_format, import_records, init_imports, read_records
+from metrics import init_metrics, register_cache_metrics, BOOKINGS, PAYMENTS, DB_CONNECT_SECONDS, DB_CONNECT_ERRORS
+from migrations import init_migrations
+from payments import PaymentWorkerPool, card_from_form, create_intent, fail_intent, get_intent, load_gateway
+from profiling import init_profiling
+from reconcile import init_reconcile
+from replication import DB_REPLICAS, ConnectionRouter, current_db_role, init_replication, parse_endpoints, pin_to_primary, use_primary
+from tracing import init_tracing, start_span, KIND_CLIENT
 
 app = Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY', 'airplanned-secret-key-change-in-production')
+app.secret_key = setting('SECRET_KEY', 'airplanned-secret-key-change-in-production')
+
+# Settings come from the environment or AIRPLANNED_CONFIG (`flask show-config` lists them)
+init_config(app)
+
+# Compiled template cache shared by all worker processes
+TEMPLATE_CACHE_DIR = setting('TEMPLATE_CACHE_DIR', os.path.join(app.instance_path, 'jinja_cache'))
+os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)}
+
+# Fingerprinted, precompressed static assets (build with `flask build-assets`)
+init_assets(app)
+
+# gzip/brotli for HTML, JSON, CSS and JS responses above the size threshold
+app.wsgi_app = CompressionMiddleware(app.wsgi_app)
+
+# Request/query/render spans with trace IDs in log records (TRACE_EXPORTER=file|otlp to export)
+init_tracing(app)
+
+# Per-request query counts/timings (Server-Timing header) and the slow-query log
+init_query_instrumentation(app)
+
+# Request latency, DB and booking/payment counters at /metrics
+init_metrics(app)
+
+# Opt-in per-request flame graphs (X-Profile: 1 as admin, or PROFILE_ENDPOINTS)
+init_profiling(app)
+
+# Rendered flight/hotel/car listing blocks, invalidated on admin edits and bookings
+fragment_cache = FragmentCache(ttl=setting('FRAGMENT_CACHE_TTL', 60),
+                               max_entries=setting('FRAGMENT_CACHE_SIZE', 256))
+register_cache_metrics('fragment', fragment_cache)
 
 # Database configuration
 DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': 'Root23500238',
-    'database': 'airplanned_db',
-    'port': 3307,
+    'host': setting('DB_HOST', 'localhost'),
+    'user': setting('DB_USER', 'root'),
+    'password': setting('DB_PASSWORD', 'Root23500238'),
+    'database': setting('DB_NAME', 'airplanned_db'),
+    'port': setting('DB_PORT', 3307),
     'charset': 'utf8mb4',
     'autocommit': True,
     'use_unicode': True,
-    'connect_timeout': 10
+    'connect_timeout': setting('DB_CONNECT_TIMEOUT', 10)
 }
 
+# Read-only routes go to DB_REPLICAS when configured; writes and sessions that just wrote use the primary
+db_router = ConnectionRouter(DB_CONFIG, parse_endpoints(DB_REPLICAS, DB_CONFIG['port']))
+init_replication(app, db_router)
+
 def get_db_connection():
-    """Create and return a database connection"""
+    """Create and return a database connection for the current request's role"""
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
+        role = current_db_role()
+        with DB_CONNECT_SECONDS.time(), start_span('db.connect', kind=KIND_CLIENT, attributes={'db.role': role}):
+            connection = db_router.connect(role)
         if connection.is_connected():
-            return connection
+            return instrument(connection)
     except Error as e:
-        print(f"Database connection error: {e}")
+        DB_CONNECT_ERRORS.inc()
+        app.logger.error(f"Database connection error: {e}")
         return None
 
+query_fan_out = QueryFanOut(get_db_connection)
+
+init_holds(app, get_db_connection, fragment_cache)
+init_reconcile(app, get_db_connection, fragment_cache)
+init_imports(app, get_db_connection, fragment_cache)
+init_bulk(app, get_db_connection, fragment_cache)
+init_migrations(app, get_db_connection)
+
 def convert_timedelta_to_time(td):
     """Convert timedelta to time object"""
     if td is None:
@@ -2596,6 +2664,17 @@ def process_cars_data(cars_raw):
     
     return cars
 
+def render_listing(template_name, cache_key=None, **context):
+    """Render a listing fragment, storing it in the fragment cache when a key is given
+
+    Listings read from a replica are never cached: they may predate the
+    write that last bumped the cache and would be served to everyone.
+    """
+    html = Markup(render_template(template_name, **context))
+    if cache_key is not None and current_db_role() != 'replica':
+        fragment_cache.set(cache_key, html)
+    return html
+
 # Template filters for safe time/date formatting
 @app.template_filter('format_time')
 def format_time_filter(time_obj):
@@ -2632,11 +2711,109 @@ def decimal_to_float_filter(value):
     """Template filter to convert Decimal to float"""
     return decimal_to_float(value)
 
+def warm_template_cache():
+    """Compile every template up front so the first request doesn't pay for it"""
+    compiled = 0
+    for template_name in app.jinja_env.list_templates(extensions=['html']):
+        try:
+            app.jinja_env.get_template(template_name)
+            compiled += 1
+        except Exception as e:
+            app.logger.error(f"Template warmup error in {template_name}: {e}")
+    return compiled
+
+# HTTP CACHING
+def catalog_validators(*tables):
+    """Fingerprint whole tables by their latest update and row count"""
+    def validators(cursor, **view_args):
+        columns = ', '.join(f"(SELECT MAX(updated_at) FROM {table}), (SELECT COUNT(*) FROM {table})"
+                            for table in tables)
+        cursor.execute(f"SELECT {columns}")
+        return list(cursor.fetchone())
+    return validators
+
+def upcoming_flights_validators(cursor, **view_args):
+    """Home page flights also change when the date rolls over"""
+    return catalog_validators('flights')(cursor) + [datetime.now().date()]
+
+def flight_seat_validators(cursor, flight_id):
+    """Seat map validators for the outbound and optional return flight"""
+    flight_ids = [flight_id, request.args.get('return_flight_id', flight_id, type=int)]
+    cursor.execute("""
+        SELECT (SELECT MAX(updated_at) FROM flights WHERE flight_id IN (%s, %s)),
+               (SELECT MAX(updated_at) FROM flight_bookings WHERE flight_id IN (%s, %s)),
+               (SELECT COUNT(*) FROM flight_bookings WHERE flight_id IN (%s, %s))
+    """, flight_ids * 3)
+    return list(cursor.fetchone())
+
+def conditional_get(validators):
+    """Answer GET requests with 304 Not Modified when the data behind a page hasn't changed
+
+    The ETag is derived from the validator values (MAX(updated_at), row counts),
+    the full request path and the session identity, so it is computed with one
+    cheap query and the page is only rendered when the client's copy is stale.
+    No Last-Modified is sent: MAX(updated_at) does not move when a row is
+    deleted or the user logs in or out, so If-Modified-Since alone would get
+    stale or another user's page revalidated.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method != 'GET' or '_flashes' in session:
+                return f(*args, **kwargs)
+            
+            connection = get_db_connection()
+            if not connection:
+                return f(*args, **kwargs)
+            
+            state = None
+            cursor = None
+            try:
+                cursor = connection.cursor()
+                state = validators(cursor, **kwargs)
+            except Error as e:
+                app.logger.error(f"Database error in conditional_get: {e}")
+            finally:
+                if connection.is_connected():
+                    if cursor is not None:
+                        cursor.close()
+                    connection.close()
+            
+            if state is None:
+                return f(*args, **kwargs)
+            
+            state += [request.full_path, session.get('user_id'), session.get('admin_logged_in')]
+            etag = hashlib.sha1(repr(state).encode()).hexdigest()
+            
+            if not is_resource_modified(request.environ, etag=etag):
+                response = app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                # Never tag redirects, errors or pages carrying one-off flash messages
+                if response.status_code != 200 or '_flashes' in session:
+                    return response
+            
+            response.set_etag(etag, weak=True)
+            if session.get('user_id') or session.get('admin_logged_in'):
+                response.cache_control.private = True
+            else:
+                response.cache_control.public = True
+            response.cache_control.no_cache = True
+            return response
+        return decorated_function
+    return decorator
+
 @app.route('/')
+@conditional_get(upcoming_flights_validators)
 def index():
     """Home page with flight search"""
-    connection = get_db_connection()
     origins, destinations, flights = [], [], []
+    listing_key = fragment_cache.key('flights', 'upcoming', datetime.now().date())
+    flight_listing = fragment_cache.get(listing_key)
+    if flight_listing is None:
+        # The listing is about to be cached for everyone, so read it from the primary
+        use_primary()
+    connection = get_db_connection()
     
     if connection:
         try:
@@ -2658,20 +2835,22 @@ def index():
             """)
             destinations = cursor.fetchall() or []
             
-            cursor.execute("""
-                SELECT flight_id, flight_number, origin_country, destination_country, 
-                       origin_airport, destination_airport, departure_date, 
-                       departure_time, arrival_time, aircraft_type, total_seats, 
-                       available_seats, price, airline
-                FROM flights 
-                WHERE available_seats > 0 AND departure_date >= CURDATE()
-                ORDER BY departure_date, departure_time
-                LIMIT 12
-            """)
-            flights = cursor.fetchall() or []
+            if flight_listing is None:
+                cursor.execute("""
+                    SELECT flight_id, flight_number, origin_country, destination_country, 
+                           origin_airport, destination_airport, departure_date, 
+                           departure_time, arrival_time, aircraft_type, total_seats, 
+                           available_seats, price, airline
+                    FROM flights 
+                    WHERE available_seats > 0 AND departure_date >= CURDATE()
+                    ORDER BY departure_date, departure_time
+                    LIMIT 12
+                """)
+                flights = cursor.fetchall() or []
+                flight_listing = render_listing('partials/flight_listing.html', listing_key, flights=flights)
             
         except Error as e:
-            print(f"Database error in index: {e}")
+            app.logger.error(f"Database error in index: {e}")
             flash('Error loading flight data. Please try again.', 'error')
         finally:
             if connection.is_connected():
@@ -2680,10 +2859,99 @@ def index():
     else:
         flash('Database connection unavailable. Please try again later.', 'error')
     
+    if flight_listing is None:
+        flight_listing = render_listing('partials/flight_listing.html', flights=flights)
+    
     return render_template('index.html', 
                          origins=origins, 
                          destinations=destinations, 
-                         flights=flights)
+                         flight_listing=flight_listing)
+
+def flight_search_queries(form):
+    """Outbound and (for round trips) return flight queries for a search form
+
+    Returns (outbound, inbound, errors): each query is (sql, params), inbound
+    is None for one-way searches and errors lists rejected form values.
+    """
+    origin = form.get('origin', '').strip()
+    destination = form.get('destination', '').strip()
+    departure_date = form.get('departure_date', '').strip()
+    return_date = form.get('return_date', '').strip()
+    trip_type = form.get('trip_type', 'one-way')
+    min_price = form.get('min_price', '').strip()
+    max_price = form.get('max_price', '').strip()
+    passengers = form.get('passengers', '1')
+    
+    errors = []
+    price_filters = []
+    for value, condition, label in ((min_price, 'price >= %s', 'minimum'), (max_price, 'price <= %s', 'maximum')):
+        if value:
+            try:
+                price_filters.append((condition, float(value)))
+            except ValueError:
+                errors.append(f'Invalid {label} price format')
+    
+    # Base query for outbound flights
+    outbound_query = """
+        SELECT flight_id, flight_number, origin_country, destination_country, 
+               origin_airport, destination_airport, departure_date, 
+               departure_time, arrival_time, aircraft_type, total_seats, 
+               available_seats, price, airline
+        FROM flights 
+        WHERE available_seats >= %s AND departure_date >= CURDATE()
+    """
+    outbound_params = [int(passengers)]
+    
+    if origin:
+        outbound_query += " AND origin_country = %s"
+        outbound_params.append(origin)
+    if destination:
+        outbound_query += " AND destination_country = %s"
+        outbound_params.append(destination)
+    if departure_date:
+        outbound_query += " AND departure_date = %s"
+        outbound_params.append(departure_date)
+    for condition, value in price_filters:
+        outbound_query += f" AND {condition}"
+        outbound_params.append(value)
+    
+    outbound_query += " ORDER BY departure_date, departure_time"
+    
+    # If round trip, search for return flights
+    inbound = None
+    if trip_type == 'round-trip' and return_date and origin and destination:
+        return_query = """
+            SELECT flight_id, flight_number, origin_country, destination_country, 
+                   origin_airport, destination_airport, departure_date, 
+                   departure_time, arrival_time, aircraft_type, total_seats, 
+                   available_seats, price, airline
+            FROM flights 
+            WHERE available_seats >= %s AND departure_date = %s
+            AND origin_country = %s AND destination_country = %s
+        """
+        return_params = [int(passengers), return_date, destination, origin]
+        for condition, value in price_filters:
+            return_query += f" AND {condition}"
+            return_params.append(value)
+        return_query += " ORDER BY departure_date, departure_time"
+        inbound = (return_query, return_params)
+    
+    return (outbound_query, outbound_params), inbound, errors
+
+def flash_flight_search_outcome(form, outbound_flights, return_flights):
+    """Tell the user when either leg of their search came back empty"""
+    if not outbound_flights:
+        flash('No outbound flights found matching your criteria.', 'info')
+    elif form.get('trip_type', 'one-way') == 'round-trip' and not return_flights:
+        flash('No return flights found for your selected date.', 'warning')
+
+def search_results_page(outbound_flights, return_flights):
+    """Render flight search results for the current request"""
+    return render_template('search_results.html', 
+                         outbound_flights=outbound_flights,
+                         return_flights=return_flights,
+                         trip_type=request.form.get('trip_type', 'one-way') if request.method == 'POST' else 'one-way',
+                         search_params=request.form if request.method == 'POST' else {})
 
 @app.route('/search_flights', methods=['GET', 'POST'])
 def search_flights():
@@ -2700,107 +2968,31 @@ def search_flights():
         cursor = connection.cursor()
         
         if request.method == 'POST':
-            origin = request.form.get('origin', '').strip()
-            destination = request.form.get('destination', '').strip()
-            departure_date = request.form.get('departure_date', '').strip()
-            return_date = request.form.get('return_date', '').strip()
-            trip_type = request.form.get('trip_type', 'one-way')
-            min_price = request.form.get('min_price', '').strip()
-            max_price = request.form.get('max_price', '').strip()
-            passengers = request.form.get('passengers', '1')
-            flight_class = request.form.get('class', 'economy')
-            
-            # Base query for outbound flights
-            outbound_query = """
-                SELECT flight_id, flight_number, origin_country, destination_country, 
-                       origin_airport, destination_airport, departure_date, 
-                       departure_time, arrival_time, aircraft_type, total_seats, 
-                       available_seats, price, airline
-                FROM flights 
-                WHERE available_seats >= %s AND departure_date >= CURDATE()
-            """
-            outbound_params = [int(passengers)]
+            outbound, inbound, errors = flight_search_queries(request.form)
+            for message in errors:
+                flash(message, 'error')
             
-            if origin:
-                outbound_query += " AND origin_country = %s"
-                outbound_params.append(origin)
-            if destination:
-                outbound_query += " AND destination_country = %s"
-                outbound_params.append(destination)
-            if departure_date:
-                outbound_query += " AND departure_date = %s"
-                outbound_params.append(departure_date)
-            if min_price:
-                try:
-                    outbound_query += " AND price >= %s"
-                    outbound_params.append(float(min_price))
-                except ValueError:
-                    flash('Invalid minimum price format', 'error')
-            if max_price:
-                try:
-                    outbound_query += " AND price <= %s"
-                    outbound_params.append(float(max_price))
-                except ValueError:
-                    flash('Invalid maximum price format', 'error')
-            
-            outbound_query += " ORDER BY departure_date, departure_time"
-            
-            # Execute outbound flights query
-            cursor.execute(outbound_query, outbound_params)
+            cursor.execute(*outbound)
             outbound_flights = cursor.fetchall() or []
             
-            # If round trip, search for return flights
-            if trip_type == 'round-trip' and return_date and origin and destination:
-                return_query = """
-                    SELECT flight_id, flight_number, origin_country, destination_country, 
-                           origin_airport, destination_airport, departure_date, 
-                           departure_time, arrival_time, aircraft_type, total_seats, 
-                           available_seats, price, airline
-                    FROM flights 
-                    WHERE available_seats >= %s AND departure_date = %s
-                    AND origin_country = %s AND destination_country = %s
-                """
-                return_params = [int(passengers), return_date, destination, origin]
-                
-                if min_price:
-                    try:
-                        return_query += " AND price >= %s"
-                        return_params.append(float(min_price))
-                    except ValueError:
-                        pass
-                if max_price:
-                    try:
-                        return_query += " AND price <= %s"
-                        return_params.append(float(max_price))
-                    except ValueError:
-                        pass
-                
-                return_query += " ORDER BY departure_date, departure_time"
-                
-                # Execute return flights query
-                cursor.execute(return_query, return_params)
+            if inbound:
+                cursor.execute(*inbound)
                 return_flights = cursor.fetchall() or []
             
-            if not outbound_flights:
-                flash('No outbound flights found matching your criteria.', 'info')
-            elif trip_type == 'round-trip' and not return_flights:
-                flash('No return flights found for your selected date.', 'warning')
+            flash_flight_search_outcome(request.form, outbound_flights, return_flights)
         
     except Error as e:
-        print(f"Database error in search: {e}")
+        app.logger.error(f"Database error in search: {e}")
         flash('Error searching flights. Please try again.', 'error')
     finally:
         if connection.is_connected():
             cursor.close()
             connection.close()
     
-    return render_template('search_results.html', 
-                         outbound_flights=outbound_flights,
-                         return_flights=return_flights,
-                         trip_type=request.form.get('trip_type', 'one-way') if request.method == 'POST' else 'one-way',
-                         search_params=request.form if request.method == 'POST' else {})
+    return search_results_page(outbound_flights, return_flights)
 
 @app.route('/book/<int:flight_id>')
+@conditional_get(flight_seat_validators)
 def book_flight(flight_id):
     """Flight booking page with round trip support"""
     if 'user_id' not in session:
@@ -2820,7 +3012,8 @@ def book_flight(flight_id):
         return redirect(url_for('index'))
     
     try:
-        cursor = connection.cursor()
+        # Booking pages are hot: their statements stay prepared on the pooled connection
+        cursor = connection.cursor(prepared=True)
         
         # Get outbound flight details
         cursor.execute("""
@@ -2866,7 +3059,7 @@ def book_flight(flight_id):
             return_booked_seats = [row[0] for row in cursor.fetchall()]
         
     except Error as e:
-        print(f"Database error in booking: {e}")
+        app.logger.error(f"Database error in booking: {e}")
         flash('Error loading flight details', 'error')
         return redirect(url_for('index'))
     finally:
@@ -2952,7 +3145,7 @@ def process_single_flight_booking(flight_id, selected_seats, passenger_names, pa
         return redirect(url_for('book_flight', flight_id=flight_id))
     
     try:
-        cursor = connection.cursor()
+        cursor = connection.cursor(prepared=True)
         
         # Get flight price
         cursor.execute("SELECT price FROM flights WHERE flight_id = %s", (flight_id,))
@@ -2964,6 +3157,8 @@ def process_single_flight_booking(flight_id, selected_seats, passenger_names, pa
             
         flight_price = flight_price_result[0]
         booking_ids = []
+        # Passengers booked together are paid for together
+        group_id = uuid.uuid4().hex
         
         # Create booking for each passenger
         for i, (name, email, phone, seat) in enumerate(zip(passenger_names, passenger_emails, passenger_phones, selected_seats)):
@@ -2978,6 +3173,7 @@ def process_single_flight_booking(flight_id, selected_seats, passenger_names, pa
             """, (flight_id, seat))
             
             if cursor.fetchone()[0] > 0:
+                BOOKINGS.inc(kind='flight', outcome='rejected')
                 flash(f'Seat {seat} is no longer available. Please choose another seat.', 'error')
                 return redirect(url_for('book_flight', flight_id=flight_id))
             
@@ -2985,10 +3181,10 @@ def process_single_flight_booking(flight_id, selected_seats, passenger_names, pa
             cursor.execute("""
                 INSERT INTO flight_bookings 
                 (user_id, flight_id, passenger_name, passenger_email, passenger_phone, 
-                 seat_number, total_amount, booking_status, payment_status)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                 seat_number, total_amount, booking_status, payment_status, group_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             """, (session['user_id'], flight_id, name.strip(), email.strip(), 
-                  phone.strip(), seat, flight_price, 'Confirmed', 'Pending'))
+                  phone.strip(), seat, flight_price, 'Confirmed', 'Pending', group_id))
             
             booking_ids.append(cursor.lastrowid)
         
@@ -3000,6 +3196,8 @@ def process_single_flight_booking(flight_id, selected_seats, passenger_names, pa
         """, (len(booking_ids), flight_id))
         
         connection.commit()
+        fragment_cache.bump('flights')
+        BOOKINGS.inc(kind='flight', outcome='success')
         
         if len(booking_ids) == 1:
             flash('Booking confirmed successfully. Please proceed to payment.', 'success')
@@ -3010,7 +3208,8 @@ def process_single_flight_booking(flight_id, selected_seats, passenger_names, pa
         
     except Error as e:
         connection.rollback()
-        print(f"Database error in single flight booking: {e}")
+        BOOKINGS.inc(kind='flight', outcome='error')
+        app.logger.error(f"Database error in single flight booking: {e}")
         flash('Booking failed. Please try again.', 'error')
         return redirect(url_for('book_flight', flight_id=flight_id))
     finally:
@@ -3035,7 +3234,7 @@ def process_round_trip_booking(outbound_flight_id, return_flight_id, trip_type,
         return redirect(url_for('book_flight', flight_id=outbound_flight_id))
     
     try:
-        cursor = connection.cursor()
+        cursor = connection.cursor(prepared=True)
         
         # Get flight prices
         cursor.execute("SELECT price FROM flights WHERE flight_id = %s", (outbound_flight_id,))
@@ -3055,6 +3254,8 @@ def process_round_trip_booking(outbound_flight_id, return_flight_id, trip_type,
                 return_price = return_price_result[0]
         
         booking_ids = []
+        # Both legs for every passenger form one group, paid for together
+        group_id = uuid.uuid4().hex
         
         # Create bookings for each passenger
         for i, (name, email, phone) in enumerate(zip(passenger_names, passenger_emails, passenger_phones)):
@@ -3072,6 +3273,7 @@ def process_round_trip_booking(outbound_flight_id, return_flight_id, trip_type,
                 """, (outbound_flight_id, outbound_seat))
                 
                 if cursor.fetchone()[0] > 0:
+                    BOOKINGS.inc(kind='flight', outcome='rejected')
                     flash(f'Outbound seat {outbound_seat} is no longer available.', 'error')
                     return redirect(url_for('book_flight', flight_id=outbound_flight_id))
                 
@@ -3080,10 +3282,10 @@ def process_round_trip_booking(outbound_flight_id, return_flight_id, trip_type,
                 cursor.execute("""
                     INSERT INTO flight_bookings 
                     (user_id, flight_id, passenger_name, passenger_email, passenger_phone, 
-                     seat_number, total_amount, booking_status, payment_status)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                     seat_number, total_amount, booking_status, payment_status, group_id)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                 """, (session['user_id'], outbound_flight_id, name.strip(), email.strip(), 
-                      phone.strip(), outbound_seat, total_amount, 'Confirmed', 'Pending'))
+                      phone.strip(), outbound_seat, total_amount, 'Confirmed', 'Pending', group_id))
                 
                 booking_ids.append(cursor.lastrowid)
             
@@ -3099,6 +3301,7 @@ def process_round_trip_booking(outbound_flight_id, return_flight_id, trip_type,
                     """, (return_flight_id, return_seat))
                     
                     if cursor.fetchone()[0] > 0:
+                        BOOKINGS.inc(kind='flight', outcome='rejected')
                         flash(f'Return seat {return_seat} is no longer available.', 'error')
                         return redirect(url_for('book_flight', flight_id=outbound_flight_id))
                     
@@ -3106,10 +3309,10 @@ def process_round_trip_booking(outbound_flight_id, return_flight_id, trip_type,
                     cursor.execute("""
                         INSERT INTO flight_bookings 
                         (user_id, flight_id, passenger_name, passenger_email, passenger_phone, 
-                         seat_number, total_amount, booking_status, payment_status)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                         seat_number, total_amount, booking_status, payment_status, group_id)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                     """, (session['user_id'], return_flight_id, name.strip(), email.strip(), 
-                          phone.strip(), return_seat, 0, 'Confirmed', 'Pending'))  # Total amount already included in outbound
+                          phone.strip(), return_seat, 0, 'Confirmed', 'Pending', group_id))  # Total amount already included in outbound
                     
                     booking_ids.append(cursor.lastrowid)
         
@@ -3128,13 +3331,16 @@ def process_round_trip_booking(outbound_flight_id, return_flight_id, trip_type,
             """, (len(passenger_names), return_flight_id))
         
         connection.commit()
+        fragment_cache.bump('flights')
+        BOOKINGS.inc(kind='flight', outcome='success')
         
         flash(f'{"Round trip" if trip_type == "round-trip" else "Flight"} booking confirmed successfully. Please proceed to payment.', 'success')
         return redirect(url_for('payment', booking_id=booking_ids[0]))
         
     except Error as e:
         connection.rollback()
-        print(f"Database error in round trip booking: {e}")
+        BOOKINGS.inc(kind='flight', outcome='error')
+        app.logger.error(f"Database error in round trip booking: {e}")
         flash('Booking failed. Please try again.', 'error')
         return redirect(url_for('book_flight', flight_id=outbound_flight_id))
     finally:
@@ -3144,7 +3350,7 @@ def process_round_trip_booking(outbound_flight_id, return_flight_id, trip_type,
 
 @app.route('/payment/<int:booking_id>')
 def payment(booking_id):
-    """Payment page"""
+    """Payment page for a booking and every pending booking in its group"""
     if 'user_id' not in session:
         flash('Please log in to continue', 'error')
         return redirect(url_for('login'))
@@ -3161,24 +3367,27 @@ def payment(booking_id):
             SELECT b.booking_id, b.passenger_name, b.seat_number, 
                    f.flight_number, f.origin_country, f.destination_country,
                    f.departure_date, f.departure_time, b.total_amount
-            FROM flight_bookings b
+            FROM flight_bookings anchor
+            JOIN flight_bookings b ON b.booking_id = anchor.booking_id OR b.group_id = anchor.group_id
             JOIN flights f ON b.flight_id = f.flight_id
-            WHERE b.booking_id = %s AND b.user_id = %s AND b.payment_status = 'Pending'
+            WHERE anchor.booking_id = %s AND b.user_id = %s AND b.payment_status = 'Pending'
+            ORDER BY b.booking_id
         """, (booking_id, session['user_id']))
         
-        booking_data = cursor.fetchone()
-        if not booking_data:
+        bookings = [list(row) for row in cursor.fetchall()]
+        if not bookings:
             flash('Booking not found or payment already completed', 'error')
             return redirect(url_for('dashboard'))
         
-        booking = list(booking_data)
-        
         # Convert time if needed
-        if len(booking) > 7 and booking[7] is not None:
-            booking[7] = convert_timedelta_to_time(booking[7])
+        for row in bookings:
+            if row[7] is not None:
+                row[7] = convert_timedelta_to_time(row[7])
+        booking = bookings[0]
+        total_amount = sum(row[8] for row in bookings)
         
     except Error as e:
-        print(f"Database error in payment: {e}")
+        app.logger.error(f"Database error in payment: {e}")
         flash('Error loading booking details', 'error')
         return redirect(url_for('dashboard'))
     finally:
@@ -3186,72 +3395,85 @@ def payment(booking_id):
             cursor.close()
             connection.close()
     
-    return render_template('payment.html', booking=booking)
-@app.route('/process_payment', methods=['POST'])
-def process_payment():
-    """Process payment"""
+    return render_template('payment.html', booking=booking, bookings=bookings, total_amount=total_amount,
+                           idempotency_key=uuid.uuid4().hex)
+
+# Payment form endpoint and success message per booking type
+PAYMENT_PAGES = {
+    'flight': ('payment', 'Payment successful'),
+    'hotel': ('hotel_payment', 'Hotel payment successful'),
+    'car': ('car_payment', 'Car rental payment successful'),
+}
+
+# Running this file directly starts the debug server, which may use the stub gateway
+payment_workers = PaymentWorkerPool(get_db_connection, load_gateway(debug=app.debug or __name__ == '__main__'))
+
+def submit_payment(booking_type):
+    """Shared handler for the payment forms: validate the card, queue an intent, show its status"""
     if 'user_id' not in session:
         flash('Please log in to continue', 'error')
         return redirect(url_for('login'))
     
-    booking_id = request.form.get('booking_id')
-    card_number = request.form.get('card_number', '').replace(' ', '')
-    expiry_date = request.form.get('expiry_date', '').strip()
-    cvv = request.form.get('cvv', '').strip()
-    cardholder_name = request.form.get('cardholder_name', '').strip()
-    
-    if not all([booking_id, card_number, expiry_date, cvv, cardholder_name]):
-        flash('All payment fields are required', 'error')
-        return redirect(url_for('payment', booking_id=booking_id))
+    form_endpoint = PAYMENT_PAGES[booking_type][0]
+    booking_ids = [int(b) for b in request.form.getlist('booking_id') if b.isdigit()]
+    if not booking_ids:
+        flash('Booking not found', 'error')
+        return redirect(url_for('dashboard'))
+    booking_id = booking_ids[0]
     
-    if len(card_number) != 16 or not card_number.isdigit():
-        flash('Card number must be 16 digits', 'error')
-        return redirect(url_for('payment', booking_id=booking_id))
+    card, error = card_from_form(request.form)
+    if error:
+        flash(error, 'error')
+        return redirect(url_for(form_endpoint, booking_id=booking_id))
     
-    if not re.match(r'^\d{2}/\d{2}$', expiry_date):
-        flash('Expiry date must be in MM/YY format', 'error')
-        return redirect(url_for('payment', booking_id=booking_id))
-
-    
-    if len(cvv) != 3 or not cvv.isdigit():
-        flash('CVV must be 3 digits', 'error')
-        return redirect(url_for('payment', booking_id=booking_id))
+    # Forms carry a key minted when they were rendered; resubmits reuse the same intent
+    idempotency_key = request.form.get('idempotency_key', '')[:64] or uuid.uuid4().hex
     
     connection = get_db_connection()
     if not connection:
         flash('Database connection error', 'error')
-        return redirect(url_for('payment', booking_id=booking_id))
+        return redirect(url_for(form_endpoint, booking_id=booking_id))
     
     try:
         cursor = connection.cursor()
         
-        cursor.execute("""
-            UPDATE flight_bookings 
-            SET payment_status = 'Paid', payment_date = %s
-            WHERE booking_id = %s AND user_id = %s AND payment_status = 'Pending'
-        """, (datetime.now().date(), booking_id, session['user_id']))
-        
-        if cursor.rowcount == 0:
+        bookings = [(booking_type, b) for b in booking_ids]
+        # The intent and its claims on the bookings are written together or not at all
+        connection.start_transaction()
+        intent_id, created = create_intent(cursor, session['user_id'], bookings, card, idempotency_key)
+        if not created:
+            connection.rollback()
+        if intent_id is None:
+            PAYMENTS.inc(kind=booking_type, outcome='rejected')
             flash('Booking not found or payment already processed', 'error')
             return redirect(url_for('dashboard'))
         
-        connection.commit()
-        flash('Payment successful', 'success')
-        return redirect(url_for('payment_success', booking_id=booking_id))
+        if created:
+            connection.commit()
+            if not payment_workers.submit(intent_id, card):
+                fail_intent(cursor, intent_id, 'The payment service is busy. Please try again.')
+                connection.commit()
+        return redirect(url_for('payment_status', intent_id=intent_id))
         
     except Error as e:
         connection.rollback()
-        print(f"Database error in process_payment: {e}")
+        PAYMENTS.inc(kind=booking_type, outcome='error')
+        app.logger.error(f"Database error in submit_payment: {e}")
         flash('Payment processing failed. Please try again.', 'error')
-        return redirect(url_for('payment', booking_id=booking_id))
+        return redirect(url_for(form_endpoint, booking_id=booking_id))
     finally:
         if connection.is_connected():
             cursor.close()
             connection.close()
 
+@app.route('/process_payment', methods=['POST'])
+def process_payment():
+    """Process payment"""
+    return submit_payment('flight')
+
 @app.route('/payment_success/<int:booking_id>')
 def payment_success(booking_id):
-    """Payment confirmation"""
+    """Payment confirmation for a booking and the rest of its group"""
     if 'user_id' not in session:
         flash('Please log in to continue', 'error')
         return redirect(url_for('login'))
@@ -3269,26 +3491,29 @@ def payment_success(booking_id):
                    f.flight_number, f.origin_country, f.destination_country,
                    f.origin_airport, f.destination_airport, f.departure_date, 
                    f.departure_time, f.arrival_time, b.total_amount
-            FROM flight_bookings b
+            FROM flight_bookings anchor
+            JOIN flight_bookings b ON b.booking_id = anchor.booking_id OR b.group_id = anchor.group_id
             JOIN flights f ON b.flight_id = f.flight_id
-            WHERE b.booking_id = %s AND b.user_id = %s AND b.payment_status = 'Paid'
+            WHERE anchor.booking_id = %s AND b.user_id = %s AND b.payment_status = 'Paid'
+            ORDER BY b.booking_id
         """, (booking_id, session['user_id']))
         
-        booking_data = cursor.fetchone()
-        if not booking_data:
+        bookings = [list(row) for row in cursor.fetchall()]
+        if not bookings:
             flash('Booking not found', 'error')
             return redirect(url_for('dashboard'))
         
-        booking = list(booking_data)
-        
         # Convert times if needed
-        if len(booking) > 10 and booking[10] is not None:
-            booking[10] = convert_timedelta_to_time(booking[10])
-        if len(booking) > 11 and booking[11] is not None:
-            booking[11] = convert_timedelta_to_time(booking[11])
+        for row in bookings:
+            if row[10] is not None:
+                row[10] = convert_timedelta_to_time(row[10])
+            if row[11] is not None:
+                row[11] = convert_timedelta_to_time(row[11])
+        booking = bookings[0]
+        total_amount = sum(row[12] for row in bookings)
         
     except Error as e:
-        print(f"Database error in payment_success: {e}")
+        app.logger.error(f"Database error in payment_success: {e}")
         flash('Error loading booking details', 'error')
         return redirect(url_for('dashboard'))
     finally:
@@ -3296,14 +3521,138 @@ def payment_success(booking_id):
             cursor.close()
             connection.close()
     
-    return render_template('payment_success.html', booking=booking)
+    return render_template('payment_success.html', booking=booking, bookings=bookings,
+                           total_amount=total_amount)
+
+@app.route('/payment_status/<int:intent_id>')
+def payment_status(intent_id):
+    """Wait page for a queued payment; redirects once the intent has settled"""
+    if 'user_id' not in session:
+        flash('Please log in to continue', 'error')
+        return redirect(url_for('login'))
+    
+    connection = get_db_connection()
+    if not connection:
+        flash('Database connection error', 'error')
+        return redirect(url_for('dashboard'))
+    
+    try:
+        cursor = connection.cursor()
+        intent = get_intent(cursor, intent_id, session['user_id'])
+        connection.commit()
+    except Error as e:
+        app.logger.error(f"Database error in payment_status: {e}")
+        flash('Error loading payment status', 'error')
+        return redirect(url_for('dashboard'))
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+    
+    if not intent:
+        flash('Payment not found', 'error')
+        return redirect(url_for('dashboard'))
+    
+    if not intent['bookings']:
+        flash(f"Payment failed: {intent['error'] or 'no bookings to pay for'}", 'error')
+        return redirect(url_for('dashboard'))
+    
+    booking_type, booking_id = intent['bookings'][0]
+    form_endpoint, success_message = PAYMENT_PAGES[booking_type]
+    if intent['status'] in ('succeeded', 'failed'):
+        # Settled by a payment worker; the dashboard must not read a replica that hasn't caught up
+        pin_to_primary()
+    if intent['status'] == 'succeeded':
+        flash(success_message, 'success')
+        if booking_type == 'flight':
+            return redirect(url_for('payment_success', booking_id=booking_id))
+        return redirect(url_for('dashboard'))
+    if intent['status'] == 'failed':
+        flash(f"Payment failed: {intent['error']}", 'error')
+        return redirect(url_for(form_endpoint, booking_id=booking_id))
+    
+    return render_template('payment_processing.html', intent=intent)
+
+@app.route('/api/payment_status/<int:intent_id>')
+def payment_status_api(intent_id):
+    """Intent status for the wait page to poll"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection error'}), 503
+    
+    try:
+        cursor = connection.cursor()
+        intent = get_intent(cursor, intent_id, session['user_id'])
+        connection.commit()
+    except Error as e:
+        app.logger.error(f"Database error in payment_status_api: {e}")
+        return jsonify({'error': 'Error loading payment status'}), 500
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+    
+    if not intent:
+        return jsonify({'error': 'Payment not found'}), 404
+    return jsonify({'intent_id': intent_id, 'status': intent['status'],
+                    'done': intent['status'] in ('succeeded', 'failed')})
+
+def hotel_search_query(form):
+    """(sql, params, errors) for the hotel search form"""
+    location = form.get('location', '').strip()
+    star_rating = form.get('star_rating', '').strip()
+    min_price = form.get('min_price_hotel', '').strip()
+    max_price = form.get('max_price_hotel', '').strip()
+    
+    query = """
+        SELECT hotel_id, hotel_name, location, star_rating, amenities, 
+               contact_info, price_per_night, availability
+        FROM hotels 
+        WHERE availability > 0
+    """
+    params = []
+    errors = []
+    
+    if location:
+        query += " AND location LIKE %s"
+        params.append(f"%{location}%")
+    
+    if star_rating:
+        query += " AND star_rating >= %s"
+        params.append(int(star_rating))
+    
+    for value, condition, label in ((min_price, 'price_per_night >= %s', 'minimum'),
+                                    (max_price, 'price_per_night <= %s', 'maximum')):
+        if value:
+            try:
+                params.append(float(value))
+                query += f" AND {condition}"
+            except ValueError:
+                errors.append(f'Invalid {label} price format')
+    
+    query += " ORDER BY star_rating DESC, price_per_night ASC LIMIT 20"
+    return query, params, errors
 
 # HOTEL BOOKING ROUTES
 @app.route('/hotels', methods=['GET', 'POST'])
+@conditional_get(catalog_validators('hotels'))
 def hotels():
     """Hotel booking page with database data and search functionality"""
-    connection = get_db_connection()
     hotels = []
+    hotel_listing = None
+    
+    if request.method == 'GET':
+        listing_key = fragment_cache.key('hotels', 'default')
+        hotel_listing = fragment_cache.get(listing_key)
+        if hotel_listing is not None:
+            return render_template('hotels.html', hotel_listing=hotel_listing)
+        # The listing is about to be cached for everyone, so read it from the primary
+        use_primary()
+    
+    connection = get_db_connection()
     
     if connection:
         try:
@@ -3311,50 +3660,12 @@ def hotels():
             
             if request.method == 'POST':
                 # Handle hotel search
-                location = request.form.get('location', '').strip()
-                check_in = request.form.get('check_in', '').strip()
-                check_out = request.form.get('check_out', '').strip()
-                guests = request.form.get('guests', '1')
-                room_type = request.form.get('room_type', '').strip()
-                star_rating = request.form.get('star_rating', '').strip()
-                min_price = request.form.get('min_price_hotel', '').strip()
-                max_price = request.form.get('max_price_hotel', '').strip()
-                
-                query = """
-                    SELECT hotel_id, hotel_name, location, star_rating, amenities, 
-                           contact_info, price_per_night, availability
-                    FROM hotels 
-                    WHERE availability > 0
-                """
-                params = []
-                
-                if location:
-                    query += " AND location LIKE %s"
-                    params.append(f"%{location}%")
-                
-                if star_rating:
-                    query += " AND star_rating >= %s"
-                    params.append(int(star_rating))
-                
-                if min_price:
-                    try:
-                        query += " AND price_per_night >= %s"
-                        params.append(float(min_price))
-                    except ValueError:
-                        flash('Invalid minimum price format', 'error')
-                
-                if max_price:
-                    try:
-                        query += " AND price_per_night <= %s"
-                        params.append(float(max_price))
-                    except ValueError:
-                        flash('Invalid maximum price format', 'error')
-                
-                query += " ORDER BY star_rating DESC, price_per_night ASC LIMIT 20"
+                query, params, errors = hotel_search_query(request.form)
+                for message in errors:
+                    flash(message, 'error')
                 
                 cursor.execute(query, params)
-                hotels_raw = cursor.fetchall() or []
-                hotels = process_hotels_data(hotels_raw)
+                hotels = process_hotels_data(cursor.fetchall() or [])
                 
                 if not hotels:
                     flash('No hotels found matching your criteria.', 'info')
@@ -3370,9 +3681,10 @@ def hotels():
                 """)
                 hotels_raw = cursor.fetchall() or []
                 hotels = process_hotels_data(hotels_raw)
+                hotel_listing = render_listing('partials/hotel_listing.html', listing_key, hotels=hotels)
             
         except Error as e:
-            print(f"Database error in hotels: {e}")
+            app.logger.error(f"Database error in hotels: {e}")
             flash('Error loading hotels. Please try again.', 'error')
         finally:
             if connection.is_connected():
@@ -3381,7 +3693,10 @@ def hotels():
     else:
         flash('Database connection unavailable. Please try again later.', 'error')
     
-    return render_template('hotels.html', hotels=hotels)
+    if hotel_listing is None:
+        hotel_listing = render_listing('partials/hotel_listing.html', hotels=hotels)
+    
+    return render_template('hotels.html', hotel_listing=hotel_listing)
 
 @app.route('/book_hotel/<int:hotel_id>')
 def book_hotel(hotel_id):
@@ -3424,7 +3739,7 @@ def book_hotel(hotel_id):
         }
         
     except Error as e:
-        print(f"Database error in hotel booking: {e}")
+        app.logger.error(f"Database error in hotel booking: {e}")
         flash('Error loading hotel details', 'error')
         return redirect(url_for('hotels'))
     finally:
@@ -3459,7 +3774,7 @@ def confirm_hotel_booking():
         return redirect(url_for('book_hotel', hotel_id=hotel_id))
     
     try:
-        cursor = connection.cursor()
+        cursor = connection.cursor(prepared=True)
         
         # Get hotel price
         cursor.execute("SELECT price_per_night FROM hotels WHERE hotel_id = %s", (hotel_id,))
@@ -3502,12 +3817,15 @@ def confirm_hotel_booking():
         """, (hotel_id,))
         
         connection.commit()
+        fragment_cache.bump('hotels')
+        BOOKINGS.inc(kind='hotel', outcome='success')
         flash('Hotel booking confirmed successfully! Please proceed to payment.', 'success')
         return redirect(url_for('hotel_payment', booking_id=booking_id))
         
     except Error as e:
         connection.rollback()
-        print(f"Database error in confirm_hotel_booking: {e}")
+        BOOKINGS.inc(kind='hotel', outcome='error')
+        app.logger.error(f"Database error in confirm_hotel_booking: {e}")
         flash('Hotel booking failed. Please try again.', 'error')
         return redirect(url_for('book_hotel', hotel_id=hotel_id))
     finally:
@@ -3547,7 +3865,7 @@ def hotel_payment(booking_id):
         booking = list(booking_data)
         
     except Error as e:
-        print(f"Database error in hotel_payment: {e}")
+        app.logger.error(f"Database error in hotel_payment: {e}")
         flash('Error loading booking details', 'error')
         return redirect(url_for('dashboard'))
     finally:
@@ -3555,113 +3873,63 @@ def hotel_payment(booking_id):
             cursor.close()
             connection.close()
     
-    return render_template('hotel_payment.html', booking=booking)
+    return render_template('hotel_payment.html', booking=booking, idempotency_key=uuid.uuid4().hex)
 
 @app.route('/process_hotel_payment', methods=['POST'])
 def process_hotel_payment():
     """Process hotel payment"""
-    if 'user_id' not in session:
-        flash('Please log in to continue', 'error')
-        return redirect(url_for('login'))
-    
-    booking_id = request.form.get('booking_id')
-    card_number = request.form.get('card_number', '').replace(' ', '')
-    expiry_date = request.form.get('expiry_date', '').strip()
-    cvv = request.form.get('cvv', '').strip()
-    cardholder_name = request.form.get('cardholder_name', '').strip()
-    
-    if not all([booking_id, card_number, expiry_date, cvv, cardholder_name]):
-        flash('All payment fields are required', 'error')
-        return redirect(url_for('hotel_payment', booking_id=booking_id))
-    
-    if len(card_number) != 16 or not card_number.isdigit():
-        flash('Card number must be 16 digits', 'error')
-        return redirect(url_for('hotel_payment', booking_id=booking_id))
-    
-    if not re.match(r'^\d{2}/\d{2}$', expiry_date):
-        flash('Expiry date must be in MM/YY format', 'error')
-        return redirect(url_for('hotel_payment', booking_id=booking_id))
-
-    
-    if len(cvv) != 3 or not cvv.isdigit():
-        flash('CVV must be 3 digits', 'error')
-        return redirect(url_for('hotel_payment', booking_id=booking_id))
-    
-    connection = get_db_connection()
-    if not connection:
-        flash('Database connection error', 'error')
-        return redirect(url_for('hotel_payment', booking_id=booking_id))
-    
-    try:
-        cursor = connection.cursor()
-        
-        cursor.execute("""
-            UPDATE hotel_bookings 
-            SET payment_status = 'Paid'
-            WHERE booking_id = %s AND user_id = %s AND payment_status = 'Pending'
-        """, (booking_id, session['user_id']))
-        
-        if cursor.rowcount == 0:
-            flash('Booking not found or payment already processed', 'error')
-            return redirect(url_for('dashboard'))
-        
-        connection.commit()
-        flash('Hotel payment successful', 'success')
-        return redirect(url_for('dashboard'))
-        
-    except Error as e:
-        connection.rollback()
-        print(f"Database error in process_hotel_payment: {e}")
-        flash('Payment processing failed. Please try again.', 'error')
-        return redirect(url_for('hotel_payment', booking_id=booking_id))
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
+    return submit_payment('hotel')
 
 # CAR RENTAL ROUTES
+def car_search_query(form):
+    """(sql, params) for the car rental search form"""
+    pickup_location = form.get('pickup_location', '').strip()
+    car_type = form.get('car_type', '').strip()
+    
+    query = """
+        SELECT rental_id, company_name, location, car_types, availability, 
+               contact_info, price_per_day
+        FROM car_rentals 
+        WHERE availability > 0
+    """
+    params = []
+    
+    if pickup_location:
+        query += " AND location LIKE %s"
+        params.append(f"%{pickup_location}%")
+    
+    if car_type:
+        query += " AND car_types LIKE %s"
+        params.append(f"%{car_type}%")
+    
+    query += " ORDER BY price_per_day ASC LIMIT 20"
+    return query, params
+
 @app.route('/cars', methods=['GET', 'POST'])
+@conditional_get(catalog_validators('car_rentals'))
 def cars():
     """Car rental page with database data and search functionality"""
-    connection = get_db_connection()
     car_rentals = []
+    car_listing = None
     
-    if connection:
-        try:
-            cursor = connection.cursor()
-            
-            if request.method == 'POST':
-                # Handle car search
-                pickup_location = request.form.get('pickup_location', '').strip()
-                pickup_date = request.form.get('pickup_date', '').strip()
-                pickup_time = request.form.get('pickup_time', '').strip()
-                return_date = request.form.get('return_date', '').strip()
-                return_time = request.form.get('return_time', '').strip()
-                car_type = request.form.get('car_type', '').strip()
-                transmission = request.form.get('transmission', '').strip()
-                fuel_type = request.form.get('fuel_type', '').strip()
-                
-                query = """
-                    SELECT rental_id, company_name, location, car_types, availability, 
-                           contact_info, price_per_day
-                    FROM car_rentals 
-                    WHERE availability > 0
-                """
-                params = []
-                
-                if pickup_location:
-                    query += " AND location LIKE %s"
-                    params.append(f"%{pickup_location}%")
-                
-                if car_type:
-                    query += " AND car_types LIKE %s"
-                    params.append(f"%{car_type}%")
-                
-                query += " ORDER BY price_per_day ASC LIMIT 20"
-                
-                cursor.execute(query, params)
-                cars_raw = cursor.fetchall() or []
-                car_rentals = process_cars_data(cars_raw)
+    if request.method == 'GET':
+        listing_key = fragment_cache.key('cars', 'default')
+        car_listing = fragment_cache.get(listing_key)
+        if car_listing is not None:
+            return render_template('cars.html', car_listing=car_listing)
+        # The listing is about to be cached for everyone, so read it from the primary
+        use_primary()
+    
+    connection = get_db_connection()
+    
+    if connection:
+        try:
+            cursor = connection.cursor()
+            
+            if request.method == 'POST':
+                # Handle car search
+                cursor.execute(*car_search_query(request.form))
+                car_rentals = process_cars_data(cursor.fetchall() or [])
                 
                 if not car_rentals:
                     flash('No car rentals found matching your criteria.', 'info')
@@ -3677,9 +3945,10 @@ def cars():
                 """)
                 cars_raw = cursor.fetchall() or []
                 car_rentals = process_cars_data(cars_raw)
+                car_listing = render_listing('partials/car_listing.html', listing_key, car_rentals=car_rentals)
             
         except Error as e:
-            print(f"Database error in cars: {e}")
+            app.logger.error(f"Database error in cars: {e}")
             flash('Error loading car rentals. Please try again.', 'error')
         finally:
             if connection.is_connected():
@@ -3688,7 +3957,10 @@ def cars():
     else:
         flash('Database connection unavailable. Please try again later.', 'error')
     
-    return render_template('cars.html', car_rentals=car_rentals)
+    if car_listing is None:
+        car_listing = render_listing('partials/car_listing.html', car_rentals=car_rentals)
+    
+    return render_template('cars.html', car_listing=car_listing)
 
 @app.route('/book_car/<int:rental_id>')
 def book_car(rental_id):
@@ -3726,7 +3998,7 @@ def book_car(rental_id):
             return redirect(url_for('cars'))
         
     except Error as e:
-        print(f"Database error in car booking: {e}")
+        app.logger.error(f"Database error in car booking: {e}")
         flash('Error loading car rental details', 'error')
         return redirect(url_for('cars'))
     finally:
@@ -3761,7 +4033,7 @@ def confirm_car_booking():
         return redirect(url_for('book_car', rental_id=rental_id))
     
     try:
-        cursor = connection.cursor()
+        cursor = connection.cursor(prepared=True)
         
         # Get rental price
         cursor.execute("SELECT price_per_day FROM car_rentals WHERE rental_id = %s", (rental_id,))
@@ -3806,12 +4078,15 @@ def confirm_car_booking():
         """, (rental_id,))
         
         connection.commit()
+        fragment_cache.bump('cars')
+        BOOKINGS.inc(kind='car', outcome='success')
         flash('Car rental booking confirmed successfully! Please proceed to payment.', 'success')
         return redirect(url_for('car_payment', booking_id=booking_id))
         
     except Error as e:
         connection.rollback()
-        print(f"Database error in confirm_car_booking: {e}")
+        BOOKINGS.inc(kind='car', outcome='error')
+        app.logger.error(f"Database error in confirm_car_booking: {e}")
         flash('Car rental booking failed. Please try again.', 'error')
         return redirect(url_for('book_car', rental_id=rental_id))
     finally:
@@ -3851,7 +4126,7 @@ def car_payment(booking_id):
         booking = list(booking_data)
         
     except Error as e:
-        print(f"Database error in car_payment: {e}")
+        app.logger.error(f"Database error in car_payment: {e}")
         flash('Error loading booking details', 'error')
         return redirect(url_for('dashboard'))
     finally:
@@ -3859,68 +4134,12 @@ def car_payment(booking_id):
             cursor.close()
             connection.close()
     
-    return render_template('car_payment.html', booking=booking)
+    return render_template('car_payment.html', booking=booking, idempotency_key=uuid.uuid4().hex)
 
 @app.route('/process_car_payment', methods=['POST'])
 def process_car_payment():
     """Process car payment"""
-    if 'user_id' not in session:
-        flash('Please log in to continue', 'error')
-        return redirect(url_for('login'))
-    
-    booking_id = request.form.get('booking_id')
-    card_number = request.form.get('card_number', '').replace(' ', '')
-    expiry_date = request.form.get('expiry_date', '').strip()
-    cvv = request.form.get('cvv', '').strip()
-    cardholder_name = request.form.get('cardholder_name', '').strip()
-    
-    if not all([booking_id, card_number, expiry_date, cvv, cardholder_name]):
-        flash('All payment fields are required', 'error')
-        return redirect(url_for('car_payment', booking_id=booking_id))
-    
-    if len(card_number) != 16 or not card_number.isdigit():
-        flash('Card number must be 16 digits', 'error')
-        return redirect(url_for('car_payment', booking_id=booking_id))
-    
-    if not re.match(r'^\d{2}/\d{2}', expiry_date):
-        flash('Expiry date must be in MM/YY format', 'error')
-        return redirect(url_for('car_payment', booking_id=booking_id))
-    
-    if len(cvv) != 3 or not cvv.isdigit():
-        flash('CVV must be 3 digits', 'error')
-        return redirect(url_for('car_payment', booking_id=booking_id))
-    
-    connection = get_db_connection()
-    if not connection:
-        flash('Database connection error', 'error')
-        return redirect(url_for('car_payment', booking_id=booking_id))
-    
-    try:
-        cursor = connection.cursor()
-        
-        cursor.execute("""
-            UPDATE car_bookings 
-            SET payment_status = 'Paid'
-            WHERE booking_id = %s AND user_id = %s AND payment_status = 'Pending'
-        """, (booking_id, session['user_id']))
-        
-        if cursor.rowcount == 0:
-            flash('Booking not found or payment already processed', 'error')
-            return redirect(url_for('dashboard'))
-        
-        connection.commit()
-        flash('Car rental payment successful', 'success')
-        return redirect(url_for('dashboard'))
-        
-    except Error as e:
-        connection.rollback()
-        print(f"Database error in process_car_payment: {e}")
-        flash('Payment processing failed. Please try again.', 'error')
-        return redirect(url_for('car_payment', booking_id=booking_id))
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
+    return submit_payment('car')
 
 # USER AUTHENTICATION ROUTES
 @app.route('/login', methods=['GET', 'POST'])
@@ -3957,7 +4176,7 @@ def login():
                 flash('Invalid email or password', 'error')
                 
         except Error as e:
-            print(f"Database error in login: {e}")
+            app.logger.error(f"Database error in login: {e}")
             flash('Login failed. Please try again.', 'error')
         finally:
             if connection.is_connected():
@@ -4021,7 +4240,7 @@ def signup():
             
         except Error as e:
             connection.rollback()
-            print(f"Database error in signup: {e}")
+            app.logger.error(f"Database error in signup: {e}")
             flash('Registration failed. Please try again.', 'error')
         finally:
             if connection.is_connected():
@@ -4038,6 +4257,53 @@ def logout():
     flash('You have been logged out successfully.', 'info')
     return redirect(url_for('index'))
 
+# Longest the dashboard waits for each booking list before rendering without it
+DASHBOARD_TIMEOUT = setting('DASHBOARD_TIMEOUT', 5.0)
+
+# The three booking lists on the user dashboard, each filtered by user_id
+DASHBOARD_QUERIES = {
+    'flight_bookings': """
+        SELECT b.booking_id, b.passenger_name, b.seat_number, b.booking_date,
+               b.booking_status, b.payment_status, f.flight_number, 
+               f.origin_country, f.destination_country, f.departure_date,
+               f.departure_time, b.total_amount
+        FROM flight_bookings b
+        JOIN flights f ON b.flight_id = f.flight_id
+        WHERE b.user_id = %s
+        ORDER BY b.booking_date DESC
+    """,
+    # Hotel bookings with payment status
+    'hotel_bookings': """
+        SELECT hb.booking_id, hb.guest_name, hb.check_in_date, hb.check_out_date,
+               hb.room_type, hb.booking_date, hb.total_amount, hb.booking_status,
+               h.hotel_name, h.location, hb.payment_status
+        FROM hotel_bookings hb
+        JOIN hotels h ON hb.hotel_id = h.hotel_id
+        WHERE hb.user_id = %s
+        ORDER BY hb.booking_date DESC
+    """,
+    # Car bookings with payment status
+    'car_bookings': """
+        SELECT cb.booking_id, cb.renter_name, cb.pickup_date, cb.return_date,
+               cb.car_type, cb.booking_date, cb.total_amount, cb.booking_status,
+               cr.company_name, cr.location, cb.payment_status
+        FROM car_bookings cb
+        JOIN car_rentals cr ON cb.rental_id = cr.rental_id
+        WHERE cb.user_id = %s
+        ORDER BY cb.booking_date DESC
+    """,
+}
+
+def dashboard_flight_rows(raw_flight_bookings):
+    """Flight booking rows with departure_time as a time for the template"""
+    flight_bookings = []
+    for booking_data in raw_flight_bookings:
+        booking = list(booking_data)
+        if len(booking) > 10 and booking[10] is not None:
+            booking[10] = convert_timedelta_to_time(booking[10])
+        flight_bookings.append(booking)
+    return flight_bookings
+
 @app.route('/dashboard')
 def dashboard():
     """User dashboard with flight, hotel, and car bookings"""
@@ -4045,75 +4311,21 @@ def dashboard():
         flash('Please log in to view your dashboard', 'error')
         return redirect(url_for('login'))
     
-    connection = get_db_connection()
-    flight_bookings = []
-    hotel_bookings = []
-    car_bookings = []
+    bookings = {section: [] for section in DASHBOARD_QUERIES}
     
-    if connection:
-        try:
-            cursor = connection.cursor()
-            
-            # Get flight bookings
-            cursor.execute("""
-                SELECT b.booking_id, b.passenger_name, b.seat_number, b.booking_date,
-                       b.booking_status, b.payment_status, f.flight_number, 
-                       f.origin_country, f.destination_country, f.departure_date,
-                       f.departure_time, b.total_amount
-                FROM flight_bookings b
-                JOIN flights f ON b.flight_id = f.flight_id
-                WHERE b.user_id = %s
-                ORDER BY b.booking_date DESC
-            """, (session['user_id'],))
-            
-            raw_flight_bookings = cursor.fetchall() or []
-            
-            for booking_data in raw_flight_bookings:
-                booking = list(booking_data)
-                if len(booking) > 10 and booking[10] is not None:
-                    booking[10] = convert_timedelta_to_time(booking[10])
-                flight_bookings.append(booking)
-            
-            # Get hotel bookings with payment status
-            cursor.execute("""
-                SELECT hb.booking_id, hb.guest_name, hb.check_in_date, hb.check_out_date,
-                       hb.room_type, hb.booking_date, hb.total_amount, hb.booking_status,
-                       h.hotel_name, h.location, hb.payment_status
-                FROM hotel_bookings hb
-                JOIN hotels h ON hb.hotel_id = h.hotel_id
-                WHERE hb.user_id = %s
-                ORDER BY hb.booking_date DESC
-            """, (session['user_id'],))
-            
-            hotel_bookings = cursor.fetchall() or []
-            
-            # Get car bookings with payment status
-            cursor.execute("""
-                SELECT cb.booking_id, cb.renter_name, cb.pickup_date, cb.return_date,
-                       cb.car_type, cb.booking_date, cb.total_amount, cb.booking_status,
-                       cr.company_name, cr.location, cb.payment_status
-                FROM car_bookings cb
-                JOIN car_rentals cr ON cb.rental_id = cr.rental_id
-                WHERE cb.user_id = %s
-                ORDER BY cb.booking_date DESC
-            """, (session['user_id'],))
-            
-            car_bookings = cursor.fetchall() or []
-            
-        except Error as e:
-            print(f"Database error in dashboard: {e}")
-            flash('Error loading bookings', 'error')
-        finally:
-            if connection.is_connected():
-                cursor.close()
-                connection.close()
-    else:
-        flash('Database connection unavailable. Please try again later.', 'error')
+    # The three lists are independent, so each is fetched on its own connection at the same time
+    found, failed = query_fan_out.run({section: (query, (session['user_id'],))
+                                       for section, query in DASHBOARD_QUERIES.items()},
+                                      DASHBOARD_TIMEOUT)
+    bookings.update(found)
+    bookings['flight_bookings'] = dashboard_flight_rows(bookings['flight_bookings'])
+    if len(failed) == len(DASHBOARD_QUERIES):
+        flash('Error loading bookings', 'error')
+    elif failed:
+        sections = ', '.join(section.replace('_', ' ') for section in DASHBOARD_QUERIES if section in failed)
+        flash(f"Some bookings could not be loaded ({sections}). Please refresh to try again.", 'warning')
     
-    return render_template('dashboard.html', 
-                         flight_bookings=flight_bookings,
-                         hotel_bookings=hotel_bookings,
-                         car_bookings=car_bookings)
+    return render_template('dashboard.html', **bookings)
 
 @app.route('/cancel_booking/<int:booking_id>')
 def cancel_booking(booking_id):
@@ -4130,45 +4342,56 @@ def cancel_booking(booking_id):
     try:
         cursor = connection.cursor()
         
-        # Fetch booking info and make sure it's valid
+        # Lock the booking until the seat is back, so the hold sweeper or a
+        # second cancel request cannot release the same seat again
+        connection.start_transaction()
         cursor.execute("""
             SELECT flight_id, booking_status, payment_status 
             FROM flight_bookings 
             WHERE booking_id = %s AND user_id = %s
+            FOR UPDATE
         """, (booking_id, session['user_id']))
 
         result = cursor.fetchone()
         if not result:
+            connection.rollback()
             flash('Booking not found', 'error')
             return redirect(url_for('dashboard'))
 
         flight_id, current_status, payment_status = result
 
         if current_status == 'Cancelled':
+            connection.rollback()
             flash('Booking is already cancelled', 'info')
             return redirect(url_for('dashboard'))
 
-        # Update the booking to "Cancelled"
+        # Update the booking to "Cancelled"; an unpaid one can no longer be paid for
         cursor.execute("""
             UPDATE flight_bookings 
-            SET booking_status = 'Cancelled'
-            WHERE booking_id = %s AND user_id = %s
+            SET booking_status = 'Cancelled',
+                payment_status = IF(payment_status = 'Pending', 'Cancelled', payment_status)
+            WHERE booking_id = %s AND user_id = %s AND booking_status = 'Confirmed'
         """, (booking_id, session['user_id']))
 
-        # Only increase available seats if booking was Paid
-        if payment_status == 'Paid':
-            cursor.execute("""
-                UPDATE flights 
-                SET available_seats = available_seats + 1
-                WHERE flight_id = %s
-            """, (flight_id,))
+        if cursor.rowcount != 1:
+            connection.rollback()
+            flash('Booking can no longer be cancelled', 'info')
+            return redirect(url_for('dashboard'))
+
+        # Every confirmed booking took a seat when it was made, paid or not
+        cursor.execute("""
+            UPDATE flights 
+            SET available_seats = available_seats + 1
+            WHERE flight_id = %s
+        """, (flight_id,))
 
         connection.commit()
+        fragment_cache.bump('flights')
         flash('Booking cancelled successfully', 'success')
         
     except Error as e:
         connection.rollback()
-        print(f"Database error in cancel_booking: {e}")
+        app.logger.error(f"Database error in cancel_booking: {e}")
         flash('Cancellation failed. Please try again.', 'error')
     finally:
         if connection.is_connected():
@@ -4261,7 +4484,7 @@ def admin_dashboard():
             stats['revenue_flights'] = cursor.fetchone()[0] or 0
             
         except Error as e:
-            print(f"Database error in admin dashboard: {e}")
+            app.logger.error(f"Database error in admin dashboard: {e}")
             flash('Error loading statistics', 'error')
         finally:
             if connection.is_connected():
@@ -4273,6 +4496,7 @@ def admin_dashboard():
 # FLIGHT ADMIN ROUTES WITH SEARCH
 @app.route('/admin/flights')
 @admin_required
+@conditional_get(catalog_validators('flights'))
 def admin_flights():
     """List all flights for admin with search"""
     connection = get_db_connection()
@@ -4315,7 +4539,7 @@ def admin_flights():
             flights = cursor.fetchall() or []
             
         except Error as e:
-            print(f"Database error in admin flights: {e}")
+            app.logger.error(f"Database error in admin flights: {e}")
             flash('Error loading flights', 'error')
         finally:
             if connection.is_connected():
@@ -4363,12 +4587,13 @@ def admin_add_flight():
             """, tuple(flight_data.values()))
             
             connection.commit()
+            fragment_cache.bump('flights')
             flash('Flight added successfully', 'success')
             return redirect(url_for('admin_flights'))
             
         except Error as e:
             connection.rollback()
-            print(f"Database error in add flight: {e}")
+            app.logger.error(f"Database error in add flight: {e}")
             flash('Error adding flight', 'error')
         finally:
             if connection.is_connected():
@@ -4377,6 +4602,93 @@ def admin_add_flight():
     
     return render_template('admin/flight_form.html', flight=None)
 
+def admin_import(kind, back_endpoint):
+    """Shared view for the bulk import pages: upload a CSV or JSON file into one of FEEDS"""
+    feed = FEEDS[kind]
+    report = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        fmt = file_format(upload.filename) if upload else None
+        dry_run = bool(request.form.get('dry_run'))
+        if not upload or not upload.filename:
+            flash('Please choose a file to import', 'error')
+        elif fmt is None:
+            flash('The file must be a .csv or .json file', 'error')
+        else:
+            connection = get_db_connection()
+            if not connection:
+                flash('Database connection error', 'error')
+                return redirect(url_for(back_endpoint))
+            
+            try:
+                report = import_records(connection, feed, read_records(upload.stream, fmt), dry_run=dry_run)
+            except Error as e:
+                report = getattr(e, 'import_report', None)
+                app.logger.error(f"Database error in {kind} import: {e}")
+                flash('The import was stopped by a database error; batches already loaded were kept', 'error')
+            except ValueError as e:
+                report = getattr(e, 'import_report', None)
+                flash(f'The import was stopped because the file could not be read ({e}); '
+                      'batches already loaded were kept', 'error')
+            finally:
+                if connection.is_connected():
+                    connection.close()
+            
+            if report and report.loaded and not dry_run:
+                fragment_cache.bump(feed.cache)
+                flash(f'{report.inserted} {kind} added, {report.updated} updated', 'success')
+    
+    return render_template('admin/import.html', report=report, entity=kind.capitalize(),
+                           columns=column_names(feed), keys=feed.key if feed.upsert else None,
+                           back_url=url_for(back_endpoint))
+
+@app.route('/admin/flights/import', methods=['GET', 'POST'])
+@admin_required
+def admin_import_flights():
+    """Bulk-load a flight schedule from an uploaded CSV or JSON file"""
+    return admin_import('flights', 'admin_flights')
+
+@app.route('/admin/flights/bulk', methods=['GET', 'POST'])
+@admin_required
+def admin_bulk_flights():
+    """Preview and apply a price, seat or delete operation to every flight matching a filter"""
+    form = request.form if request.method == 'POST' else request.args
+    criteria = {name: form.get(name, '').strip() for name, _ in BULK_FILTERS}
+    operation = form.get('operation', 'price')
+    amount = form.get('amount', '').strip()
+    counts = None
+    
+    if request.method == 'POST':
+        connection = get_db_connection()
+        if not connection:
+            flash('Database connection error', 'error')
+            return redirect(url_for('admin_flights'))
+        
+        try:
+            cursor = connection.cursor()
+            if request.form.get('action') == 'apply':
+                matched, changed = apply_bulk(connection, operation, amount, criteria)
+                fragment_cache.bump('flights')
+                flash(f'{changed} of {matched} matching flights changed', 'success')
+                return redirect(url_for('admin_flights'))
+            counts = preview_bulk(cursor, operation, amount, criteria)
+            
+        except ValueError as e:
+            flash(str(e), 'error')
+        except Error as e:
+            connection.rollback()
+            # Chunks committed before the error stay applied
+            fragment_cache.bump('flights')
+            app.logger.error(f"Database error in bulk flight operation: {e}")
+            flash('Error updating flights; some flights may already have been changed', 'error')
+        finally:
+            if connection.is_connected():
+                cursor.close()
+                connection.close()
+    
+    return render_template('admin/flight_bulk.html', criteria=criteria, operation=operation,
+                           amount=amount, counts=counts)
+
 @app.route('/admin/flights/edit/<int:flight_id>', methods=['GET', 'POST'])
 @admin_required
 def admin_edit_flight(flight_id):
@@ -4417,6 +4729,7 @@ def admin_edit_flight(flight_id):
             """, (*flight_data.values(), flight_id))
             
             connection.commit()
+            fragment_cache.bump('flights')
             flash('Flight updated successfully', 'success')
             return redirect(url_for('admin_flights'))
         
@@ -4438,7 +4751,7 @@ def admin_edit_flight(flight_id):
     except Error as e:
         if request.method == 'POST':
             connection.rollback()
-        print(f"Database error in edit flight: {e}")
+        app.logger.error(f"Database error in edit flight: {e}")
         flash('Error processing flight', 'error')
     finally:
         if connection.is_connected():
@@ -4471,11 +4784,12 @@ def admin_delete_flight(flight_id):
         else:
             cursor.execute("DELETE FROM flights WHERE flight_id = %s", (flight_id,))
             connection.commit()
+            fragment_cache.bump('flights')
             flash('Flight deleted successfully', 'success')
             
     except Error as e:
         connection.rollback()
-        print(f"Database error in delete flight: {e}")
+        app.logger.error(f"Database error in delete flight: {e}")
         flash('Error deleting flight', 'error')
     finally:
         if connection.is_connected():
@@ -4487,6 +4801,7 @@ def admin_delete_flight(flight_id):
 # HOTEL ADMIN ROUTES WITH SEARCH
 @app.route('/admin/hotels')
 @admin_required
+@conditional_get(catalog_validators('hotels'))
 def admin_hotels():
     """List all hotels for admin with search"""
     connection = get_db_connection()
@@ -4521,7 +4836,7 @@ def admin_hotels():
             hotels = cursor.fetchall() or []
             
         except Error as e:
-            print(f"Database error in admin hotels: {e}")
+            app.logger.error(f"Database error in admin hotels: {e}")
             flash('Error loading hotels', 'error')
         finally:
             if connection.is_connected():
@@ -4561,12 +4876,13 @@ def admin_add_hotel():
             """, tuple(hotel_data.values()))
             
             connection.commit()
+            fragment_cache.bump('hotels')
             flash('Hotel added successfully', 'success')
             return redirect(url_for('admin_hotels'))
             
         except Error as e:
             connection.rollback()
-            print(f"Database error in add hotel: {e}")
+            app.logger.error(f"Database error in add hotel: {e}")
             flash('Error adding hotel', 'error')
         finally:
             if connection.is_connected():
@@ -4575,6 +4891,12 @@ def admin_add_hotel():
     
     return render_template('admin/hotel_form.html', hotel=None)
 
+@app.route('/admin/hotels/import', methods=['GET', 'POST'])
+@admin_required
+def admin_import_hotels():
+    """Insert or update hotels from an uploaded CSV or JSON feed"""
+    return admin_import('hotels', 'admin_hotels')
+
 @app.route('/admin/hotels/edit/<int:hotel_id>', methods=['GET', 'POST'])
 @admin_required
 def admin_edit_hotel(hotel_id):
@@ -4598,15 +4920,17 @@ def admin_edit_hotel(hotel_id):
                 'availability': int(request.form.get('availability', 0))
             }
             
+            # total_rooms is re-derived from the new availability by the reconciler
             cursor.execute("""
                 UPDATE hotels SET 
                 hotel_name = %s, location = %s, star_rating = %s,
                 amenities = %s, contact_info = %s, price_per_night = %s, 
-                availability = %s
+                availability = %s, total_rooms = NULL
                 WHERE hotel_id = %s
             """, (*hotel_data.values(), hotel_id))
             
             connection.commit()
+            fragment_cache.bump('hotels')
             flash('Hotel updated successfully', 'success')
             return redirect(url_for('admin_hotels'))
         
@@ -4625,7 +4949,7 @@ def admin_edit_hotel(hotel_id):
     except Error as e:
         if request.method == 'POST':
             connection.rollback()
-        print(f"Database error in edit hotel: {e}")
+        app.logger.error(f"Database error in edit hotel: {e}")
         flash('Error processing hotel', 'error')
     finally:
         if connection.is_connected():
@@ -4658,11 +4982,12 @@ def admin_delete_hotel(hotel_id):
         else:
             cursor.execute("DELETE FROM hotels WHERE hotel_id = %s", (hotel_id,))
             connection.commit()
+            fragment_cache.bump('hotels')
             flash('Hotel deleted successfully', 'success')
             
     except Error as e:
         connection.rollback()
-        print(f"Database error in delete hotel: {e}")
+        app.logger.error(f"Database error in delete hotel: {e}")
         flash('Error deleting hotel', 'error')
     finally:
         if connection.is_connected():
@@ -4674,6 +4999,7 @@ def admin_delete_hotel(hotel_id):
 # CAR ADMIN ROUTES WITH SEARCH
 @app.route('/admin/cars')
 @admin_required
+@conditional_get(catalog_validators('car_rentals'))
 def admin_cars():
     """List all car rentals for admin with search"""
     connection = get_db_connection()
@@ -4708,7 +5034,7 @@ def admin_cars():
             cars = cursor.fetchall() or []
             
         except Error as e:
-            print(f"Database error in admin cars: {e}")
+            app.logger.error(f"Database error in admin cars: {e}")
             flash('Error loading car rentals', 'error')
         finally:
             if connection.is_connected():
@@ -4746,12 +5072,13 @@ def admin_add_car():
             """, tuple(car_data.values()))
             
             connection.commit()
+            fragment_cache.bump('cars')
             flash('Car rental added successfully', 'success')
             return redirect(url_for('admin_cars'))
             
         except Error as e:
             connection.rollback()
-            print(f"Database error in add car: {e}")
+            app.logger.error(f"Database error in add car: {e}")
             flash('Error adding car rental', 'error')
         finally:
             if connection.is_connected():
@@ -4760,6 +5087,12 @@ def admin_add_car():
     
     return render_template('admin/car_form.html', car=None)
 
+@app.route('/admin/cars/import', methods=['GET', 'POST'])
+@admin_required
+def admin_import_cars():
+    """Insert or update car rentals from an uploaded CSV or JSON feed"""
+    return admin_import('cars', 'admin_cars')
+
 @app.route('/admin/cars/edit/<int:rental_id>', methods=['GET', 'POST'])
 @admin_required
 def admin_edit_car(rental_id):
@@ -4782,14 +5115,16 @@ def admin_edit_car(rental_id):
                 'price_per_day': float(request.form.get('price_per_day', 0))
             }
             
+            # total_cars is re-derived from the new availability by the reconciler
             cursor.execute("""
                 UPDATE car_rentals SET 
                 company_name = %s, location = %s, car_types = %s,
-                availability = %s, contact_info = %s, price_per_day = %s
+                availability = %s, contact_info = %s, price_per_day = %s, total_cars = NULL
                 WHERE rental_id = %s
             """, (*car_data.values(), rental_id))
             
             connection.commit()
+            fragment_cache.bump('cars')
             flash('Car rental updated successfully', 'success')
             return redirect(url_for('admin_cars'))
         
@@ -4808,7 +5143,7 @@ def admin_edit_car(rental_id):
     except Error as e:
         if request.method == 'POST':
             connection.rollback()
-        print(f"Database error in edit car: {e}")
+        app.logger.error(f"Database error in edit car: {e}")
         flash('Error processing car rental', 'error')
     finally:
         if connection.is_connected():
@@ -4841,11 +5176,12 @@ def admin_delete_car(rental_id):
         else:
             cursor.execute("DELETE FROM car_rentals WHERE rental_id = %s", (rental_id,))
             connection.commit()
+            fragment_cache.bump('cars')
             flash('Car rental deleted successfully', 'success')
             
     except Error as e:
         connection.rollback()
-        print(f"Database error in delete car: {e}")
+        app.logger.error(f"Database error in delete car: {e}")
         flash('Error deleting car rental', 'error')
     finally:
         if connection.is_connected():
@@ -4855,6 +5191,36 @@ def admin_delete_car(rental_id):
     return redirect(url_for('admin_cars'))
 
 
+# Each entity is searched on its own connection; entities slower than the timeout are left out
+ADMIN_SEARCH_TIMEOUT = setting('ADMIN_SEARCH_TIMEOUT', 2.0)
+
+ADMIN_SEARCH_QUERIES = {
+    'flights': """
+        SELECT flight_id, flight_number, origin_country, destination_country, 
+               departure_date, airline
+        FROM flights 
+        WHERE flight_number LIKE %s 
+           OR origin_country LIKE %s 
+           OR destination_country LIKE %s 
+           OR airline LIKE %s
+        LIMIT 10
+    """,
+    'hotels': """
+        SELECT hotel_id, hotel_name, location, star_rating
+        FROM hotels 
+        WHERE hotel_name LIKE %s 
+           OR location LIKE %s
+        LIMIT 10
+    """,
+    'cars': """
+        SELECT rental_id, company_name, location
+        FROM car_rentals 
+        WHERE company_name LIKE %s 
+           OR location LIKE %s
+        LIMIT 10
+    """,
+}
+
 @app.route('/admin/search')
 @admin_required
 def admin_global_search():
@@ -4865,56 +5231,31 @@ def admin_global_search():
     if not search_query:
         return render_template('admin/search_results.html', results=results, search_query=search_query)
     
-    connection = get_db_connection()
-    if connection:
-        try:
-            cursor = connection.cursor()
-            search_pattern = f"%{search_query}%"
-            
-            # Search flights
-            cursor.execute("""
-                SELECT flight_id, flight_number, origin_country, destination_country, 
-                       departure_date, airline
-                FROM flights 
-                WHERE flight_number LIKE %s 
-                   OR origin_country LIKE %s 
-                   OR destination_country LIKE %s 
-                   OR airline LIKE %s
-                LIMIT 10
-            """, (search_pattern, search_pattern, search_pattern, search_pattern))
-            results['flights'] = cursor.fetchall() or []
-            
-            # Search hotels
-            cursor.execute("""
-                SELECT hotel_id, hotel_name, location, star_rating
-                FROM hotels 
-                WHERE hotel_name LIKE %s 
-                   OR location LIKE %s
-                LIMIT 10
-            """, (search_pattern, search_pattern))
-            results['hotels'] = cursor.fetchall() or []
-            
-            # Search cars
-            cursor.execute("""
-                SELECT rental_id, company_name, location
-                FROM car_rentals 
-                WHERE company_name LIKE %s 
-                   OR location LIKE %s
-                LIMIT 10
-            """, (search_pattern, search_pattern))
-            results['cars'] = cursor.fetchall() or []
-            
-        except Error as e:
-            print(f"Database error in global search: {e}")
-            flash('Error performing search', 'error')
-        finally:
-            if connection.is_connected():
-                cursor.close()
-                connection.close()
+    search_pattern = f"%{search_query}%"
+    found, failed = query_fan_out.run({entity: (query, (search_pattern,) * query.count('%s'))
+                                       for entity, query in ADMIN_SEARCH_QUERIES.items()},
+                                      ADMIN_SEARCH_TIMEOUT)
+    results.update(found)
+    if failed:
+        flash(f"Showing partial results: searching {', '.join(sorted(failed))} failed or took too long", 'warning')
     
     return render_template('admin/search_results.html', results=results, search_query=search_query)
 
 
+@app.route('/admin/query-stats')
+@admin_required
+def admin_query_stats():
+    """Per-route query totals for this worker process, heaviest routes first"""
+    if request.args.get('reset'):
+        route_query_stats.reset()
+    routes = route_query_stats.snapshot()
+    ordered = sorted(routes.items(), key=lambda item: item[1]['duration_ms'], reverse=True)
+    return jsonify({'pid': os.getpid(), 'routes': dict(ordered), 'pools': db_router.pool_stats()})
+
+
+# Filters are registered above, so every template can be compiled at import time
+warm_template_cache()
+
 # ERROR HANDLERS
 @app.errorhandler(404)
 def not_found_error(error):
@@ -0,0 +1,336 @@
+# asgi.py - ASGI entry point: async MySQL for the read-heavy pages, everything else via WSGI
+#
+# Under WSGI each worker thread blocks on mysql.connector for the whole of a
+# request, so a process serves at most one page per thread. This module
+# serves the I/O-bound read pages natively on an event loop:
+#
+#   POST /search_flights   outbound and return legs queried concurrently
+#   POST /hotels, /cars    search results
+#   GET  /dashboard        the three booking lists queried concurrently
+#
+# Their queries run on an aiomysql pool (ASGI_DB_POOL_SIZE connections per
+# endpoint, replicas used as the replication module would), so one process
+# keeps many queries in flight. The pages are still rendered by the Flask app
+# with the same query builders, templates, session, before/after request
+# hooks and response compression as the WSGI views.
+#
+# Every other request, including GET /hotels and /cars (fragment cached and
+# answered with ETags), is handed to the unchanged WSGI app on a pool of
+# ASGI_WSGI_THREADS threads.
+#
+# The sampling profiler (profiling.py) follows one thread, so it skips the
+# async views, whose thread is the event loop every request shares; the
+# requests handed to the WSGI threads are profiled as usual.
+#
+#   pip install -r requirements-asgi.txt
+#   uvicorn asgi:application --workers 2
+
+import asyncio
+import io
+import itertools
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import flash, g, redirect, render_template, request, session, url_for
+
+try:
+    import aiomysql
+except ImportError:  # only needed for ASGI mode
+    aiomysql = None
+
+from app import (DASHBOARD_QUERIES, DB_CONFIG, app, car_search_query, dashboard_flight_rows,
+                 flash_flight_search_outcome, flight_search_queries, hotel_search_query,
+                 process_cars_data, process_hotels_data, render_listing, search_results_page)
+from compression import CompressionMiddleware
+from config import setting
+from database import current_query_stats, normalize_sql
+from metrics import DB_QUERY_SECONDS, statement_type
+from profiling import EVENT_LOOP_KEY
+from replication import DB_REPLICAS, parse_endpoints
+from tracing import KIND_CLIENT, start_span
+
+ASGI_DB_POOL_SIZE = setting('ASGI_DB_POOL_SIZE', 20)
+ASGI_WSGI_THREADS = setting('ASGI_WSGI_THREADS', 16)
+
+
+class AsyncDatabase:
+    """aiomysql pools for the primary and each replica, opened on first use"""
+
+    def __init__(self, config, replicas=(), size=ASGI_DB_POOL_SIZE):
+        self.config = config
+        self.replicas = list(replicas)
+        self.size = size
+        self._turn = itertools.count()
+        self._pools = {}
+        self._lock = asyncio.Lock()
+
+    def _endpoint(self, role):
+        if role == 'replica' and self.replicas:
+            return self.replicas[next(self._turn) % len(self.replicas)]
+        return self.config['host'], self.config['port']
+
+    async def _pool(self, endpoint):
+        async with self._lock:
+            pool = self._pools.get(endpoint)
+            if pool is None:
+                host, port = endpoint
+                pool = self._pools[endpoint] = await aiomysql.create_pool(
+                    host=host, port=port, user=self.config['user'], password=self.config['password'],
+                    db=self.config['database'], charset=self.config['charset'], autocommit=True,
+                    connect_timeout=self.config['connect_timeout'], minsize=1, maxsize=self.size)
+            return pool
+
+    async def fetchall(self, sql, params=None):
+        """Run one query for the current request and return its rows
+
+        Recorded in the request's query stats, the query metrics and a
+        db.query span just like queries on instrumented sync cursors.
+        """
+        shape = normalize_sql(sql)
+        span = start_span('db.query', kind=KIND_CLIENT, activate=False,
+                          attributes={'db.system': 'mysql', 'db.statement': shape})
+        query = {'sql': shape, 'duration_ms': 0.0, 'rows': 0, 'many': False}
+        started = time.perf_counter()
+        try:
+            pool = await self._pool(self._endpoint(g.get('db_role', 'primary')))
+            async with pool.acquire() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(sql, params)
+                    rows = await cursor.fetchall()
+            query['rows'] = len(rows)
+            return list(rows)
+        except Exception as e:
+            query['error'] = str(e)
+            span.record_error(e)
+            raise
+        finally:
+            query['duration_ms'] = (time.perf_counter() - started) * 1000
+            span.set_attribute('db.rows', query['rows'])
+            span.end()
+            DB_QUERY_SECONDS.observe(query['duration_ms'] / 1000, statement=statement_type(shape))
+            stats = current_query_stats()
+            if stats is not None:
+                stats.queries.append(query)
+
+    async def close(self):
+        for pool in self._pools.values():
+            pool.close()
+            await pool.wait_closed()
+        self._pools.clear()
+
+
+def _database_errors():
+    return (aiomysql.Error, OSError, asyncio.TimeoutError)
+
+
+# ASYNC VIEWS
+
+async def search_flights(db):
+    """POST /search_flights with both legs of a round trip queried at once"""
+    outbound_flights, return_flights = [], []
+    try:
+        outbound, inbound, errors = flight_search_queries(request.form)
+        for message in errors:
+            flash(message, 'error')
+        if inbound:
+            outbound_flights, return_flights = await asyncio.gather(db.fetchall(*outbound),
+                                                                    db.fetchall(*inbound))
+        else:
+            outbound_flights = await db.fetchall(*outbound)
+        flash_flight_search_outcome(request.form, outbound_flights, return_flights)
+    except _database_errors() as e:
+        app.logger.error(f"Database error in search: {e}")
+        flash('Error searching flights. Please try again.', 'error')
+    return search_results_page(outbound_flights, return_flights)
+
+
+async def hotels(db):
+    """POST /hotels search results"""
+    hotels = []
+    try:
+        query, params, errors = hotel_search_query(request.form)
+        for message in errors:
+            flash(message, 'error')
+        hotels = process_hotels_data(await db.fetchall(query, params))
+        if not hotels:
+            flash('No hotels found matching your criteria.', 'info')
+    except _database_errors() as e:
+        app.logger.error(f"Database error in hotels: {e}")
+        flash('Error loading hotels. Please try again.', 'error')
+    return render_template('hotels.html',
+                           hotel_listing=render_listing('partials/hotel_listing.html', hotels=hotels))
+
+
+async def cars(db):
+    """POST /cars search results"""
+    car_rentals = []
+    try:
+        car_rentals = process_cars_data(await db.fetchall(*car_search_query(request.form)))
+        if not car_rentals:
+            flash('No car rentals found matching your criteria.', 'info')
+    except _database_errors() as e:
+        app.logger.error(f"Database error in cars: {e}")
+        flash('Error loading car rentals. Please try again.', 'error')
+    return render_template('cars.html',
+                           car_listing=render_listing('partials/car_listing.html', car_rentals=car_rentals))
+
+
+async def dashboard(db):
+    """GET /dashboard with the three booking lists queried at once"""
+    if 'user_id' not in session:
+        flash('Please log in to view your dashboard', 'error')
+        return redirect(url_for('login'))
+
+    bookings = {section: [] for section in DASHBOARD_QUERIES}
+    try:
+        results = await asyncio.gather(*(db.fetchall(query, (session['user_id'],))
+                                         for query in DASHBOARD_QUERIES.values()))
+        bookings = dict(zip(DASHBOARD_QUERIES, results))
+        bookings['flight_bookings'] = dashboard_flight_rows(bookings['flight_bookings'])
+    except _database_errors() as e:
+        app.logger.error(f"Database error in dashboard: {e}")
+        flash('Error loading bookings', 'error')
+    return render_template('dashboard.html', **bookings)
+
+
+ASYNC_VIEWS = {
+    ('POST', '/search_flights'): search_flights,
+    ('POST', '/hotels'): hotels,
+    ('POST', '/cars'): cars,
+    ('GET', '/dashboard'): dashboard,
+}
+
+
+# ASGI <-> WSGI
+
+def wsgi_environ(scope, body):
+    """PEP 3333 environ for an ASGI HTTP scope"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        key = name.decode('latin-1').upper().replace('-', '_')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = f"HTTP_{key}"
+        value = value.decode('latin-1')
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    # The body has been read in full, so its length is known even for chunked uploads
+    environ['CONTENT_LENGTH'] = str(len(body))
+    return environ
+
+
+def call_wsgi(wsgi_app, environ):
+    """(status code, headers, body) from running a WSGI app to completion"""
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = headers
+
+    chunks = wsgi_app(environ, start_response)
+    try:
+        body = b''.join(chunks)
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+    return started['status'], started['headers'], body
+
+
+async def read_body(receive):
+    body = bytearray()
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return bytes(body)
+
+
+async def send_response(send, status, headers, body):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                            for name, value in headers]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class AsgiApplication:
+    """ASGI app serving ASYNC_VIEWS on the event loop and the rest through flask_app's WSGI interface"""
+
+    def __init__(self, flask_app, db=None, threads=ASGI_WSGI_THREADS):
+        if aiomysql is None:
+            raise RuntimeError('ASGI mode needs aiomysql: pip install -r requirements-asgi.txt')
+        self.flask_app = flask_app
+        self.db = db or AsyncDatabase(DB_CONFIG, parse_endpoints(DB_REPLICAS, DB_CONFIG['port']))
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        environ = wsgi_environ(scope, await read_body(receive))
+        view = ASYNC_VIEWS.get((scope['method'], scope['path']))
+        if view is None:
+            loop = asyncio.get_running_loop()
+            status, headers, body = await loop.run_in_executor(self.executor, call_wsgi,
+                                                               self.flask_app, environ)
+        else:
+            status, headers, body = await self.dispatch(view, environ)
+        await send_response(send, status, headers, body)
+
+    async def dispatch(self, view, environ):
+        """Run an async view inside a Flask request context, with the app's request hooks"""
+        app = self.flask_app
+        environ[EVENT_LOOP_KEY] = True
+        ctx = app.request_context(environ)
+        ctx.push()
+        error = None
+        try:
+            try:
+                try:
+                    rv = app.preprocess_request()
+                    if rv is None:
+                        rv = await view(self.db)
+                except Exception as e:
+                    rv = app.handle_user_exception(e)
+                response = app.finalize_request(rv)
+            except Exception as e:
+                error = e
+                response = app.handle_exception(e)
+            # The Response is itself a WSGI app; run it through the same compression as the WSGI path
+            return call_wsgi(CompressionMiddleware(response), environ)
+        finally:
+            ctx.pop(error)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.db.close()
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+application = AsgiApplication(app)
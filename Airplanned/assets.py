@@ -0,0 +1,239 @@
+# assets.py - Static asset pipeline: minify, fingerprint, precompress and serve
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+
+from flask import request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, .br files are skipped without it
+    brotli = None
+
+# Source files under static/ that go through the pipeline
+ASSET_SOURCES = [
+    'css/style.css',
+    'js/script.js',
+    'js/seat-selection.js',
+    'js/payment.js',
+    'js/flight-filters.js',
+]
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+IMMUTABLE_MAX_AGE = 31536000
+
+
+def minify_css(source):
+    """Strip comments and collapse whitespace in a stylesheet"""
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    source = re.sub(r':\s+', ':', source)
+    return source.replace(';}', '}').strip()
+
+
+# Keywords after which a / starts a regex literal rather than a division
+_JS_REGEX_KEYWORDS = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void',
+                      'throw', 'case', 'do', 'else', 'yield', 'await'}
+_JS_WORD = re.compile(r'[A-Za-z0-9_$]+$')
+
+
+def _regex_allowed(before):
+    """Whether a / following the text before it starts a regex literal"""
+    before = before.rstrip()
+    if not before:
+        return True
+    word = _JS_WORD.search(before)
+    if word:
+        return word.group() in _JS_REGEX_KEYWORDS
+    return before[-1] not in ')]'
+
+
+def _scan_literal(source, i, quote):
+    """Index just past the string or regex literal starting at source[i]"""
+    in_class = False
+    i += 1
+    while i < len(source) and source[i] != '\n':
+        char = source[i]
+        if char == '\\':
+            i += 2
+            continue
+        if quote == '/' and char == '[':
+            in_class = True
+        elif quote == '/' and char == ']':
+            in_class = False
+        elif char == quote and not in_class:
+            return i + 1
+        i += 1
+    return i
+
+
+def _js_tokens(source):
+    """Split source into ('code', text) and ('literal', text) pieces, dropping comments
+
+    Strings, template literals and regex literals are literal pieces. Code
+    inside a template's ${...} is scanned as code, so comments in it are
+    dropped and strings in it kept. A comment becomes a space, or a newline
+    if it spanned lines, so the tokens around it stay apart.
+    """
+    code = []
+    # The end of what precedes the current position; a literal counts as a value
+    before = ''
+    # One entry per open ${: the brace depth inside it, so its closing } is found
+    templates = []
+    i = 0
+    while i < len(source):
+        char = source[i]
+        following = source[i + 1:i + 2]
+        if char in '\'"' or (char == '/' and following not in '/*' and _regex_allowed(before)):
+            end = _scan_literal(source, i, char)
+        elif char == '`' or (char == '}' and templates and templates[-1] == 0):
+            if char == '}':
+                templates.pop()
+            # Template text runs to the closing backtick or the next ${
+            end = i + 1
+            while end < len(source) and source[end] != '`' and not source.startswith('${', end):
+                end += 2 if source[end] == '\\' else 1
+            if source.startswith('${', end):
+                templates.append(0)
+                end += 2
+            else:
+                end += 1
+        elif char == '/' and following == '/':
+            end = source.find('\n', i)
+            i = len(source) if end < 0 else end
+            continue
+        elif char == '/' and following == '*':
+            end = source.find('*/', i + 2)
+            end = len(source) if end < 0 else end + 2
+            code.append('\n' if '\n' in source[i:end] else ' ')
+            before += ' '
+            i = end
+            continue
+        else:
+            if templates and char in '{}':
+                templates[-1] += 1 if char == '{' else -1
+            code.append(char)
+            before = before[-31:] + char
+            i += 1
+            continue
+        if code:
+            yield 'code', ''.join(code)
+            code = []
+        yield 'literal', source[i:end]
+        before = 'x'
+        i = end
+    if code:
+        yield 'code', ''.join(code)
+
+
+def minify_js(source):
+    """Conservative JavaScript minification
+
+    Removes comments, indentation, trailing whitespace and blank lines.
+    Source is scanned token by token, so comment markers inside strings,
+    template literals and regex literals are left alone, and those literals
+    are copied unchanged. Line breaks between statements are kept, so
+    automatic semicolon insertion still applies. A / is read as a regex
+    after an operator, an opening bracket or a keyword such as return, and
+    as a division otherwise, which holds for ordinary code but is not a
+    full JavaScript parser.
+    """
+    output = []
+    for kind, text in _js_tokens(source):
+        output.append(re.sub(r'[ \t\r]*\n\s*', '\n', text) if kind == 'code' else text)
+    return ''.join(output).strip() + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def build_assets(static_folder):
+    """Minify, content-hash and precompress every asset into static/dist
+
+    Writes static/dist/manifest.json mapping each source path to its
+    fingerprinted path and returns that mapping.
+    """
+    manifest = {}
+    for source_path in ASSET_SOURCES:
+        with open(os.path.join(static_folder, source_path), encoding='utf-8') as f:
+            source = f.read()
+
+        base, ext = os.path.splitext(source_path)
+        minified = MINIFIERS[ext](source).encode('utf-8')
+        digest = hashlib.sha256(minified).hexdigest()[:12]
+        built_path = f"{DIST_DIR}/{base}.{digest}{ext}"
+
+        target = os.path.join(static_folder, built_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(minified)
+        with open(target + '.gz', 'wb') as f:
+            f.write(gzip.compress(minified, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(target + '.br', 'wb') as f:
+                f.write(brotli.compress(minified, quality=11))
+
+        manifest[source_path] = built_path
+        print(f"{source_path}: {len(source.encode('utf-8'))} -> {len(minified)} bytes ({built_path})")
+
+    with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder):
+    """Return the build manifest, or an empty mapping when assets haven't been built"""
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def init_assets(app):
+    """Register the asset_url template helper and the fingerprinted asset route"""
+    manifest = load_manifest(app.static_folder)
+    dist_folder = os.path.join(app.static_folder, DIST_DIR)
+
+    @app.template_global('asset_url')
+    def asset_url(filename):
+        """URL of the built asset when available, the plain static file otherwise"""
+        return url_for('static', filename=manifest.get(filename, filename))
+
+    @app.route(f"{app.static_url_path}/{DIST_DIR}/<path:filename>", endpoint='dist_asset')
+    def dist_asset(filename):
+        """Serve fingerprinted assets, precompressed when the client accepts it"""
+        accepted = request.accept_encodings
+        encoding = None
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if accepted[candidate] and os.path.isfile(os.path.join(dist_folder, filename + suffix)):
+                encoding = candidate
+                break
+
+        if encoding:
+            suffix = '.br' if encoding == 'br' else '.gz'
+            response = send_from_directory(dist_folder, filename + suffix, max_age=IMMUTABLE_MAX_AGE)
+            response.headers['Content-Encoding'] = encoding
+            response.mimetype = 'text/css' if filename.endswith('.css') else 'application/javascript'
+        else:
+            response = send_from_directory(dist_folder, filename, max_age=IMMUTABLE_MAX_AGE)
+
+        response.vary.add('Accept-Encoding')
+        response.cache_control.immutable = True
+        return response
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Minify, fingerprint and precompress static assets"""
+        manifest.clear()
+        manifest.update(build_assets(app.static_folder))
+
+
+if __name__ == '__main__':
+    build_assets(sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), 'static'))
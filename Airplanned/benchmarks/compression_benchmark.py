@@ -0,0 +1,84 @@
+# compression_benchmark.py - Payload size and CPU cost of gzip/brotli on real pages
+#
+# Renders the flight search results and admin flight list with synthetic rows
+# and reports the compressed size and per-response CPU time for each setting.
+#
+#   python benchmarks/compression_benchmark.py [rows]
+
+import os
+import sys
+import time
+import zlib
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template
+
+# Only templates are rendered; no payment is ever taken
+os.environ.setdefault('PAYMENT_GATEWAY', 'stub')
+
+from app import app
+from compression import brotli
+
+AIRLINES = ['AirPlanned', 'SkyWays', 'BlueJet', 'Coastal Air']
+CITIES = [('New York', 'JFK'), ('Los Angeles', 'LAX'), ('Chicago', 'ORD'),
+          ('Miami', 'MIA'), ('Seattle', 'SEA'), ('Denver', 'DEN')]
+REPEAT = 20
+
+
+def synthetic_flights(count):
+    """Rows shaped like SELECT * FROM flights"""
+    flights = []
+    for i in range(count):
+        origin = CITIES[i % len(CITIES)]
+        destination = CITIES[(i + 1) % len(CITIES)]
+        flights.append((
+            i + 1, f"AP{1000 + i}", origin[0], destination[0], origin[1], destination[1],
+            date.today() + timedelta(days=i % 30), timedelta(hours=6 + i % 12),
+            timedelta(hours=9 + i % 12), 'Boeing 737', 180, 180 - i % 180,
+            199.0 + i % 400, AIRLINES[i % len(AIRLINES)],
+        ))
+    return flights
+
+
+def render_pages(rows):
+    flights = synthetic_flights(rows)
+    with app.test_request_context('/'):
+        search = render_template(
+            'search_results.html', outbound_flights=flights, return_flights=flights,
+            trip_type='round-trip',
+            search_params={'origin': 'New York', 'destination': 'Los Angeles', 'passengers': '1'})
+    with app.test_request_context('/admin/flights'):
+        admin = render_template('admin/flights.html', flights=flights, search_query='')
+    return {'search_results': search.encode('utf-8'), 'admin_flights': admin.encode('utf-8')}
+
+
+def compressors():
+    settings = [(f"gzip-{level}", lambda data, level=level: _gzip(data, level)) for level in (1, 6, 9)]
+    if brotli is not None:
+        settings += [(f"br-{quality}", lambda data, quality=quality: brotli.compress(data, quality=quality))
+                     for quality in (1, 5, 11)]
+    return settings
+
+
+def _gzip(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    for page, body in render_pages(rows).items():
+        print(f"\n{page} ({rows} flights): {len(body)} bytes raw")
+        print(f"  {'setting':<10}{'bytes':>10}{'ratio':>8}{'cpu ms':>10}")
+        for name, compress in compressors():
+            start = time.process_time()
+            for _ in range(REPEAT):
+                data = compress(body)
+            cpu_ms = (time.process_time() - start) * 1000 / REPEAT
+            print(f"  {name:<10}{len(data):>10}{len(body) / len(data):>8.1f}{cpu_ms:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,503 @@
+# datagen.py - Synthetic data at millions-of-rows scale
+#
+# Generates referentially consistent users, flights, hotels, car rentals and
+# flight/hotel/car booking histories (plus airports and airlines when the
+# legacy schema.sql tables exist). Rows are produced as streams and loaded in
+# batches either as multi-row INSERTs or through LOAD DATA LOCAL INFILE, so
+# memory use stays flat however many rows are requested.
+#
+# Primary keys are assigned here, continuing from the current MAX(id) of
+# each table, so bookings can reference users and flights without reading
+# anything back. available_seats is kept equal to total_seats minus the
+# confirmed bookings generated for each flight.
+#
+#   python benchmarks/datagen.py --scale 0.1                    # ~300k rows
+#   python benchmarks/datagen.py --scale 2 --method infile      # ~6M rows
+#   python benchmarks/datagen.py --flights 1000000 --users 0    # reuse existing users
+
+import argparse
+import csv
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mysql.connector
+from werkzeug.security import generate_password_hash
+
+# Row counts at --scale 1 (about 3 million rows including bookings)
+BASE_COUNTS = {
+    'users': 100000,
+    'flights': 200000,
+    'hotels': 10000,
+    'cars': 5000,
+    'hotel_bookings': 500000,
+    'car_bookings': 300000,
+}
+
+# code, name, city, country, timezone, latitude, longitude
+AIRPORTS = [
+    ('BAH', 'Bahrain International Airport', 'Manama', 'Bahrain', 'Asia/Bahrain', 26.2708, 50.6336),
+    ('DOH', 'Hamad International Airport', 'Doha', 'Qatar', 'Asia/Qatar', 25.2731, 51.6081),
+    ('DXB', 'Dubai International Airport', 'Dubai', 'UAE', 'Asia/Dubai', 25.2532, 55.3657),
+    ('AUH', 'Abu Dhabi International Airport', 'Abu Dhabi', 'UAE', 'Asia/Dubai', 24.4330, 54.6511),
+    ('KWI', 'Kuwait International Airport', 'Kuwait City', 'Kuwait', 'Asia/Kuwait', 29.2266, 47.9689),
+    ('RUH', 'King Khalid International Airport', 'Riyadh', 'Saudi Arabia', 'Asia/Riyadh', 24.9576, 46.6988),
+    ('JED', 'King Abdulaziz International Airport', 'Jeddah', 'Saudi Arabia', 'Asia/Riyadh', 21.6796, 39.1565),
+    ('DMM', 'King Fahd International Airport', 'Dammam', 'Saudi Arabia', 'Asia/Riyadh', 26.4712, 49.7979),
+    ('MCT', 'Muscat International Airport', 'Muscat', 'Oman', 'Asia/Muscat', 23.5933, 58.2844),
+    ('CAI', 'Cairo International Airport', 'Cairo', 'Egypt', 'Africa/Cairo', 30.1219, 31.4056),
+    ('AMM', 'Queen Alia International Airport', 'Amman', 'Jordan', 'Asia/Amman', 31.7226, 35.9932),
+    ('BEY', 'Beirut-Rafic Hariri International Airport', 'Beirut', 'Lebanon', 'Asia/Beirut', 33.8209, 35.4884),
+    ('IST', 'Istanbul Airport', 'Istanbul', 'Turkey', 'Europe/Istanbul', 41.2753, 28.7519),
+    ('LHR', 'Heathrow Airport', 'London', 'United Kingdom', 'Europe/London', 51.4700, -0.4543),
+    ('CDG', 'Charles de Gaulle Airport', 'Paris', 'France', 'Europe/Paris', 49.0097, 2.5479),
+    ('FRA', 'Frankfurt Airport', 'Frankfurt', 'Germany', 'Europe/Berlin', 50.0379, 8.5622),
+    ('AMS', 'Amsterdam Airport Schiphol', 'Amsterdam', 'Netherlands', 'Europe/Amsterdam', 52.3105, 4.7683),
+    ('DEL', 'Indira Gandhi International Airport', 'Delhi', 'India', 'Asia/Kolkata', 28.5562, 77.1000),
+    ('BOM', 'Chhatrapati Shivaji Maharaj International Airport', 'Mumbai', 'India', 'Asia/Kolkata', 19.0896, 72.8656),
+    ('COK', 'Cochin International Airport', 'Kochi', 'India', 'Asia/Kolkata', 10.1520, 76.4019),
+    ('KHI', 'Jinnah International Airport', 'Karachi', 'Pakistan', 'Asia/Karachi', 24.9065, 67.1608),
+    ('MNL', 'Ninoy Aquino International Airport', 'Manila', 'Philippines', 'Asia/Manila', 14.5086, 121.0194),
+    ('BKK', 'Suvarnabhumi Airport', 'Bangkok', 'Thailand', 'Asia/Bangkok', 13.6900, 100.7501),
+    ('SIN', 'Singapore Changi Airport', 'Singapore', 'Singapore', 'Asia/Singapore', 1.3644, 103.9915),
+    ('KUL', 'Kuala Lumpur International Airport', 'Kuala Lumpur', 'Malaysia', 'Asia/Kuala_Lumpur', 2.7456, 101.7072),
+    ('NBO', 'Jomo Kenyatta International Airport', 'Nairobi', 'Kenya', 'Africa/Nairobi', -1.3192, 36.9278),
+    ('JFK', 'John F. Kennedy International Airport', 'New York', 'USA', 'America/New_York', 40.6413, -73.7781),
+]
+
+# code, name, country, hub airport
+AIRLINES = [
+    ('GF', 'Gulf Air', 'Bahrain', 'BAH'), ('QR', 'Qatar Airways', 'Qatar', 'DOH'),
+    ('EK', 'Emirates', 'UAE', 'DXB'), ('EY', 'Etihad Airways', 'UAE', 'AUH'),
+    ('KU', 'Kuwait Airways', 'Kuwait', 'KWI'), ('SV', 'Saudia', 'Saudi Arabia', 'JED'),
+    ('WY', 'Oman Air', 'Oman', 'MCT'), ('MS', 'EgyptAir', 'Egypt', 'CAI'),
+    ('RJ', 'Royal Jordanian', 'Jordan', 'AMM'), ('TK', 'Turkish Airlines', 'Turkey', 'IST'),
+    ('BA', 'British Airways', 'United Kingdom', 'LHR'), ('LH', 'Lufthansa', 'Germany', 'FRA'),
+    ('AI', 'Air India', 'India', 'DEL'), ('SQ', 'Singapore Airlines', 'Singapore', 'SIN'),
+    ('TG', 'Thai Airways', 'Thailand', 'BKK'),
+]
+
+# name, seats, maximum range in km
+AIRCRAFT = [
+    ('Airbus A320', 150, 5000), ('Boeing 737', 160, 5000), ('Airbus A321', 180, 6000),
+    ('Boeing 787', 280, 13000), ('Airbus A350', 300, 15000), ('Boeing 777', 350, 15000),
+]
+
+HOTEL_BRANDS = ['Four Seasons', 'Hilton', 'Marriott', 'Sheraton', 'Radisson Blu', 'InterContinental',
+                'Novotel', 'Holiday Inn', 'Crowne Plaza', 'Movenpick', 'Rotana', 'Ibis', 'Westin']
+HOTEL_AREAS = ['Bay', 'City Centre', 'Airport', 'Marina', 'Old Town', 'Business District', 'Corniche', 'Seef']
+AMENITIES = ['WiFi', 'Pool', 'Spa', 'Restaurant', 'Gym', 'Beach Access', 'Business Center',
+             'Conference Rooms', 'Rooftop Bar', 'Kids Club', 'Airport Shuttle']
+ROOM_TYPES = {'standard': 1.0, 'deluxe': 1.3, 'suite': 1.8, 'penthouse': 2.5}
+
+CAR_COMPANIES = ['Avis', 'Hertz', 'Europcar', 'Enterprise', 'Sixt', 'Budget', 'Thrifty', 'Alamo']
+CAR_MODELS = {
+    'Economy': ['Toyota Corolla', 'Hyundai Elantra', 'Kia Rio'],
+    'Compact': ['Honda Civic', 'Mazda 3'],
+    'Mid-size': ['Nissan Altima', 'Toyota Camry'],
+    'SUV': ['Ford Explorer', 'Toyota Prado', 'Nissan Patrol'],
+    'Luxury': ['BMW 3 Series', 'Mercedes E-Class'],
+    'Van': ['Toyota Hiace', 'Hyundai H1'],
+}
+CAR_MULTIPLIERS = {'Economy': 1.0, 'Compact': 1.2, 'Mid-size': 1.4, 'SUV': 1.8, 'Luxury': 2.5, 'Van': 2.0}
+
+FIRST_NAMES = ['Ahmed', 'Fatima', 'Ali', 'Maryam', 'Mohammed', 'Aisha', 'Hassan', 'Zainab', 'Omar',
+               'Sara', 'Yusuf', 'Noor', 'John', 'Jane', 'David', 'Emma', 'Raj', 'Priya', 'Jose', 'Maria']
+LAST_NAMES = ['Al-Khalifa', 'Al-Mansoori', 'Hassan', 'Ibrahim', 'Rahman', 'Saleh', 'Haddad', 'Nasser',
+              'Smith', 'Johnson', 'Brown', 'Patel', 'Sharma', 'Santos', 'Garcia', 'Khan']
+SEAT_LETTERS = 'ABCDEFGHJK'
+PROGRESS_INTERVAL = 5
+
+
+def haversine_km(a, b):
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[5], a[6], b[5], b[6]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371 * 2 * math.asin(math.sqrt(h))
+
+
+def person(user_id):
+    """Deterministic name, email and phone for a user id, so bookings can reuse them"""
+    first = FIRST_NAMES[user_id * 7919 % len(FIRST_NAMES)]
+    last = LAST_NAMES[user_id * 104729 % len(LAST_NAMES)]
+    email = f"{first}.{last}.{user_id}@example.com".lower().replace('-', '')
+    phone = f"+973-{3000 + user_id % 1000:04d}-{user_id % 10000:04d}"
+    return first, last, email, phone
+
+
+def seat_label(index, seats_per_row):
+    return f"{index // seats_per_row + 1}{SEAT_LETTERS[index % seats_per_row]}"
+
+
+def clock(minutes):
+    minutes %= 24 * 60
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:00"
+
+
+class Loader:
+    """Buffers generated rows per table and loads them in batches"""
+
+    def __init__(self, connection, batch_size):
+        self.connection = connection
+        self.cursor = connection.cursor()
+        self.batch_size = batch_size
+        self.buffers = {}
+        self.loaded = {}
+
+    def add(self, table, columns, row):
+        buffer = self.buffers.setdefault((table, columns), [])
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.flush(table, columns)
+
+    def flush(self, table, columns):
+        rows = self.buffers.get((table, columns))
+        if not rows:
+            return
+        self.load(table, columns, rows)
+        self.connection.commit()
+        self.loaded[table] = self.loaded.get(table, 0) + len(rows)
+        rows.clear()
+
+    def flush_all(self):
+        for table, columns in list(self.buffers):
+            self.flush(table, columns)
+
+    def load(self, table, columns, rows):
+        raise NotImplementedError
+
+
+class InsertLoader(Loader):
+    """Multi-row INSERT: the connector folds each executemany batch into one statement"""
+
+    def load(self, table, columns, rows):
+        placeholders = ', '.join(['%s'] * len(columns))
+        self.cursor.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+
+class InfileLoader(Loader):
+    """LOAD DATA LOCAL INFILE from a temporary CSV per batch
+
+    Needs local_infile enabled on the server; the connection is opened with
+    allow_local_infile for the client side.
+    """
+
+    def load(self, table, columns, rows):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', encoding='utf-8', delete=False) as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerows(['NULL' if v is None else v for v in row] for row in rows)
+            path = f.name
+        try:
+            self.cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} CHARACTER SET utf8mb4 "
+                "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+                f"LINES TERMINATED BY '\\n' ({', '.join(columns)})", (path,))
+        finally:
+            os.unlink(path)
+
+
+class DataGenerator:
+    def __init__(self, connection, loader, counts, load_factor=0.05, past_days=365, future_days=180, rng=None):
+        self.connection = connection
+        self.loader = loader
+        self.counts = counts
+        self.load_factor = load_factor
+        self.past_days = past_days
+        self.future_days = future_days
+        self.rng = rng or random.Random(42)
+        self.today = date.today()
+        self.cursor = connection.cursor()
+        self.last_progress = time.monotonic()
+
+    def table_exists(self, table):
+        self.cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.tables
+            WHERE table_schema = DATABASE() AND table_name = %s
+        """, (table,))
+        return self.cursor.fetchone()[0] > 0
+
+    def next_id(self, table, column):
+        self.cursor.execute(f"SELECT COALESCE(MAX({column}), 0) + 1 FROM {table}")
+        return self.cursor.fetchone()[0]
+
+    def progress(self, label, done, total, started):
+        """Print a progress line every few seconds and once at the end"""
+        now = time.monotonic()
+        if done == total or now - self.last_progress >= PROGRESS_INTERVAL:
+            self.last_progress = now
+            rate = done / max(now - started, 1e-9)
+            print(f"  {label}: {done:,}/{total:,} ({rate:,.0f} rows/s)", flush=True)
+
+    def reference_tables(self):
+        """airports/airlines only exist in the legacy schema.sql; fill them when present"""
+        if self.table_exists('airports'):
+            self.cursor.execute("SELECT airport_code FROM airports")
+            existing = {row[0] for row in self.cursor.fetchall()}
+            for code, name, city, country, tz, lat, lon in AIRPORTS:
+                if code not in existing:
+                    self.loader.add('airports', ('airport_code', 'airport_name', 'city', 'country',
+                                                 'timezone', 'latitude', 'longitude'),
+                                    (code, name, city, country, tz, lat, lon))
+        if self.table_exists('airlines'):
+            self.cursor.execute("SELECT airline_code FROM airlines")
+            existing = {row[0] for row in self.cursor.fetchall()}
+            for code, name, country, _ in AIRLINES:
+                if code not in existing:
+                    self.loader.add('airlines', ('airline_code', 'airline_name', 'country'), (code, name, country))
+        self.loader.flush_all()
+
+    def users(self):
+        """Insert users and return the id range bookings may reference"""
+        count = self.counts['users']
+        if not count:
+            self.cursor.execute("SELECT MIN(user_id), MAX(user_id) FROM users")
+            low, high = self.cursor.fetchone()
+            if low is None:
+                sys.exit('No users to attach bookings to; generate some with --users')
+            return low, high
+
+        # Hashing is deliberately slow, so every generated account shares one
+        password_hash = generate_password_hash('password123')
+        first_id = self.next_id('users', 'user_id')
+        columns = ('user_id', 'first_name', 'last_name', 'email', 'password', 'phone_number', 'created_at')
+        started = time.monotonic()
+        for n in range(count):
+            user_id = first_id + n
+            first, last, email, phone = person(user_id)
+            created = datetime.now() - timedelta(days=self.rng.randrange(3 * 365), seconds=self.rng.randrange(86400))
+            self.loader.add('users', columns, (user_id, first, last, email, password_hash, phone, created))
+            self.progress('users', n + 1, count, started)
+        self.loader.flush_all()
+        return first_id, first_id + count - 1
+
+    def flights(self, user_range):
+        """Flights weighted towards hub routes, each with its passenger bookings"""
+        count = self.counts['flights']
+        airports = {a[0]: a for a in AIRPORTS}
+        codes = list(airports)
+        # Bahrain and the big Gulf hubs carry most of the traffic
+        weights = [8 if code == 'BAH' else 4 if code in ('DOH', 'DXB', 'RUH', 'JED') else 1 for code in codes]
+
+        first_id = self.next_id('flights', 'flight_id')
+        flight_columns = ('flight_id', 'flight_number', 'origin_country', 'destination_country',
+                          'origin_airport', 'destination_airport', 'departure_date', 'departure_time',
+                          'arrival_time', 'aircraft_type', 'total_seats', 'available_seats', 'price', 'airline')
+        booking_columns = ('user_id', 'flight_id', 'booking_date', 'seat_number', 'payment_status',
+                           'total_amount', 'passenger_name', 'passenger_email', 'passenger_phone',
+                           'booking_status', 'payment_date')
+        started = time.monotonic()
+        for n in range(count):
+            flight_id = first_id + n
+            origin_code, destination_code = self.rng.choices(codes, weights, k=2)
+            if origin_code == destination_code:
+                destination_code = codes[(codes.index(origin_code) + 1) % len(codes)]
+            origin, destination = airports[origin_code], airports[destination_code]
+            distance = haversine_km(origin, destination)
+
+            aircraft, seats, _ = self.rng.choice([a for a in AIRCRAFT if a[2] >= distance] or AIRCRAFT[-1:])
+            airline = self.rng.choice([a for a in AIRLINES if a[3] in (origin_code, destination_code)] or AIRLINES)
+            departure_date = self.today + timedelta(days=self.rng.randint(-self.past_days, self.future_days))
+            departure = self.rng.randrange(0, 24 * 60, 5)
+            duration = int(distance / 800 * 60) + 30
+            price = round((40 + distance * 0.11) * self.rng.uniform(0.8, 1.4), 2)
+
+            # Older flights are fuller; far-off ones have barely started selling
+            days_out = (departure_date - self.today).days
+            fill = self.load_factor * (1.5 if days_out < 0 else max(0.2, 1 - days_out / self.future_days))
+            booked = min(seats, int(self.rng.gauss(seats * fill, seats * fill * 0.3 + 1)) if fill else 0)
+            booked = max(booked, 0)
+            seats_per_row = 6 if seats <= 200 else 9
+
+            confirmed = 0
+            for seat_index in range(booked):
+                user_id = self.rng.randint(*user_range)
+                first, last, email, phone = person(user_id)
+                booked_on = departure_date - timedelta(days=self.rng.randint(1, 120))
+                if self.rng.random() < 0.05:
+                    booking_status, payment_status, paid_on = 'Cancelled', 'Refunded', booked_on
+                elif departure_date < self.today or self.rng.random() < 0.85:
+                    booking_status, payment_status, paid_on = 'Confirmed', 'Paid', booked_on
+                    confirmed += 1
+                else:
+                    booking_status, payment_status, paid_on = 'Confirmed', 'Pending', None
+                    confirmed += 1
+                self.loader.add('flight_bookings', booking_columns, (
+                    user_id, flight_id, datetime.combine(booked_on, datetime.min.time()),
+                    seat_label(seat_index, seats_per_row), payment_status, price,
+                    f"{first} {last}", email, phone, booking_status, paid_on))
+
+            self.loader.add('flights', flight_columns, (
+                flight_id, f"{airline[0]}{flight_id}", origin[2], destination[2], origin_code, destination_code,
+                departure_date, clock(departure), clock(departure + duration), aircraft, seats,
+                seats - confirmed, price, airline[1]))
+            self.progress('flights', n + 1, count, started)
+        self.loader.flush_all()
+
+    def hotels(self):
+        count = self.counts['hotels']
+        first_id = self.next_id('hotels', 'hotel_id')
+        columns = ('hotel_id', 'hotel_name', 'location', 'star_rating', 'amenities', 'contact_info',
+                   'price_per_night', 'availability')
+        prices = []
+        for n in range(count):
+            airport = self.rng.choice(AIRPORTS)
+            stars = self.rng.choices([2, 3, 4, 5], [1, 3, 4, 2])[0]
+            price = round(self.rng.uniform(25, 60) * stars * self.rng.uniform(0.8, 1.6), 2)
+            prices.append(price)
+            self.loader.add('hotels', columns, (
+                first_id + n,
+                f"{self.rng.choice(HOTEL_BRANDS)} {airport[2]} {self.rng.choice(HOTEL_AREAS)} {first_id + n}",
+                f"{airport[2]}, {airport[3]}", stars, ', '.join(self.rng.sample(AMENITIES, 2 + stars)),
+                f"+{self.rng.randint(900, 999)}-{self.rng.randint(1000, 9999)}-{self.rng.randint(1000, 9999)}",
+                price, self.rng.randint(0, 120)))
+        self.loader.flush_all()
+        return first_id, prices
+
+    def cars(self):
+        count = self.counts['cars']
+        first_id = self.next_id('car_rentals', 'rental_id')
+        columns = ('rental_id', 'company_name', 'location', 'car_types', 'availability', 'contact_info',
+                   'price_per_day')
+        prices = []
+        for n in range(count):
+            airport = self.rng.choice(AIRPORTS)
+            types = self.rng.sample(list(CAR_MODELS), self.rng.randint(2, 5))
+            price = round(self.rng.uniform(25, 95), 2)
+            prices.append(price)
+            self.loader.add('car_rentals', columns, (
+                first_id + n, f"{self.rng.choice(CAR_COMPANIES)} {airport[3]} {first_id + n}",
+                self.rng.choice([airport[1], f"{airport[2]} City Center"]),
+                ', '.join(f"{t} ({self.rng.choice(CAR_MODELS[t])})" for t in types),
+                self.rng.randint(0, 60),
+                f"+{self.rng.randint(900, 999)}-{self.rng.randint(1000, 9999)}-{self.rng.randint(1000, 9999)}",
+                price))
+        self.loader.flush_all()
+        return first_id, prices
+
+    def stay_dates(self, max_days):
+        start = self.today + timedelta(days=self.rng.randint(-self.past_days, self.future_days))
+        end = start + timedelta(days=self.rng.randint(1, max_days))
+        booked_on = start - timedelta(days=self.rng.randint(0, 90))
+        return start, end, booked_on
+
+    def booking_state(self, start, finished, in_progress):
+        if self.rng.random() < 0.05:
+            return 'Cancelled', 'Refunded'
+        if start < self.today:
+            return finished, 'Paid'
+        if start == self.today:
+            return in_progress, 'Paid'
+        return 'Confirmed', 'Paid' if self.rng.random() < 0.8 else 'Pending'
+
+    def hotel_bookings(self, user_range, hotels):
+        count = self.counts['hotel_bookings']
+        first_hotel, prices = hotels
+        if not prices:
+            return
+        columns = ('user_id', 'hotel_id', 'check_in_date', 'check_out_date', 'room_type', 'payment_status',
+                   'total_amount', 'guest_name', 'guest_email', 'guest_phone', 'booking_date', 'booking_status')
+        started = time.monotonic()
+        for n in range(count):
+            user_id = self.rng.randint(*user_range)
+            first, last, email, phone = person(user_id)
+            index = self.rng.randrange(len(prices))
+            check_in, check_out, booked_on = self.stay_dates(10)
+            room_type = self.rng.choices(list(ROOM_TYPES), [6, 3, 1, 0.2])[0]
+            status, payment = self.booking_state(check_in, 'Checked-Out', 'Checked-In')
+            total = round(prices[index] * ROOM_TYPES[room_type] * (check_out - check_in).days, 2)
+            self.loader.add('hotel_bookings', columns, (
+                user_id, first_hotel + index, check_in, check_out, room_type, payment, total,
+                f"{first} {last}", email, phone, booked_on, status))
+            self.progress('hotel_bookings', n + 1, count, started)
+        self.loader.flush_all()
+
+    def car_bookings(self, user_range, cars):
+        count = self.counts['car_bookings']
+        first_rental, prices = cars
+        if not prices:
+            return
+        columns = ('user_id', 'rental_id', 'pickup_date', 'return_date', 'car_type', 'payment_status',
+                   'total_amount', 'renter_name', 'renter_email', 'renter_phone', 'booking_date', 'booking_status')
+        started = time.monotonic()
+        for n in range(count):
+            user_id = self.rng.randint(*user_range)
+            first, last, email, phone = person(user_id)
+            index = self.rng.randrange(len(prices))
+            pickup, drop_off, booked_on = self.stay_dates(14)
+            car_type = self.rng.choices(list(CAR_MULTIPLIERS), [6, 4, 3, 3, 1, 1])[0]
+            status, payment = self.booking_state(pickup, 'Returned', 'Picked-Up')
+            total = round(prices[index] * CAR_MULTIPLIERS[car_type] * (drop_off - pickup).days, 2)
+            self.loader.add('car_bookings', columns, (
+                user_id, first_rental + index, pickup, drop_off, car_type, payment, total,
+                f"{first} {last}", email, phone, booked_on, status))
+            self.progress('car_bookings', n + 1, count, started)
+        self.loader.flush_all()
+
+    def run(self):
+        # Keys are generated consistently here, and hotel and car rental names end in
+        # the row's id so their (name, location) keys are unique; skip the per-row checks
+        self.cursor.execute("SET SESSION unique_checks = 0, foreign_key_checks = 0")
+        try:
+            self.reference_tables()
+            user_range = self.users()
+            self.flights(user_range)
+            hotels = self.hotels()
+            cars = self.cars()
+            self.hotel_bookings(user_range, hotels)
+            self.car_bookings(user_range, cars)
+        finally:
+            self.cursor.execute("SET SESSION unique_checks = 1, foreign_key_checks = 1")
+        return self.loader.loaded
+
+
+def connect(method):
+    """Open a non-autocommit connection using the application's DB_CONFIG"""
+    from app import DB_CONFIG
+    options = {**DB_CONFIG, 'autocommit': False}
+    if method == 'infile':
+        options['allow_local_infile'] = True
+    return mysql.connector.connect(**options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic AirPlanned data at scale')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiplier for the default row counts (1.0 is about 3M rows)')
+    for name, count in BASE_COUNTS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, dest=name,
+                            help=f"rows to generate (default {count:,} x scale)")
+    parser.add_argument('--load-factor', type=float, default=0.05,
+                        help='average share of seats booked on near-term flights')
+    parser.add_argument('--method', choices=['insert', 'infile'], default='insert',
+                        help='multi-row INSERT or LOAD DATA LOCAL INFILE')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--random-seed', type=int, default=42)
+    args = parser.parse_args()
+
+    counts = {name: getattr(args, name) if getattr(args, name) is not None else int(count * args.scale)
+              for name, count in BASE_COUNTS.items()}
+    connection = connect(args.method)
+    loader_class = InfileLoader if args.method == 'infile' else InsertLoader
+    started = time.monotonic()
+    try:
+        generator = DataGenerator(connection, loader_class(connection, args.batch_size), counts,
+                                  load_factor=args.load_factor, rng=random.Random(args.random_seed))
+        loaded = generator.run()
+    finally:
+        connection.close()
+
+    elapsed = time.monotonic() - started
+    total = sum(loaded.values())
+    for table, rows in loaded.items():
+        print(f"{table:<16}{rows:>12,}")
+    print(f"{'total':<16}{total:>12,} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
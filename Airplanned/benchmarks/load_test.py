@@ -0,0 +1,214 @@
+# load_test.py - Drive the main user flows with concurrent synthetic users
+#
+# Each virtual user logs in as a seeded account (and as admin), then loops
+# over a weighted mix of search_flights, book_flight, confirm_booking,
+# dashboard and admin_global_search until the duration is up. Redirects are
+# not followed, so every sample is the latency of exactly one request.
+#
+#   python benchmarks/seed.py --reset --flights 5000 --users 500
+#   python app.py &
+#   python benchmarks/load_test.py --users 20 --duration 60 --save baseline.json
+#   python benchmarks/load_test.py --users 20 --duration 60 --compare baseline.json
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from seed import BENCH_EMAIL_DOMAIN, BENCH_PASSWORD, BENCH_FLIGHT_PREFIX, SEAT_LETTERS, connect
+
+# Relative frequency of each operation in the mix
+SCENARIO_WEIGHTS = {
+    'search_flights': 40,
+    'book_flight': 20,
+    'confirm_booking': 10,
+    'dashboard': 20,
+    'admin_global_search': 10,
+}
+SEARCH_TERMS = ['Manama', 'Gulf', 'Doha', 'BX00001', 'Bench', 'Dubai', 'Frankfurt']
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def load_targets():
+    """Upcoming seeded flights and the routes between them"""
+    connection = connect()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT flight_id, origin_country, destination_country, departure_date
+            FROM flights
+            WHERE flight_number LIKE %s AND departure_date >= CURDATE() AND available_seats > 0
+            LIMIT 5000
+        """, (f"{BENCH_FLIGHT_PREFIX}%",))
+        flights = cursor.fetchall()
+        cursor.execute("SELECT email FROM users WHERE email LIKE %s LIMIT 5000", (f"%@{BENCH_EMAIL_DOMAIN}",))
+        emails = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+    finally:
+        connection.close()
+    if not flights or not emails:
+        sys.exit('No seeded data found; run benchmarks/seed.py first')
+    return flights, emails
+
+
+class VirtualUser(threading.Thread):
+    def __init__(self, base_url, email, flights, deadline, results, rng):
+        super().__init__(daemon=True)
+        self.base_url = base_url.rstrip('/')
+        self.email = email
+        self.flights = flights
+        self.deadline = deadline
+        self.results = results
+        self.rng = rng
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect())
+
+    def request(self, name, path, data=None, record=True):
+        body = urllib.parse.urlencode(data, doseq=True).encode() if data is not None else None
+        start = time.perf_counter()
+        try:
+            with self.opener.open(self.base_url + path, body, timeout=30) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except (urllib.error.URLError, OSError):
+            status = 0
+        elapsed = time.perf_counter() - start
+        if record:
+            self.results.append((name, elapsed, status))
+        return status
+
+    def login(self):
+        self.request('login', '/login', {'email': self.email, 'password': BENCH_PASSWORD}, record=False)
+        self.request('admin_login', '/admin/login', {'username': 'admin', 'password': 'admin123'}, record=False)
+
+    def search_flights(self):
+        _, origin, destination, departure_date = self.rng.choice(self.flights)
+        form = {'origin': origin, 'destination': destination, 'trip_type': 'one-way', 'passengers': '1'}
+        if self.rng.random() < 0.5:
+            form['departure_date'] = departure_date.isoformat()
+        self.request('search_flights', '/search_flights', form)
+
+    def book_flight(self):
+        flight_id = self.rng.choice(self.flights)[0]
+        self.request('book_flight', f"/book/{flight_id}?passengers=1&class=economy&trip_type=one-way")
+
+    def confirm_booking(self):
+        flight_id = self.rng.choice(self.flights)[0]
+        seat = f"{self.rng.randint(1, 30)}{self.rng.choice(SEAT_LETTERS)}"
+        self.request('confirm_booking', '/confirm_booking', {
+            'outbound_flight_id': flight_id, 'return_flight_id': '', 'trip_type': 'one-way',
+            'outbound_selectedSeats': seat, 'passenger_name': 'Load Test',
+            'passenger_email': self.email, 'passenger_phone': '+973-3000-0000',
+        })
+
+    def dashboard(self):
+        self.request('dashboard', '/dashboard')
+
+    def admin_global_search(self):
+        query = urllib.parse.quote(self.rng.choice(SEARCH_TERMS))
+        self.request('admin_global_search', f"/admin/search?q={query}")
+
+    def run(self):
+        self.login()
+        names = list(SCENARIO_WEIGHTS)
+        weights = list(SCENARIO_WEIGHTS.values())
+        while time.monotonic() < self.deadline:
+            getattr(self, self.rng.choices(names, weights)[0])()
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def summarize(results, elapsed):
+    by_name = {}
+    for name, latency, status in results:
+        by_name.setdefault(name, []).append((latency, status))
+    by_name['ALL'] = [(latency, status) for _, latency, status in results]
+
+    summary = {}
+    for name, samples in by_name.items():
+        latencies = sorted(latency for latency, _ in samples)
+        summary[name] = {
+            'requests': len(samples),
+            'errors': sum(1 for _, status in samples if status == 0 or status >= 500),
+            'rps': round(len(samples) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        }
+    return summary
+
+
+def print_summary(summary, baseline=None):
+    print(f"\n{'operation':<22}{'reqs':>8}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, row in summary.items():
+        print(f"{name:<22}{row['requests']:>8}{row['errors']:>8}{row['rps']:>9}"
+              f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}")
+        if baseline and name in baseline:
+            base = baseline[name]
+            deltas = []
+            for key in ('rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+                if base[key]:
+                    deltas.append(f"{key} {100 * (row[key] - base[key]) / base[key]:+.1f}%")
+            print(f"{'':<22}vs baseline: {', '.join(deltas)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent load test for AirPlanned')
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--users', type=int, default=10, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run')
+    parser.add_argument('--random-seed', type=int, default=1)
+    parser.add_argument('--save', help='write the summary as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON written by an earlier --save')
+    args = parser.parse_args()
+
+    flights, emails = load_targets()
+    rng = random.Random(args.random_seed)
+    results = []
+    deadline = time.monotonic() + args.duration
+    users = [VirtualUser(args.base_url, emails[i % len(emails)], flights, deadline, results,
+                         random.Random(rng.random())) for i in range(args.users)]
+
+    print(f"Running {args.users} users against {args.base_url} for {args.duration:g}s ...")
+    start = time.monotonic()
+    for user in users:
+        user.start()
+    for user in users:
+        user.join()
+    summary = summarize(results, time.monotonic() - start)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_summary(summary, baseline)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# prepared_benchmark.py - Parse overhead of the hottest booking statements, text vs prepared
+#
+# Runs each statement --iterations times on one connection in three modes:
+#
+#   text      plain cursor; the server parses the interpolated SQL every call
+#   prepare   a new prepared cursor per call (prepare, execute, deallocate)
+#   cached    the StatementCache used by pooled connections (prepared once)
+#
+# and reports the mean latency per call along with the server's
+# Com_stmt_prepare/Com_stmt_execute counters, which show how often each
+# mode made MySQL parse the statement.
+#
+#   python benchmarks/prepared_benchmark.py [--iterations 2000]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mysql.connector
+
+from statements import StatementCache
+
+# The statements behind book_flight, the booking seat checks and the confirm_* price lookups
+HOT_STATEMENTS = {
+    'flight lookup': ("""
+        SELECT flight_id, flight_number, origin_country, destination_country,
+               origin_airport, destination_airport, departure_date, departure_time,
+               arrival_time, aircraft_type, total_seats, available_seats, price, airline
+        FROM flights
+        WHERE flight_id = %s AND available_seats >= %s
+    """, lambda ids: (ids['flight'], 1)),
+    'seat count': ("""
+        SELECT COUNT(*)
+        FROM flight_bookings
+        WHERE flight_id = %s AND seat_number = %s AND booking_status = 'Confirmed'
+    """, lambda ids: (ids['flight'], '12A')),
+    'flight price': ("SELECT price FROM flights WHERE flight_id = %s", lambda ids: (ids['flight'],)),
+    'hotel price': ("SELECT price_per_night FROM hotels WHERE hotel_id = %s", lambda ids: (ids['hotel'],)),
+    'car price': ("SELECT price_per_day FROM car_rentals WHERE rental_id = %s", lambda ids: (ids['car'],)),
+}
+
+
+def connect():
+    """Open a connection using the application's DB_CONFIG"""
+    from app import DB_CONFIG
+    return mysql.connector.connect(**DB_CONFIG)
+
+
+def sample_ids(cursor):
+    ids = {}
+    for kind, table, key in (('flight', 'flights', 'flight_id'), ('hotel', 'hotels', 'hotel_id'),
+                             ('car', 'car_rentals', 'rental_id')):
+        cursor.execute(f"SELECT MIN({key}) FROM {table}")
+        ids[kind] = cursor.fetchone()[0] or 1
+    return ids
+
+
+def server_counters(cursor):
+    cursor.execute("SHOW SESSION STATUS WHERE Variable_name IN ('Com_stmt_prepare', 'Com_stmt_execute')")
+    return {name: int(value) for name, value in cursor.fetchall()}
+
+
+def run_text(connection, sql, params, iterations):
+    cursor = connection.cursor()
+    for _ in range(iterations):
+        cursor.execute(sql, params)
+        cursor.fetchall()
+    cursor.close()
+
+
+def run_prepare(connection, sql, params, iterations):
+    for _ in range(iterations):
+        cursor = connection.cursor(prepared=True)
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        cursor.close()
+
+
+def run_cached(connection, sql, params, iterations):
+    cache = StatementCache(connection)
+    for _ in range(iterations):
+        cursor, cached_sql = cache.get(sql)
+        cursor.execute(cached_sql, params)
+        cursor.fetchall()
+    cache.close()
+
+
+MODES = [('text', run_text), ('prepare', run_prepare), ('cached', run_cached)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare text and prepared execution of hot statements')
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    connection = connect()
+    status = connection.cursor()
+    ids = sample_ids(status)
+
+    print(f"{'statement':<15}{'mode':<10}{'us/call':>10}{'prepares':>10}{'executes':>10}")
+    for name, (sql, make_params) in HOT_STATEMENTS.items():
+        params = make_params(ids)
+        # Warm the buffer pool and query paths so the first mode is not penalised
+        run_text(connection, sql, params, 50)
+        for mode, run in MODES:
+            before = server_counters(status)
+            start = time.perf_counter()
+            run(connection, sql, params, args.iterations)
+            elapsed = time.perf_counter() - start
+            after = server_counters(status)
+            # The two SHOW STATUS statements are text queries and do not count here
+            prepares = after['Com_stmt_prepare'] - before['Com_stmt_prepare']
+            executes = after['Com_stmt_execute'] - before['Com_stmt_execute']
+            print(f"{name:<15}{mode:<10}{elapsed * 1e6 / args.iterations:>10.1f}{prepares:>10}{executes:>10}")
+        print()
+
+    status.close()
+    connection.close()
+
+
+if __name__ == '__main__':
+    main()
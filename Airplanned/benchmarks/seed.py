@@ -0,0 +1,186 @@
+# seed.py - Seed the database with a scaled-up copy of the sample data
+#
+# Every seeded row is tagged (BX flight numbers, "Bench" hotels and car
+# companies, @bench.airplanned.test emails) so --reset can remove exactly
+# what a previous run added without touching the real sample data.
+#
+#   python benchmarks/seed.py --flights 5000 --hotels 500 --cars 300 --users 1000 --bookings 20000
+
+import argparse
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mysql.connector
+from werkzeug.security import generate_password_hash
+
+BENCH_EMAIL_DOMAIN = 'bench.airplanned.test'
+BENCH_PASSWORD = 'benchmark'
+BENCH_FLIGHT_PREFIX = 'BX'
+BATCH_SIZE = 1000
+
+# Routes, aircraft and partners taken from airplanned_mysql.sql
+CITIES = [
+    ('Manama', 'BAH'), ('Jeddah', 'JED'), ('Muscat', 'MCT'), ('Cairo', 'CAI'),
+    ('Beirut', 'BEY'), ('Istanbul', 'IST'), ('Frankfurt', 'FRA'), ('Bangkok', 'BKK'),
+    ('Delhi', 'DEL'), ('Kuwait City', 'KWI'), ('Doha', 'DOH'), ('Singapore', 'SIN'),
+    ('London', 'LHR'), ('Dubai', 'DXB'), ('Riyadh', 'RUH'),
+]
+AIRCRAFT = [('Airbus A320', 150), ('Airbus A321', 180), ('Boeing 737', 160),
+            ('Boeing 787', 280), ('Airbus A350', 300)]
+AIRLINES = ['Gulf Air', 'Kuwait Airways', 'Qatar Airways', 'British Airways', 'Lufthansa', 'Emirates']
+HOTEL_LOCATIONS = ['Manama, Bahrain', 'Doha, Qatar', 'Dubai, UAE', 'Kuwait City, Kuwait',
+                   'Riyadh, Saudi Arabia', 'Muscat, Oman', 'Jeddah, Saudi Arabia']
+AMENITIES = ['WiFi', 'Pool', 'Spa', 'Restaurant', 'Gym', 'Beach Access', 'Business Center']
+CAR_LOCATIONS = ['Bahrain International Airport', 'Manama City Center', 'Hamad International Airport',
+                 'Dubai International Airport', 'Kuwait International Airport']
+CAR_TYPES = 'Economy (Toyota Corolla), Compact (Honda Civic), Mid-size (Nissan Altima), SUV (Ford Explorer)'
+FIRST_NAMES = ['Ahmed', 'Fatima', 'Ali', 'Maryam', 'John', 'Jane', 'Omar', 'Sara', 'Yusuf', 'Noor']
+LAST_NAMES = ['Al-Khalifa', 'Hassan', 'Smith', 'Ibrahim', 'Doe', 'Rahman', 'Saleh', 'Brown']
+SEAT_LETTERS = 'ABCDEF'
+
+
+def connect():
+    """Open a connection using the application's DB_CONFIG"""
+    from app import DB_CONFIG
+    return mysql.connector.connect(**{**DB_CONFIG, 'autocommit': False})
+
+
+def insert_rows(cursor, sql, rows):
+    """executemany in batches; the connector folds each batch into one multi-row INSERT"""
+    for start in range(0, len(rows), BATCH_SIZE):
+        cursor.executemany(sql, rows[start:start + BATCH_SIZE])
+
+
+def seat_number(index):
+    return f"{index // len(SEAT_LETTERS) + 1}{SEAT_LETTERS[index % len(SEAT_LETTERS)]}"
+
+
+def reset(connection):
+    """Delete every row added by a previous seed run"""
+    cursor = connection.cursor()
+    cursor.execute("SELECT user_id FROM users WHERE email LIKE %s", (f"%@{BENCH_EMAIL_DOMAIN}",))
+    user_ids = [row[0] for row in cursor.fetchall()]
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        chunk = user_ids[start:start + BATCH_SIZE]
+        placeholders = ', '.join(['%s'] * len(chunk))
+        for table in ('flight_bookings', 'hotel_bookings', 'car_bookings'):
+            cursor.execute(f"DELETE FROM {table} WHERE user_id IN ({placeholders})", chunk)
+        cursor.execute(f"DELETE FROM users WHERE user_id IN ({placeholders})", chunk)
+    cursor.execute("DELETE FROM flights WHERE flight_number LIKE %s", (f"{BENCH_FLIGHT_PREFIX}%",))
+    cursor.execute("DELETE FROM hotels WHERE hotel_name LIKE 'Bench %'")
+    cursor.execute("DELETE FROM car_rentals WHERE company_name LIKE 'Bench %'")
+    connection.commit()
+    cursor.close()
+
+
+def seed(connection, flights=1000, hotels=100, cars=60, users=200, bookings=2000, days=60, rng=None):
+    """Insert the requested number of rows per table and return the new user emails"""
+    rng = rng or random.Random(42)
+    cursor = connection.cursor()
+    today = date.today()
+
+    flight_rows = []
+    for i in range(flights):
+        origin, destination = rng.sample(CITIES, 2)
+        aircraft, seats = rng.choice(AIRCRAFT)
+        departure = rng.randrange(5 * 60, 23 * 60, 5)
+        arrival = (departure + rng.randrange(60, 9 * 60, 5)) % (24 * 60)
+        flight_rows.append((
+            f"{BENCH_FLIGHT_PREFIX}{i:07d}", origin[0], destination[0], origin[1], destination[1],
+            today + timedelta(days=rng.randrange(days)),
+            f"{departure // 60:02d}:{departure % 60:02d}:00", f"{arrival // 60:02d}:{arrival % 60:02d}:00",
+            aircraft, seats, seats, round(rng.uniform(60, 900), 2), rng.choice(AIRLINES),
+        ))
+    insert_rows(cursor, """
+        INSERT INTO flights (flight_number, origin_country, destination_country, origin_airport,
+                             destination_airport, departure_date, departure_time, arrival_time,
+                             aircraft_type, total_seats, available_seats, price, airline)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, flight_rows)
+
+    insert_rows(cursor, """
+        INSERT INTO hotels (hotel_name, location, star_rating, amenities, contact_info,
+                            price_per_night, availability)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, [(f"Bench Hotel {i}", rng.choice(HOTEL_LOCATIONS), rng.randint(3, 5),
+           ', '.join(rng.sample(AMENITIES, 4)), f"+973-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}",
+           round(rng.uniform(60, 450), 2), rng.randint(5, 80)) for i in range(hotels)])
+
+    insert_rows(cursor, """
+        INSERT INTO car_rentals (company_name, location, car_types, availability, contact_info, price_per_day)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, [(f"Bench Rentals {i}", rng.choice(CAR_LOCATIONS), CAR_TYPES, rng.randint(5, 60),
+           f"+973-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}", round(rng.uniform(25, 120), 2))
+          for i in range(cars)])
+
+    # One hash for every account: hashing is deliberately slow
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    emails = [f"user{i}@{BENCH_EMAIL_DOMAIN}" for i in range(users)]
+    insert_rows(cursor, """
+        INSERT INTO users (first_name, last_name, email, password, phone_number)
+        VALUES (%s, %s, %s, %s, %s)
+    """, [(rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), email, password_hash,
+           f"+973-{rng.randint(3000, 3999)}-{rng.randint(1000, 9999)}") for email in emails])
+
+    cursor.execute("SELECT user_id FROM users WHERE email LIKE %s", (f"%@{BENCH_EMAIL_DOMAIN}",))
+    user_ids = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT flight_id, total_seats, price FROM flights WHERE flight_number LIKE %s",
+                   (f"{BENCH_FLIGHT_PREFIX}%",))
+    seeded_flights = cursor.fetchall()
+
+    if user_ids and seeded_flights:
+        booked = {}
+        booking_rows = []
+        for i in range(bookings):
+            flight_id, total_seats, price = seeded_flights[i % len(seeded_flights)]
+            seat_index = booked.get(flight_id, 0)
+            if seat_index >= total_seats:
+                continue
+            booked[flight_id] = seat_index + 1
+            user_id = rng.choice(user_ids)
+            booking_rows.append((user_id, flight_id, seat_number(seat_index), price,
+                                 f"Passenger {user_id}", f"user{user_id}@{BENCH_EMAIL_DOMAIN}",
+                                 '+973-3000-0000', rng.choice(['Paid', 'Paid', 'Pending'])))
+        insert_rows(cursor, """
+            INSERT INTO flight_bookings (user_id, flight_id, seat_number, total_amount, passenger_name,
+                                         passenger_email, passenger_phone, payment_status)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, booking_rows)
+        insert_rows(cursor, "UPDATE flights SET available_seats = total_seats - %s WHERE flight_id = %s",
+                    [(count, flight_id) for flight_id, count in booked.items()])
+
+    connection.commit()
+    cursor.close()
+    return emails
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed the AirPlanned database for benchmarking')
+    parser.add_argument('--flights', type=int, default=1000)
+    parser.add_argument('--hotels', type=int, default=100)
+    parser.add_argument('--cars', type=int, default=60)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--bookings', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=60, help='spread departures over this many days')
+    parser.add_argument('--reset', action='store_true', help='remove previously seeded rows first')
+    parser.add_argument('--random-seed', type=int, default=42)
+    args = parser.parse_args()
+
+    connection = connect()
+    try:
+        if args.reset:
+            reset(connection)
+        seed(connection, args.flights, args.hotels, args.cars, args.users, args.bookings, args.days,
+             random.Random(args.random_seed))
+    finally:
+        connection.close()
+    print(f"Seeded {args.flights} flights, {args.hotels} hotels, {args.cars} car rentals, "
+          f"{args.users} users and up to {args.bookings} bookings")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+# bulk.py - Set-based admin operations on every flight matching a filter
+#
+# Repricing a season or retiring a route one flight at a time means
+# thousands of edit requests. These operations apply to every flight that
+# matches a filter (route, airline, flight number prefix, departure dates):
+#
+#   price   change the fare by a percentage (e.g. 10 or -15)
+#   seats   add or remove seats, moving total_seats and available_seats
+#           together; flights that would be left with fewer free seats
+#           than zero (or no seats at all) are skipped
+#   delete  remove flights that have no confirmed bookings, as the
+#           single-flight delete does
+#
+# A preview counts the flights matched and the ones the operation would
+# change with one aggregate query. Applying walks the matches in flight_id
+# order: BULK_CHUNK ids are read, then one UPDATE or DELETE covering that id
+# range (with the filter and the operation's condition repeated, so rows
+# changed meanwhile are judged afresh) runs and commits, keeping every
+# transaction and its row locks short.
+#
+#   flask --app app bulk-flights --origin Manama --airline "Gulf Air" --price-percent 10 [--apply]
+#
+# or use /admin/flights/bulk.
+
+import click
+from mysql.connector import Error
+
+from config import setting
+from imports import date_field
+
+BULK_CHUNK = setting('BULK_CHUNK', 1000)
+
+# (criterion, condition) for each filter field; empty criteria are ignored
+FILTERS = [
+    ('origin', 'origin_country = %s'),
+    ('destination', 'destination_country = %s'),
+    ('airline', 'airline = %s'),
+    ('flight_number', 'flight_number LIKE %s'),
+    ('date_from', 'departure_date >= %s'),
+    ('date_to', 'departure_date <= %s'),
+]
+
+OPERATIONS = ('price', 'seats', 'delete')
+
+NO_CONFIRMED_BOOKINGS = """NOT EXISTS (
+    SELECT 1 FROM flight_bookings b
+    WHERE b.flight_id = flights.flight_id AND b.booking_status = 'Confirmed')"""
+
+
+def flight_filter(criteria):
+    """(WHERE condition, params) for the non-empty criteria; ValueError if there are none"""
+    conditions, params = [], []
+    for name, condition in FILTERS:
+        value = str(criteria.get(name) or '').strip()
+        if not value:
+            continue
+        if name in ('date_from', 'date_to'):
+            try:
+                value = date_field(value)
+            except ValueError as e:
+                raise ValueError(f"{name} {e}") from None
+        elif name == 'flight_number':
+            # A prefix match: escape LIKE wildcards in what was typed
+            value = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        conditions.append(condition)
+        params.append(value)
+    if not conditions:
+        raise ValueError('Choose at least one filter')
+    return ' AND '.join(conditions), tuple(params)
+
+
+def bulk_statement(kind, amount):
+    """(statement, its params, condition for a flight to be changed, its params)"""
+    if kind == 'price':
+        try:
+            percent = float(amount)
+        except (TypeError, ValueError):
+            raise ValueError('The price change must be a percentage') from None
+        if not -100 < percent <= 1000 or percent == 0:
+            raise ValueError('The price change must be between -100% and 1000% and not zero')
+        return ('UPDATE flights SET price = ROUND(price * (100 + %s) / 100, 2)', (percent,), '1 = 1', ())
+    if kind == 'seats':
+        try:
+            seats = int(amount)
+        except (TypeError, ValueError):
+            raise ValueError('The seat change must be a whole number') from None
+        if seats == 0:
+            raise ValueError('The seat change must not be zero')
+        return ('UPDATE flights SET total_seats = total_seats + %s, available_seats = available_seats + %s',
+                (seats, seats), 'available_seats + %s >= 0 AND total_seats + %s >= 1', (seats, seats))
+    if kind == 'delete':
+        return ('DELETE FROM flights', (), NO_CONFIRMED_BOOKINGS, ())
+    raise ValueError(f"Unknown operation {kind}")
+
+
+def preview(cursor, kind, amount, criteria):
+    """(flights matching the filter, flights the operation would change)"""
+    where, params = flight_filter(criteria)
+    _, _, eligible, eligible_params = bulk_statement(kind, amount)
+    cursor.execute(f"SELECT COUNT(*), COALESCE(SUM({eligible}), 0) FROM flights WHERE {where}",
+                   eligible_params + params)
+    matched, changed = cursor.fetchone()
+    return int(matched), int(changed)
+
+
+def apply(connection, kind, amount, criteria, chunk=BULK_CHUNK, progress=None):
+    """Run the operation over the matching flights chunk by chunk; returns (matched, changed)
+
+    Chunks committed before a database error stay applied.
+    """
+    where, params = flight_filter(criteria)
+    statement, statement_params, eligible, eligible_params = bulk_statement(kind, amount)
+    matched = changed = 0
+    last = 0
+    cursor = connection.cursor()
+    try:
+        while True:
+            cursor.execute(f"""
+                SELECT flight_id FROM flights
+                WHERE {where} AND flight_id > %s
+                ORDER BY flight_id
+                LIMIT %s
+            """, params + (last, chunk))
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            cursor.execute(f"{statement} WHERE {where} AND {eligible} AND flight_id > %s AND flight_id <= %s",
+                           statement_params + params + eligible_params + (last, ids[-1]))
+            changed += max(cursor.rowcount, 0)
+            connection.commit()
+            matched += len(ids)
+            last = ids[-1]
+            if progress:
+                progress(matched, changed)
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return matched, changed
+
+
+def init_bulk(app, connect, cache=None):
+    """Register the bulk-flights command"""
+
+    @app.cli.command('bulk-flights')
+    @click.option('--origin', help='Origin city')
+    @click.option('--destination', help='Destination city')
+    @click.option('--airline')
+    @click.option('--flight-number', help='Flight number prefix')
+    @click.option('--from', 'date_from', help='First departure date (YYYY-MM-DD)')
+    @click.option('--to', 'date_to', help='Last departure date (YYYY-MM-DD)')
+    @click.option('--price-percent', type=float, help='Change fares by this percentage')
+    @click.option('--seats', type=int, help='Add (or with a negative number remove) this many seats')
+    @click.option('--delete', is_flag=True, help='Delete flights without confirmed bookings')
+    @click.option('--apply', 'apply_changes', is_flag=True, help='Make the change instead of previewing it')
+    @click.option('--chunk', default=BULK_CHUNK, show_default=True, help='Flights per transaction')
+    def bulk_flights_command(price_percent, seats, delete, apply_changes, chunk, **criteria):
+        """Reprice, resize or delete every flight matching a filter."""
+        chosen = [kind for kind, wanted in (('price', price_percent is not None), ('seats', seats is not None),
+                                            ('delete', delete)) if wanted]
+        if len(chosen) != 1:
+            raise click.ClickException('Choose exactly one of --price-percent, --seats and --delete')
+        kind = chosen[0]
+        amount = {'price': price_percent, 'seats': seats}.get(kind)
+        connection = connect()
+        if not connection:
+            raise click.ClickException('Database connection error')
+        cursor = connection.cursor()
+        applying = False
+        try:
+            matched, changed = preview(cursor, kind, amount, criteria)
+            click.echo(f"{matched} flights match, {changed} would change")
+            if not apply_changes:
+                click.echo('Nothing changed; run again with --apply to make the change')
+            elif changed:
+                applying = True
+                matched, changed = apply(connection, kind, amount, criteria, chunk,
+                                         progress=lambda m, c: click.echo(f"{m} checked, {c} changed", err=True))
+                click.echo(f"{changed} flights changed")
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        except Error as e:
+            raise click.ClickException(f"Database error: {e}")
+        finally:
+            cursor.close()
+            connection.close()
+            if applying and cache is not None:
+                # Even a failed run may have committed some chunks
+                cache.bump('flights')
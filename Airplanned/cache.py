@@ -0,0 +1,65 @@
+# cache.py - In-process cache for rendered HTML fragments
+
+import threading
+import time
+
+
+class FragmentCache:
+    """Thread-safe cache of rendered HTML keyed by entity version.
+
+    Every key embeds the current version of the entity it was rendered from
+    (flights, hotels, cars). Admin edits and availability changes bump that
+    version, so the next lookup misses and the fragment is rebuilt. Versions
+    are per process; the TTL bounds how long another worker can keep serving
+    a fragment for a change it did not see.
+    """
+
+    def __init__(self, ttl=60, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def version(self, entity):
+        """Return the current version number of an entity"""
+        with self._lock:
+            return self._versions.get(entity, 0)
+
+    def bump(self, *entities):
+        """Invalidate every fragment rendered from the given entities"""
+        with self._lock:
+            for entity in entities:
+                self._versions[entity] = self._versions.get(entity, 0) + 1
+                for key in [k for k in self._entries if k[0] == entity]:
+                    del self._entries[key]
+
+    def key(self, entity, *parts):
+        """Build a cache key for the current version of an entity"""
+        return (entity, self.version(entity)) + parts
+
+    def get(self, key):
+        """Return the cached fragment for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, html):
+        """Store a rendered fragment"""
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k][0])
+                del self._entries[oldest]
+            self._entries[key] = (time.monotonic() + self.ttl, html)
+
+    def clear(self):
+        """Drop every cached fragment"""
+        with self._lock:
+            self._entries.clear()
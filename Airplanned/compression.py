@@ -0,0 +1,212 @@
+# compression.py - WSGI response compression middleware (gzip / brotli)
+
+import zlib
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Per content type settings; anything not listed is sent as-is
+DEFAULT_CONTENT_TYPES = {
+    'text/html': {'gzip_level': 6, 'brotli_quality': 5, 'min_size': 1024},
+    'application/json': {'gzip_level': 6, 'brotli_quality': 5, 'min_size': 1024},
+    'text/css': {'gzip_level': 6, 'brotli_quality': 5, 'min_size': 1024},
+    'application/javascript': {'gzip_level': 6, 'brotli_quality': 5, 'min_size': 1024},
+    'text/plain': {'gzip_level': 6, 'brotli_quality': 5, 'min_size': 1024},
+}
+
+
+def header_value(headers, name):
+    """Case-insensitive lookup in a WSGI header list"""
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def accepted_encodings(accept_encoding):
+    """Parse Accept-Encoding into the set of codings with a non-zero q value"""
+    codings = set()
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            codings.add(coding.strip().lower())
+    return codings
+
+
+class GzipStream:
+    """Incremental gzip compressor"""
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliStream:
+    """Incremental brotli compressor"""
+
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    """Compress HTML/JSON/CSS/JS responses for clients that accept it
+
+    Bodies smaller than the content type's min_size are passed through
+    untouched. Responses with a Content-Length are compressed in one piece
+    and get a new Content-Length; streamed responses (no Content-Length) are
+    compressed chunk by chunk with a sync flush after each chunk, so clients
+    still receive data as soon as the application yields it.
+    """
+
+    def __init__(self, app, content_types=None, prefer_brotli=True):
+        self.app = app
+        self.content_types = DEFAULT_CONTENT_TYPES if content_types is None else content_types
+        self.prefer_brotli = prefer_brotli and brotli is not None
+
+    def choose_encoding(self, environ):
+        """Pick the coding to use for this request, or None"""
+        if environ.get('REQUEST_METHOD') == 'HEAD' or environ.get('HTTP_RANGE'):
+            return None
+        accepted = accepted_encodings(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if self.prefer_brotli and 'br' in accepted:
+            return 'br'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return None
+
+    def options_for(self, status, headers):
+        """Compression settings for a response, or None when it must be sent as-is"""
+        if not status.startswith('200'):
+            return None
+        if header_value(headers, 'Content-Encoding'):
+            return None
+        if 'no-transform' in (header_value(headers, 'Cache-Control') or ''):
+            return None
+        mimetype = (header_value(headers, 'Content-Type') or '').split(';')[0].strip().lower()
+        return self.content_types.get(mimetype)
+
+    def new_compressor(self, encoding, options):
+        if encoding == 'br':
+            return BrotliStream(options.get('brotli_quality', 5))
+        return GzipStream(options.get('gzip_level', 6))
+
+    def __call__(self, environ, start_response):
+        captured = []
+
+        def capture_start_response(status, headers, exc_info=None):
+            captured[:] = [status, headers, exc_info]
+            return lambda data: None
+
+        app_iter = self.app(environ, capture_start_response)
+        iterator = iter(app_iter)
+        pending = []
+        if not captured:
+            # The application defers start_response until its first chunk
+            for chunk in iterator:
+                pending.append(chunk)
+                if captured:
+                    break
+
+        status, headers, exc_info = captured
+        options = self.options_for(status, headers)
+        encoding = self.choose_encoding(environ) if options else None
+
+        if options:
+            vary = header_value(headers, 'Vary')
+            if not vary:
+                headers.append(('Vary', 'Accept-Encoding'))
+            elif 'accept-encoding' not in vary.lower():
+                headers[:] = [(k, f"{v}, Accept-Encoding" if k.lower() == 'vary' else v) for k, v in headers]
+
+        length = header_value(headers, 'Content-Length')
+        if encoding is None or (length is not None and int(length) < options.get('min_size', 0)):
+            start_response(status, headers, exc_info)
+            if not pending:
+                # Hand back the original iterable so file wrappers keep working
+                return app_iter
+            return self.passthrough(app_iter, pending, iterator)
+
+        compressed_headers = [(k, v) for k, v in headers if k.lower() != 'content-length']
+        compressed_headers.append(('Content-Encoding', encoding))
+
+        if length is not None:
+            # Fully buffered response: compress in one go and keep a Content-Length
+            try:
+                body = b''.join(pending) + b''.join(iterator)
+            finally:
+                if hasattr(app_iter, 'close'):
+                    app_iter.close()
+            compressor = self.new_compressor(encoding, options)
+            data = compressor.compress(body) + compressor.finish()
+            compressed_headers.append(('Content-Length', str(len(data))))
+            start_response(status, compressed_headers, exc_info)
+            return [data]
+
+        return self.stream(app_iter, pending, iterator, encoding, options,
+                           status, headers, compressed_headers, exc_info, start_response)
+
+    def passthrough(self, app_iter, pending, iterator):
+        try:
+            yield from pending
+            yield from iterator
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+    def stream(self, app_iter, pending, iterator, encoding, options,
+               status, headers, compressed_headers, exc_info, start_response):
+        """Compress a streamed body, deciding on compression once min_size bytes are seen"""
+        try:
+            size = sum(len(chunk) for chunk in pending)
+            if size < options.get('min_size', 0):
+                for chunk in iterator:
+                    pending.append(chunk)
+                    size += len(chunk)
+                    if size >= options.get('min_size', 0):
+                        break
+                else:
+                    # The whole body fits under the threshold
+                    start_response(status, headers, exc_info)
+                    yield b''.join(pending)
+                    return
+
+            start_response(status, compressed_headers, exc_info)
+            compressor = self.new_compressor(encoding, options)
+            data = compressor.compress(b''.join(pending)) + compressor.flush()
+            if data:
+                yield data
+            for chunk in iterator:
+                data = compressor.compress(chunk) + compressor.flush()
+                if data:
+                    yield data
+            yield compressor.finish()
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
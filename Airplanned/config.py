@@ -0,0 +1,105 @@
+# config.py - Deployment settings from the environment and an optional INI file
+#
+# Every tunable is read once, at import time of the module that owns it,
+# through setting(name, default). Values are looked up in order:
+#
+#   1. the environment variable NAME
+#   2. NAME (case-insensitive) in the [AIRPLANNED_PROFILE] section of the config file
+#   3. NAME in the file's [DEFAULT] section
+#   4. the default given in code, whose type (int, float, bool, str) the value is cast to
+#
+# The file is AIRPLANNED_CONFIG, or airplanned.ini in the app's instance
+# folder when that exists, wherever the app is started from.
+# Profiles let one file describe several deployments:
+#
+#   [DEFAULT]
+#   db_host = db.internal
+#   db_pool_size = 20
+#
+#   [benchmark]
+#   db_host = 127.0.0.1
+#   db_port = 3306
+#   slow_query_ms = 50
+#
+#   AIRPLANNED_PROFILE=benchmark flask --app app run
+#
+# `flask show-config` prints every setting in effect and where it came from.
+
+import configparser
+import os
+
+import click
+
+# Settings are read before the Flask app exists, so its instance folder
+# (app.instance_path: instance/ next to app.py) is located from this file
+INSTANCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+CONFIG_FILE = os.environ.get('AIRPLANNED_CONFIG', os.path.join(INSTANCE_PATH, 'airplanned.ini'))
+PROFILE = os.environ.get('AIRPLANNED_PROFILE', 'default')
+
+SECRET_SETTINGS = ('PASSWORD', 'SECRET', 'TOKEN')
+
+_TRUE = ('1', 'true', 'yes', 'on')
+_FALSE = ('0', 'false', 'no', 'off', '')
+
+
+def _load_file(path, profile):
+    parser = configparser.ConfigParser(interpolation=None)
+    if not parser.read(path):
+        if 'AIRPLANNED_CONFIG' in os.environ:
+            raise RuntimeError(f"Config file {path} could not be read")
+        return {}
+    if profile != 'default' and not parser.has_section(profile):
+        raise RuntimeError(f"Config file {path} has no [{profile}] profile")
+    section = parser[profile] if parser.has_section(profile) else parser.defaults()
+    return {key.upper(): value for key, value in section.items()}
+
+
+_file_values = _load_file(CONFIG_FILE, PROFILE)
+
+# name -> (value, source) for every setting read so far
+loaded = {}
+
+
+def _cast(name, raw, default):
+    if isinstance(default, bool):
+        value = raw.strip().lower()
+        if value not in _TRUE + _FALSE:
+            raise RuntimeError(f"Setting {name} must be a boolean, got {raw!r}")
+        return value in _TRUE
+    if isinstance(default, (int, float)):
+        try:
+            return type(default)(raw)
+        except ValueError:
+            raise RuntimeError(f"Setting {name} must be a number, got {raw!r}") from None
+    return raw
+
+
+def setting(name, default=None):
+    """The configured value of name, cast to the type of default"""
+    if name in os.environ:
+        raw, source = os.environ[name], 'env'
+    elif name in _file_values:
+        raw, source = _file_values[name], f"{CONFIG_FILE} [{PROFILE}]"
+    else:
+        loaded[name] = (default, 'default')
+        return default
+    value = raw if default is None else _cast(name, raw, default)
+    loaded[name] = (value, source)
+    return value
+
+
+def init_config(app):
+    """Register the show-config command"""
+
+    @app.cli.command('show-config')
+    def show_config_command():
+        """Print every setting in effect and where it came from."""
+        click.echo(f"profile: {PROFILE}")
+        for name in sorted(loaded):
+            value, source = loaded[name]
+            if value and any(word in name for word in SECRET_SETTINGS):
+                value = '********'
+            click.echo(f"{name} = {value!r}  ({source})")
+        unused = sorted(set(_file_values) - set(loaded))
+        if unused:
+            click.echo(f"not recognised in {CONFIG_FILE}: {', '.join(unused)}")
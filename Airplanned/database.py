@@ -0,0 +1,317 @@
+# database.py - Query instrumentation: per-request query stats and slow-query log
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from flask import g, has_request_context, request, session
+
+from config import setting
+from metrics import DB_QUERY_SECONDS, statement_type
+from tracing import KIND_CLIENT, current_span, start_span
+
+# Queries slower than this (execute + fetch) go to the slow-query log, by
+# default slow_queries.log in the app's instance folder
+SLOW_QUERY_MS = setting('SLOW_QUERY_MS', 200.0)
+SLOW_QUERY_LOG = setting('SLOW_QUERY_LOG', '')
+
+# The same statement run this many times in one request is reported as N+1
+REPEATED_QUERY_THRESHOLD = setting('REPEATED_QUERY_THRESHOLD', 10)
+
+slow_query_logger = logging.getLogger('airplanned.slow_queries')
+_slow_log_lock = threading.Lock()
+_slow_log_path = SLOW_QUERY_LOG or 'slow_queries.log'
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.I)
+_VALUES_LIST = re.compile(r'(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+')
+
+
+def normalize_sql(sql):
+    """Reduce a statement to its shape so repeated queries group together"""
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode('utf-8', 'replace')
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = ' '.join(sql.split())
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _VALUES_LIST.sub(r'\1, ...', sql)
+
+
+def _slow_log_handler():
+    """Attach the JSON-lines file handler the first time a slow query is seen"""
+    with _slow_log_lock:
+        if not slow_query_logger.handlers:
+            os.makedirs(os.path.dirname(_slow_log_path) or '.', exist_ok=True)
+            handler = logging.FileHandler(_slow_log_path)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            slow_query_logger.addHandler(handler)
+            slow_query_logger.setLevel(logging.WARNING)
+            slow_query_logger.propagate = False
+
+
+class QueryStats:
+    """Queries executed while handling one request"""
+
+    def __init__(self):
+        self.queries = []
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration_ms(self):
+        return sum(q['duration_ms'] for q in self.queries)
+
+    @property
+    def rows(self):
+        return sum(q['rows'] for q in self.queries)
+
+    def by_statement(self):
+        """Aggregate the request's queries by normalized SQL, slowest first"""
+        grouped = {}
+        for query in self.queries:
+            entry = grouped.setdefault(query['sql'], {'sql': query['sql'], 'count': 0,
+                                                      'duration_ms': 0.0, 'rows': 0})
+            entry['count'] += 1
+            entry['duration_ms'] += query['duration_ms']
+            entry['rows'] += query['rows']
+        return sorted(grouped.values(), key=lambda e: e['duration_ms'], reverse=True)
+
+    def repeated(self, threshold=REPEATED_QUERY_THRESHOLD):
+        """Statements executed at least threshold times (likely N+1 loops)"""
+        return [entry for entry in self.by_statement() if entry['count'] >= threshold]
+
+    def summary(self):
+        return {
+            'queries': self.count,
+            'duration_ms': round(self.duration_ms, 3),
+            'rows': self.rows,
+            'statements': self.by_statement(),
+        }
+
+
+class RouteQueryStats:
+    """Process-wide query totals per endpoint"""
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, stats):
+        with self._lock:
+            entry = self._routes.setdefault(endpoint, {'requests': 0, 'queries': 0,
+                                                       'duration_ms': 0.0, 'rows': 0,
+                                                       'max_queries': 0})
+            entry['requests'] += 1
+            entry['queries'] += stats.count
+            entry['duration_ms'] += stats.duration_ms
+            entry['rows'] += stats.rows
+            entry['max_queries'] = max(entry['max_queries'], stats.count)
+
+    def snapshot(self):
+        """Per-endpoint totals with per-request averages"""
+        with self._lock:
+            routes = {endpoint: dict(entry) for endpoint, entry in self._routes.items()}
+        for entry in routes.values():
+            entry['avg_queries'] = round(entry['queries'] / entry['requests'], 2)
+            entry['avg_duration_ms'] = round(entry['duration_ms'] / entry['requests'], 3)
+            entry['duration_ms'] = round(entry['duration_ms'], 3)
+        return routes
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+route_query_stats = RouteQueryStats()
+
+
+def current_query_stats():
+    """The QueryStats for the active request, or None outside a request"""
+    if not has_request_context():
+        return None
+    if 'query_stats' not in g:
+        g.query_stats = QueryStats()
+    return g.query_stats
+
+
+class InstrumentedCursor:
+    """Cursor proxy that times each statement and counts the rows fetched
+
+    A query's duration covers execute() plus every fetch until the next
+    execute() or close(), since unbuffered cursors do most of their work
+    while fetching.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._query = None
+        self._span = None
+        # The exception the current query raised; the query itself keeps only its message
+        self._error = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        for row in self._cursor:
+            if self._query is not None:
+                self._query['rows'] += 1
+            yield row
+
+    def _start(self, operation, many=False):
+        self._finish()
+        self._query = {
+            'sql': normalize_sql(operation),
+            'duration_ms': 0.0,
+            'rows': 0,
+            'many': many,
+        }
+        self._span = start_span('db.query', kind=KIND_CLIENT, activate=False, attributes={
+            'db.system': 'mysql',
+            'db.statement': self._query['sql'],
+        })
+
+    def _timed(self, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if self._query is not None:
+                self._query['error'] = str(e)
+                self._error = e
+            raise
+        finally:
+            if self._query is not None:
+                self._query['duration_ms'] += (time.perf_counter() - start) * 1000
+
+    def _finish(self):
+        """Close out the current query: record it and log it if it was slow"""
+        query, self._query = self._query, None
+        if query is None:
+            return
+        if not query['rows'] and self._cursor.rowcount and self._cursor.rowcount > 0:
+            # Writes report affected rows instead of fetched ones
+            query['rows'] = self._cursor.rowcount
+
+        span, self._span = self._span, None
+        if span is not None:
+            span.set_attribute('db.rows', query['rows'])
+            if self._error is not None:
+                span.record_error(self._error)
+            span.end()
+        self._error = None
+
+        DB_QUERY_SECONDS.observe(query['duration_ms'] / 1000, statement=statement_type(query['sql']))
+
+        stats = current_query_stats()
+        if stats is not None:
+            stats.queries.append(query)
+
+        if query['duration_ms'] >= SLOW_QUERY_MS:
+            self._log_slow(query)
+
+    def _log_slow(self, query):
+        # Only the normalized SQL is logged; parameters can hold personal data
+        _slow_log_handler()
+        record = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'duration_ms': round(query['duration_ms'], 3),
+            'rows': query['rows'],
+            'sql': query['sql'],
+            'executemany': query['many'],
+        }
+        if has_request_context():
+            record['endpoint'] = request.endpoint
+            record['path'] = request.path
+        span = current_span()
+        if span is not None:
+            record['trace_id'] = span.trace_id
+        if 'error' in query:
+            record['error'] = query['error']
+        slow_query_logger.warning(json.dumps(record))
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._start(operation)
+        return self._timed(self._cursor.execute, operation, params, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._start(operation, many=True)
+        return self._timed(self._cursor.executemany, operation, seq_params, *args, **kwargs)
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        if row is not None and self._query is not None:
+            self._query['rows'] += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._timed(self._cursor.fetchmany, *args, **kwargs)
+        if self._query is not None:
+            self._query['rows'] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self._cursor.fetchall)
+        if self._query is not None:
+            self._query['rows'] += len(rows)
+        return rows
+
+    def close(self):
+        self._finish()
+        return self._cursor.close()
+
+
+class InstrumentedConnection:
+    """Connection proxy whose cursors are InstrumentedCursors"""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs))
+
+
+def instrument(connection):
+    """Wrap a DB-API connection so its queries are recorded"""
+    if connection is None:
+        return None
+    return InstrumentedConnection(connection)
+
+
+def init_query_instrumentation(app):
+    """Publish each request's query summary and fold it into the per-route totals
+
+    The Server-Timing summary is only sent in debug mode or to admins.
+    """
+    global _slow_log_path
+    _slow_log_path = SLOW_QUERY_LOG or os.path.join(app.instance_path, 'slow_queries.log')
+
+    @app.after_request
+    def add_query_summary(response):
+        stats = g.get('query_stats')
+        if stats is not None and stats.count and (app.debug or session.get('admin_logged_in')):
+            response.headers['Server-Timing'] = (
+                f'db;dur={stats.duration_ms:.1f};desc="{stats.count} queries, {stats.rows} rows"'
+            )
+        return response
+
+    @app.teardown_request
+    def record_query_stats(exc):
+        stats = g.pop('query_stats', None)
+        if stats is None or not stats.count:
+            return
+        route_query_stats.record(request.endpoint or request.path, stats)
+        for entry in stats.repeated():
+            app.logger.warning(f"Repeated query in {request.endpoint}: {entry['count']}x "
+                               f"({entry['duration_ms']:.1f} ms) {entry['sql'][:200]}")
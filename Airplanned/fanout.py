@@ -0,0 +1,121 @@
+# fanout.py - Independent read queries run concurrently, each on its own pooled connection
+#
+# A page that runs several unrelated SELECTs on one connection waits for the
+# sum of their latencies. QueryFanOut checks out one connection per query
+# from the pool and runs them on a shared thread pool, so the page waits for
+# the slowest query instead.
+#
+# Each query gets a time limit. It is sent to MySQL as a MAX_EXECUTION_TIME
+# optimizer hint, so the server abandons a runaway query and its connection
+# goes back to the pool, and the caller stops waiting at the same deadline.
+# Queries that time out or fail are reported by name next to the rows of the
+# ones that finished, so the page can render partial results.
+#
+# Fan-out connections come from the same per-process ConnectionPool
+# (DB_POOL_SIZE connections per endpoint) as those of the request threads,
+# the payment workers and the hold sweeper, and a query left waiting for a
+# free connection times out like a slow one. The executor therefore never
+# runs more than FANOUT_WORKERS queries at once, half the pool by default
+# and always less than all of it. Size the pool as
+#
+#   DB_POOL_SIZE >= request threads + PAYMENT_WORKERS + 1 (sweeper) + FANOUT_WORKERS
+#
+# and raise FANOUT_WORKERS only together with DB_POOL_SIZE.
+#
+# The worker threads run in a copy of the request's context: connections are
+# routed to the request's primary or replica role and queries are recorded in
+# its query stats and trace like those run by the view itself.
+
+import contextvars
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from mysql.connector import Error
+
+from config import setting
+from database import current_query_stats
+from metrics import FANOUT_INCOMPLETE
+from pool import DB_POOL_SIZE
+from tracing import app_logger
+
+FANOUT_WORKERS = setting('FANOUT_WORKERS', max(1, DB_POOL_SIZE // 2))
+
+_LEADING_SELECT = re.compile(r'^\s*SELECT\b', re.I)
+
+
+def with_time_limit(sql, timeout):
+    """sql with a MAX_EXECUTION_TIME hint of timeout seconds (SELECTs only)"""
+    milliseconds = max(1, int(timeout * 1000))
+    return _LEADING_SELECT.sub(f"SELECT /*+ MAX_EXECUTION_TIME({milliseconds}) */", sql, count=1)
+
+
+class QueryFanOut:
+    """Runs named (sql, params) queries in parallel on connections from connect()
+
+    The executor starts on first use, so each process of a forking server
+    runs its own threads. With a pool of pool_size connections behind
+    connect(), at most pool_size - 1 queries run at once, so fan-out alone
+    can never exhaust it.
+    """
+
+    def __init__(self, connect, workers=FANOUT_WORKERS, pool_size=DB_POOL_SIZE):
+        self.connect = connect
+        self.workers = max(1, min(workers, pool_size - 1)) if pool_size > 0 else workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix='fanout')
+        return self._executor
+
+    def _fetch(self, sql, params):
+        connection = self.connect()
+        if not connection:
+            raise Error('No database connection available')
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.execute(sql, params)
+            return cursor.fetchall() or []
+        finally:
+            if cursor is not None and connection.is_connected():
+                cursor.close()
+            # Always hand the connection back, even one lost mid-query
+            connection.close()
+
+    def run(self, queries, timeout):
+        """Run {name: (sql, params)} and return (rows by name, failure reason by name)
+
+        Waits at most timeout seconds. A query missing from the rows is in
+        the failures as 'timeout' or 'error'.
+        """
+        executor = self._start()
+        # Create the request's stats before the workers share them
+        current_query_stats()
+        futures = {}
+        for name, (sql, params) in queries.items():
+            # A context can only be entered by one thread at a time, so each query gets its own copy
+            context = contextvars.copy_context()
+            futures[executor.submit(context.run, self._fetch, with_time_limit(sql, timeout), params)] = name
+        done, pending = wait(futures, timeout=timeout)
+
+        results, failed = {}, {}
+        for future in done:
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Error as e:
+                app_logger.error(f"Database error in {name} query: {e}")
+                failed[name] = 'error'
+        for future in pending:
+            # Queries still queued for a worker are dropped; running ones are stopped by the server
+            future.cancel()
+            failed[futures[future]] = 'timeout'
+        for name, reason in failed.items():
+            FANOUT_INCOMPLETE.inc(query=name, reason=reason)
+        return results, failed
@@ -0,0 +1,207 @@
+# holds.py - Expire unpaid bookings and give their seats, rooms and cars back
+#
+# Every booking takes its inventory (flights.available_seats,
+# hotels.availability, car_rentals.availability) when it is created as
+# 'Confirmed'/'Pending'. A checkout abandoned before payment would hold that
+# inventory forever, so a sweeper cancels Pending bookings older than
+# HOLD_TTL_MINUTES and releases what they held.
+#
+# Each batch of at most HOLD_SWEEP_BATCH bookings is one short explicit
+# transaction (connections autocommit otherwise): the expired rows are
+# selected FOR UPDATE SKIP LOCKED (so concurrent bookings and other
+# sweepers are never waited on), cancelled with one UPDATE, and their
+# inventory returned with one UPDATE per inventory table. The row locks
+# last until the commit, so a cancel or payment cannot slip in between
+# and have the same booking's inventory released twice.
+# Bookings with a payment in flight are left alone until it settles.
+#
+# The sweeper runs in a background thread every HOLD_SWEEP_INTERVAL seconds
+# (0 disables it); a MySQL named lock keeps multiple app processes from
+# sweeping at the same time. It can also be run by hand or from cron:
+#
+#   flask --app app expire-holds [--ttl 30] [--batch 500] [--dry-run]
+
+import threading
+import time
+from collections import Counter
+
+import click
+from mysql.connector import Error
+
+from config import setting
+from metrics import HOLDS_EXPIRED
+from tracing import app_logger
+
+HOLD_TTL_MINUTES = setting('HOLD_TTL_MINUTES', 30)
+HOLD_SWEEP_INTERVAL = setting('HOLD_SWEEP_INTERVAL', 60)
+HOLD_SWEEP_BATCH = setting('HOLD_SWEEP_BATCH', 500)
+SWEEP_LOCK = 'airplanned_hold_sweep'
+
+# booking_type -> (booking table, inventory key, inventory table, inventory column, cache namespace)
+HOLD_TABLES = {
+    'flight': ('flight_bookings', 'flight_id', 'flights', 'available_seats', 'flights'),
+    'hotel': ('hotel_bookings', 'hotel_id', 'hotels', 'availability', 'hotels'),
+    'car': ('car_bookings', 'rental_id', 'car_rentals', 'availability', 'cars'),
+}
+
+
+def _expired_where(table):
+    return f"""
+        FROM {table} b
+        WHERE b.payment_status = 'Pending' AND b.booking_status = 'Confirmed'
+          AND b.created_at < NOW() - INTERVAL %s MINUTE
+          AND NOT EXISTS (
+              SELECT 1 FROM payments p
+              WHERE p.booking_type = %s AND p.booking_id = b.booking_id AND p.status = 'processing')
+    """
+
+
+def count_expired(cursor, kind, ttl_minutes):
+    table = HOLD_TABLES[kind][0]
+    cursor.execute(f"SELECT COUNT(*) {_expired_where(table)}", (ttl_minutes, kind))
+    return cursor.fetchone()[0]
+
+
+def release(cursor, inventory, key, column, released):
+    """Add each {inventory id: count} back in a single UPDATE"""
+    cases = ' '.join(['WHEN %s THEN %s'] * len(released))
+    placeholders = ', '.join(['%s'] * len(released))
+    params = [value for item in released.items() for value in item]
+    cursor.execute(f"""
+        UPDATE {inventory}
+        SET {column} = {column} + CASE {key} {cases} ELSE 0 END
+        WHERE {key} IN ({placeholders})
+    """, (*params, *released))
+
+
+def expire_batch(cursor, kind, ttl_minutes, batch_size):
+    """Cancel one batch of expired holds and return their inventory; returns the number cancelled
+
+    Must run in a transaction the caller started, so the selected rows stay
+    locked until their inventory has been released.
+    """
+    table, key, inventory, column, _ = HOLD_TABLES[kind]
+    cursor.execute(f"""
+        SELECT b.booking_id, b.{key}
+        {_expired_where(table)}
+        ORDER BY b.booking_id
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    """, (ttl_minutes, kind, batch_size))
+    rows = cursor.fetchall()
+    if not rows:
+        return 0
+
+    placeholders = ', '.join(['%s'] * len(rows))
+    cursor.execute(f"""
+        UPDATE {table}
+        SET booking_status = 'Cancelled', payment_status = 'Cancelled'
+        WHERE booking_id IN ({placeholders}) AND payment_status = 'Pending'
+    """, [booking_id for booking_id, _ in rows])
+    if cursor.rowcount != len(rows):
+        # Only possible if the rows were not locked; releasing them all would over-count
+        raise Error(msg=f"{cursor.rowcount} of {len(rows)} selected {kind} holds were still pending")
+    release(cursor, inventory, key, column, Counter(item_id for _, item_id in rows))
+    return len(rows)
+
+
+def sweep(connection, ttl_minutes=HOLD_TTL_MINUTES, batch_size=HOLD_SWEEP_BATCH, cache=None):
+    """Expire every hold older than the TTL, one committed batch at a time
+
+    Returns {booking_type: cancelled}, or None when another process holds
+    the sweep lock.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, 0)", (SWEEP_LOCK,))
+        if cursor.fetchone()[0] != 1:
+            return None
+        expired = {}
+        try:
+            for kind in HOLD_TABLES:
+                expired[kind] = 0
+                while True:
+                    connection.start_transaction()
+                    cancelled = expire_batch(cursor, kind, ttl_minutes, batch_size)
+                    connection.commit()
+                    expired[kind] += cancelled
+                    if cancelled < batch_size:
+                        break
+                if expired[kind]:
+                    HOLDS_EXPIRED.inc(expired[kind], kind=kind)
+                    if cache is not None:
+                        cache.bump(HOLD_TABLES[kind][4])
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (SWEEP_LOCK,))
+            cursor.fetchall()
+        return expired
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+class HoldSweeper(threading.Thread):
+    """Runs sweep() every interval seconds for the life of the process"""
+
+    def __init__(self, connect, interval=HOLD_SWEEP_INTERVAL, cache=None):
+        super().__init__(name='hold-sweeper', daemon=True)
+        self.connect = connect
+        self.interval = interval
+        self.cache = cache
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            connection = self.connect()
+            if not connection:
+                continue
+            try:
+                expired = sweep(connection, cache=self.cache)
+                if expired and any(expired.values()):
+                    app_logger.info(f"Expired unpaid holds: {expired}")
+            except Error as e:
+                app_logger.error(f"Database error in hold sweeper: {e}")
+            finally:
+                connection.close()
+
+
+def init_holds(app, connect, cache=None):
+    """Start the sweeper with the first request and register the expire-holds command"""
+    started = []
+    lock = threading.Lock()
+
+    @app.before_request
+    def start_hold_sweeper():
+        if started or HOLD_SWEEP_INTERVAL <= 0:
+            return
+        with lock:
+            if not started:
+                HoldSweeper(connect, HOLD_SWEEP_INTERVAL, cache).start()
+                started.append(True)
+
+    @app.cli.command('expire-holds')
+    @click.option('--ttl', default=HOLD_TTL_MINUTES, show_default=True,
+                  help='Minutes a Pending booking may hold inventory')
+    @click.option('--batch', default=HOLD_SWEEP_BATCH, show_default=True, help='Bookings per transaction')
+    @click.option('--dry-run', is_flag=True, help='Only count the holds that would expire')
+    def expire_holds_command(ttl, batch, dry_run):
+        """Cancel unpaid bookings older than the TTL and release their inventory."""
+        connection = connect()
+        if not connection:
+            raise click.ClickException('Database connection error')
+        try:
+            if dry_run:
+                cursor = connection.cursor()
+                for kind in HOLD_TABLES:
+                    click.echo(f"{kind}: {count_expired(cursor, kind, ttl)} holds would expire")
+                cursor.close()
+                return
+            expired = sweep(connection, ttl, batch, cache)
+            if expired is None:
+                raise click.ClickException('Another process is already sweeping holds')
+            for kind, cancelled in expired.items():
+                click.echo(f"{kind}: {cancelled} holds expired")
+        finally:
+            connection.close()
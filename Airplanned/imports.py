@@ -0,0 +1,444 @@
+# imports.py - Bulk flight schedule and hotel/car inventory import from CSV or JSON files
+#
+# A seasonal schedule or a partner's inventory feed can hold tens of
+# thousands of rows, far too many to key in through the admin forms. The
+# file is read as a stream of records: CSV with a header row, or JSON Lines
+# (one object per line). A JSON file holding one top-level array is also
+# accepted, but is parsed in one go.
+#
+# Records are processed IMPORT_BATCH at a time. Each batch is validated in
+# Python (types, lengths, counts), its keys are looked up with one IN query,
+# and the rows are written with one multi-row INSERT and committed, so each
+# batch is one short transaction:
+#
+#   flights      inserted; a flight_number that already exists is rejected
+#   hotels       upserted on (hotel_name, location)
+#   car_rentals  upserted on (company_name, location)
+#
+# Upserts use INSERT ... ON DUPLICATE KEY UPDATE: required columns are
+# overwritten, optional columns left out of the file keep their current
+# value, and a changed availability resets total_rooms/total_cars to NULL
+# for the reconciler to adopt, as an admin edit does.
+#
+# Bad records never stop the import: every one is reported by its line
+# number and the rest of the file still loads. A file that cannot be read
+# to the end (bad UTF-8, a malformed CSV line) stops it, but the batches
+# read before that point are already committed and are reported as loaded,
+# the same as when a database error stops it. If a batch hits a duplicate
+# inserted concurrently, it is retried row by row to find it. --dry-run
+# validates the whole file and counts what would be inserted or updated
+# without writing anything.
+#
+#   flask --app app import-flights schedule.csv [--batch 1000] [--dry-run]
+#   flask --app app import-hotels hotels.jsonl
+#   flask --app app import-cars cars.csv
+#
+# or upload the file at /admin/flights/import, /admin/hotels/import or
+# /admin/cars/import.
+
+import csv
+import io
+import json
+import time
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+import click
+from mysql.connector import Error, IntegrityError
+
+from config import setting
+
+IMPORT_BATCH = setting('IMPORT_BATCH', 1000)
+# Only this many errors are kept for the report; the rest are just counted
+IMPORT_MAX_ERRORS = setting('IMPORT_MAX_ERRORS', 1000)
+
+FORMATS = {'.csv': 'csv', '.json': 'json', '.jsonl': 'json', '.ndjson': 'json'}
+
+
+# READING
+
+def file_format(filename):
+    """'csv' or 'json' from a file name's extension, or None"""
+    name = (filename or '').lower()
+    for extension, fmt in FORMATS.items():
+        if name.endswith(extension):
+            return fmt
+    return None
+
+
+def read_records(stream, fmt):
+    """(line number, dict) for each record in a binary CSV or JSON stream
+
+    ValueError when the stream cannot be read on: bad UTF-8 or a malformed
+    CSV line.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        try:
+            for record in reader:
+                yield reader.line_num, record
+        except csv.Error as e:
+            raise ValueError(f"after line {reader.line_num}: {e}") from None
+        return
+
+    first = text.read(1)
+    while first.isspace():
+        first = text.read(1)
+    if first == '[':
+        try:
+            records = json.loads(first + text.read())
+        except ValueError as e:
+            yield 1, f"invalid JSON: {e}"
+            return
+        for number, record in enumerate(records, start=1):
+            yield number, record
+        return
+    for number, line in enumerate(text, start=1):
+        if number == 1:
+            line = first + line
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except ValueError as e:
+                yield number, f"invalid JSON: {e}"
+
+
+def batches(records, size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# VALIDATION
+
+def text_field(max_length):
+    def parse(value):
+        value = str(value).strip()
+        if len(value) > max_length:
+            raise ValueError(f"longer than {max_length} characters")
+        return value
+    return parse
+
+
+def integer_field(minimum, maximum=None):
+    def parse(value):
+        try:
+            number = int(str(value).strip())
+        except ValueError:
+            raise ValueError('not a whole number') from None
+        if number < minimum:
+            raise ValueError(f"less than {minimum}")
+        if maximum is not None and number > maximum:
+            raise ValueError(f"more than {maximum}")
+        return number
+    return parse
+
+
+def price_field(value):
+    try:
+        price = Decimal(str(value).strip()).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError('not a price') from None
+    if price < 0 or price >= Decimal('100000000'):
+        raise ValueError('out of range')
+    return price
+
+
+def date_field(value):
+    try:
+        return datetime.strptime(str(value).strip(), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('not a YYYY-MM-DD date') from None
+
+
+def time_field(value):
+    value = str(value).strip()
+    for pattern in ('%H:%M', '%H:%M:%S'):
+        try:
+            return datetime.strptime(value, pattern).time()
+        except ValueError:
+            pass
+    raise ValueError('not an HH:MM time')
+
+
+# FEEDS
+
+def check_flight(values):
+    """Cross-column rules for a flight; the problems found"""
+    if 'total_seats' not in values:
+        return []
+    # A new flight starts with every seat free unless the file says otherwise
+    values.setdefault('available_seats', values['total_seats'])
+    if values['available_seats'] > values['total_seats']:
+        return ['available_seats exceeds total_seats']
+    return []
+
+
+# table: target table; columns: (column, parser, required) in insert order;
+# key: natural key columns; upsert: update rows whose key exists instead of
+# rejecting them; capacity: column reset to NULL when availability changes;
+# check: cross-column validation; cache: fragment cache namespace
+Feed = namedtuple('Feed', 'table columns key upsert capacity check cache')
+
+FEEDS = {
+    'flights': Feed('flights', [
+        ('flight_number', text_field(10), True),
+        ('origin_country', text_field(50), True),
+        ('destination_country', text_field(50), True),
+        ('origin_airport', text_field(10), True),
+        ('destination_airport', text_field(10), True),
+        ('departure_date', date_field, True),
+        ('departure_time', time_field, True),
+        ('arrival_time', time_field, True),
+        ('aircraft_type', text_field(50), True),
+        ('total_seats', integer_field(1), True),
+        ('available_seats', integer_field(0), False),
+        ('price', price_field, True),
+        ('airline', text_field(50), True),
+    ], ('flight_number',), False, None, check_flight, 'flights'),
+    'hotels': Feed('hotels', [
+        ('hotel_name', text_field(100), True),
+        ('location', text_field(100), True),
+        ('star_rating', integer_field(1, 5), False),
+        ('amenities', text_field(65535), False),
+        ('contact_info', text_field(255), False),
+        ('price_per_night', price_field, True),
+        ('availability', integer_field(0), True),
+    ], ('hotel_name', 'location'), True, 'total_rooms', None, 'hotels'),
+    'cars': Feed('car_rentals', [
+        ('company_name', text_field(100), True),
+        ('location', text_field(100), True),
+        ('car_types', text_field(65535), True),
+        ('availability', integer_field(0), True),
+        ('contact_info', text_field(255), False),
+        ('price_per_day', price_field, True),
+    ], ('company_name', 'location'), True, 'total_cars', None, 'cars'),
+}
+
+
+def column_names(feed):
+    return [name for name, _, _ in feed.columns]
+
+
+def validate(feed, record):
+    """Insert parameters for one record; ValueError lists everything wrong with it"""
+    if not isinstance(record, dict):
+        raise ValueError(record if isinstance(record, str) else 'not an object')
+    values, problems = {}, []
+    for name, parse, required in feed.columns:
+        raw = record.get(name)
+        if raw is None or str(raw).strip() == '':
+            if required:
+                problems.append(f"{name} is required")
+            continue
+        try:
+            values[name] = parse(raw)
+        except ValueError as e:
+            problems.append(f"{name} {e}")
+    if feed.check:
+        problems += feed.check(values)
+    if problems:
+        raise ValueError('; '.join(problems))
+    return tuple(values.get(name) for name in column_names(feed))
+
+
+def key_values(feed, values):
+    """The natural key columns of validated values"""
+    columns = column_names(feed)
+    return tuple(values[columns.index(name)] for name in feed.key)
+
+
+def record_key(feed, values):
+    """key_values compared the way MySQL's case-insensitive collation does"""
+    return tuple(value.casefold() for value in key_values(feed, values))
+
+
+def describe_key(feed, values):
+    return ', '.join(f"{name} {value}" for name, value in zip(feed.key, key_values(feed, values)))
+
+
+# LOADING
+
+class ImportReport:
+    """What an import read, wrote and rejected"""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.records = 0
+        self.inserted = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    @property
+    def loaded(self):
+        return self.inserted + self.updated
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append((line, message))
+
+    def summary(self):
+        verb = 'would be ' if self.dry_run else ''
+        elapsed = time.perf_counter() - self.started
+        return (f"{self.records} records read, {self.inserted} {verb}inserted, {self.updated} {verb}updated, "
+                f"{self.error_count} rejected ({self.records / max(elapsed, 0.001):.0f} records/s)")
+
+
+def existing_keys(cursor, feed, keys):
+    """The subset of keys already present in the feed's table"""
+    if not keys:
+        return set()
+    row = '(' + ', '.join(['%s'] * len(feed.key)) + ')'
+    cursor.execute(f"SELECT {', '.join(feed.key)} FROM {feed.table} "
+                   f"WHERE ({', '.join(feed.key)}) IN ({', '.join([row] * len(keys))})",
+                   tuple(value for key in keys for value in key))
+    return {tuple(value.casefold() for value in found) for found in cursor.fetchall()}
+
+
+def insert_statement(feed, count):
+    """One INSERT of count rows, with the feed's ON DUPLICATE KEY UPDATE for upserts"""
+    columns = column_names(feed)
+    row = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    sql = f"INSERT INTO {feed.table} ({', '.join(columns)}) VALUES {', '.join([row] * count)}"
+    if not feed.upsert:
+        return sql
+    updates = []
+    if feed.capacity:
+        # Assignments run left to right, so availability still holds the old value here
+        updates.append(f"{feed.capacity} = IF(availability <=> VALUES(availability), {feed.capacity}, NULL)")
+    for name, _, required in feed.columns:
+        if name in feed.key:
+            continue
+        updates.append(f"{name} = VALUES({name})" if required else f"{name} = COALESCE(VALUES({name}), {name})")
+    return f"{sql} ON DUPLICATE KEY UPDATE {', '.join(updates)}"
+
+
+def write_batch(connection, cursor, feed, rows, report):
+    """Write (line, values) rows in one transaction, falling back to one at a time on a conflict"""
+    try:
+        cursor.execute(insert_statement(feed, len(rows)), tuple(value for _, values in rows for value in values))
+        connection.commit()
+        return len(rows)
+    except IntegrityError:
+        connection.rollback()
+    written = 0
+    single = insert_statement(feed, 1)
+    for line, values in rows:
+        try:
+            cursor.execute(single, values)
+            written += 1
+        except IntegrityError as e:
+            report.error(line, e.msg)
+    connection.commit()
+    return written
+
+
+def import_records(connection, feed, records, batch=IMPORT_BATCH, dry_run=False, progress=None):
+    """Load (line, record) pairs into feed's table; returns an ImportReport
+
+    Batches committed before a database error, or before a ValueError from
+    reading records, stay loaded; the error is raised with the report so
+    far on its import_report attribute.
+    """
+    report = ImportReport(dry_run)
+    seen = set()
+    cursor = connection.cursor()
+    try:
+        for chunk in batches(records, batch):
+            rows = []
+            for line, record in chunk:
+                report.records += 1
+                try:
+                    values = validate(feed, record)
+                except ValueError as e:
+                    report.error(line, str(e))
+                    continue
+                key = record_key(feed, values)
+                if key in seen:
+                    report.error(line, f"{describe_key(feed, values)} appears earlier in the file")
+                    continue
+                seen.add(key)
+                rows.append((line, values))
+
+            found = existing_keys(cursor, feed, [key_values(feed, values) for _, values in rows])
+            new = [(line, values) for line, values in rows if record_key(feed, values) not in found]
+            if feed.upsert:
+                updates = len(rows) - len(new)
+            else:
+                for line, values in rows:
+                    if record_key(feed, values) in found:
+                        report.error(line, f"{describe_key(feed, values)} already exists")
+                rows, updates = new, 0
+
+            if rows and not dry_run:
+                written = write_batch(connection, cursor, feed, rows, report)
+                # Rows lost to a concurrent duplicate were meant as inserts
+                report.inserted += written - updates
+            else:
+                report.inserted += len(rows) - updates
+            report.updated += updates
+            if progress:
+                progress(report)
+    except Error as e:
+        connection.rollback()
+        e.import_report = report
+        raise
+    except ValueError as e:
+        e.import_report = report
+        raise
+    finally:
+        cursor.close()
+    return report
+
+
+def init_imports(app, connect, cache=None):
+    """Register the import-flights, import-hotels and import-cars commands"""
+
+    def register(kind, help_text):
+        @app.cli.command(f"import-{kind}", help=help_text)
+        @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+        @click.option('--format', 'fmt', type=click.Choice(['csv', 'json']),
+                      help='File format (default: from the file extension)')
+        @click.option('--batch', default=IMPORT_BATCH, show_default=True, help='Records per transaction')
+        @click.option('--dry-run', is_flag=True, help='Validate the file and count changes without writing')
+        def import_command(path, fmt, batch, dry_run):
+            feed = FEEDS[kind]
+            fmt = fmt or file_format(path)
+            if fmt is None:
+                raise click.ClickException('Cannot tell the file format from its name; pass --format')
+            connection = connect()
+            if not connection:
+                raise click.ClickException('Database connection error')
+            try:
+                with open(path, 'rb') as stream:
+                    report = import_records(connection, feed, read_records(stream, fmt), batch, dry_run,
+                                            progress=lambda r: click.echo(r.summary(), err=True))
+            except Error as e:
+                report = getattr(e, 'import_report', ImportReport(dry_run))
+                click.echo(f"Import stopped by a database error: {e}", err=True)
+            except ValueError as e:
+                report = getattr(e, 'import_report', ImportReport(dry_run))
+                click.echo(f"Import stopped by an unreadable file: {e}", err=True)
+            finally:
+                connection.close()
+            if cache is not None and report.loaded and not dry_run:
+                cache.bump(feed.cache)
+            for line, message in report.errors:
+                click.echo(f"line {line}: {message}")
+            if report.error_count > len(report.errors):
+                click.echo(f"... and {report.error_count - len(report.errors)} more errors")
+            click.echo(report.summary())
+
+    register('flights', 'Load a flight schedule from a CSV or JSON file.')
+    register('hotels', 'Insert or update hotels from a CSV or JSON file, keyed on name and location.')
+    register('cars', 'Insert or update car rentals from a CSV or JSON file, keyed on company and location.')
@@ -0,0 +1,369 @@
+# metrics.py - In-process Prometheus-style counters and histograms
+#
+# Each metric keeps its samples in a dict guarded by its own lock, so
+# updates from request threads are cheap and never block each other for
+# long. Under a multi-process server set METRICS_DIR to a directory shared
+# by the workers: every process periodically writes a snapshot of its
+# samples to metrics_<pid>.json there, and /metrics sums all snapshots.
+#
+# /metrics names every endpoint and shows booking and payment volumes, so
+# it is closed by default. It is served to a logged-in admin, to a scraper
+# sending "Authorization: Bearer <METRICS_TOKEN>", or to anyone when
+# METRICS_PUBLIC is set, for a port only the monitoring network can reach.
+
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+
+from flask import Response, abort, g, request, session
+
+from config import setting
+
+METRICS_DIR = setting('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = setting('METRICS_FLUSH_INTERVAL', 5.0)
+METRICS_TOKEN = setting('METRICS_TOKEN', '')
+METRICS_PUBLIC = setting('METRICS_PUBLIC', False)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonically increasing count, optionally split by labels"""
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return {json.dumps(key): value for key, value in self._values.items()}
+
+    @staticmethod
+    def merge(total, snapshot):
+        for key, value in snapshot.items():
+            total[key] = total.get(key, 0) + value
+
+    def expose(self, samples):
+        lines = []
+        for key, value in sorted(samples.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, json.loads(key))} {_format_value(value)}")
+        return lines
+
+
+class FunctionCounter(Counter):
+    """Counter whose value is read from a callable when a snapshot is taken
+
+    Used for counts already kept elsewhere, like the fragment cache's hits.
+    """
+
+    def __init__(self, name, documentation, func):
+        super().__init__(name, documentation)
+        self.func = func
+
+    def inc(self, amount=1, **labels):
+        raise TypeError(f"{self.name} is read from a function and cannot be incremented")
+
+    def snapshot(self):
+        return {json.dumps(()): self.func()}
+
+
+class RatioGauge:
+    """Gauge derived at render time as numerator / (numerator + other)
+
+    Computed from the already merged samples of two unlabelled counters, so
+    the ratio is correct across worker processes.
+    """
+
+    type = 'gauge'
+
+    def __init__(self, name, documentation, numerator, other):
+        self.name = name
+        self.documentation = documentation
+        self.numerator = numerator
+        self.other = other
+
+    def snapshot(self):
+        return {}
+
+    @staticmethod
+    def merge(total, snapshot):
+        pass
+
+    def expose_all(self, samples):
+        hits = sum(samples.get(self.numerator.name, {}).values())
+        misses = sum(samples.get(self.other.name, {}).values())
+        ratio = hits / (hits + misses) if hits + misses else 0
+        return [f"{self.name} {_format_value(ratio)}"]
+
+
+class Histogram:
+    """Cumulative bucket histogram of observed values, optionally split by labels"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, **labels):
+        """Context manager observing the duration of a block in seconds"""
+        return _Timer(self, labels)
+
+    def snapshot(self):
+        with self._lock:
+            return {json.dumps(key): [list(counts), total, count]
+                    for key, (counts, total, count) in self._values.items()}
+
+    @staticmethod
+    def merge(total, snapshot):
+        for key, (counts, value_sum, count) in snapshot.items():
+            entry = total.setdefault(key, [[0] * len(counts), 0.0, 0])
+            entry[0] = [a + b for a, b in zip(entry[0], counts)]
+            entry[1] += value_sum
+            entry[2] += count
+
+    def expose(self, samples):
+        lines = []
+        for key, (counts, value_sum, count) in sorted(samples.items()):
+            values = json.loads(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, values, ('le', _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(value_sum)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Registry:
+    """Set of metrics rendered together in the Prometheus text format"""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._metrics = {}
+        self._last_flush = 0.0
+        self._flush_lock = threading.Lock()
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def function_counter(self, name, documentation, func):
+        return self.register(FunctionCounter(name, documentation, func))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def ratio_gauge(self, name, documentation, numerator, other):
+        return self.register(RatioGauge(name, documentation, numerator, other))
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def _snapshot_path(self, pid=None):
+        return os.path.join(self.directory, f"metrics_{pid or os.getpid()}.json")
+
+    def flush(self, force=False):
+        """Write this process's snapshot to the shared directory, at most once per interval"""
+        if not self.directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < METRICS_FLUSH_INTERVAL:
+            return
+        if not self._flush_lock.acquire(blocking=force):
+            return
+        try:
+            self._last_flush = now
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._snapshot_path()
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+        finally:
+            self._flush_lock.release()
+
+    def collect(self):
+        """Samples for every metric, summed across worker processes when METRICS_DIR is set"""
+        if not self.directory:
+            return self.snapshot()
+
+        self.flush(force=True)
+        totals = {name: {} for name in self._metrics}
+        for path in glob.glob(os.path.join(self.directory, 'metrics_*.json')):
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, samples in snapshot.items():
+                if name in self._metrics:
+                    self._metrics[name].merge(totals[name], samples)
+        return totals
+
+    def render(self, samples=None):
+        samples = self.collect() if samples is None else samples
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            if isinstance(metric, RatioGauge):
+                lines.extend(metric.expose_all(samples))
+            else:
+                lines.extend(metric.expose(samples.get(name, {})))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry(METRICS_DIR)
+
+REQUEST_SECONDS = registry.histogram(
+    'airplanned_http_request_duration_seconds', 'Time spent handling a request',
+    ['endpoint', 'method'])
+REQUESTS = registry.counter(
+    'airplanned_http_requests_total', 'Requests handled, by response status',
+    ['endpoint', 'method', 'status'])
+DB_CONNECT_SECONDS = registry.histogram(
+    'airplanned_db_connect_duration_seconds', 'Time spent acquiring a database connection',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+DB_CONNECT_ERRORS = registry.counter(
+    'airplanned_db_connect_errors_total', 'Failed database connection attempts')
+DB_CONNECTIONS = registry.counter(
+    'airplanned_db_connections_total', 'Database connections handed out, by primary or replica',
+    ['role'])
+DB_QUERY_SECONDS = registry.histogram(
+    'airplanned_db_query_duration_seconds', 'Statement execute and fetch time',
+    ['statement'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+BOOKINGS = registry.counter(
+    'airplanned_bookings_total', 'Booking attempts that reached the database, by outcome',
+    ['kind', 'outcome'])
+PAYMENTS = registry.counter(
+    'airplanned_payments_total', 'Payment attempts processed, by outcome',
+    ['kind', 'outcome'])
+PAYMENT_GATEWAY_SECONDS = registry.histogram(
+    'airplanned_payment_gateway_duration_seconds', 'Time spent waiting on the payment gateway',
+    ['outcome'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+HOLDS_EXPIRED = registry.counter(
+    'airplanned_holds_expired_total', 'Unpaid bookings cancelled by the hold sweeper',
+    ['kind'])
+INVENTORY_DRIFT = registry.counter(
+    'airplanned_inventory_drift_repaired_total', 'Inventory counters rewritten by the reconciler',
+    ['kind'])
+FANOUT_INCOMPLETE = registry.counter(
+    'airplanned_fanout_incomplete_total', 'Parallel page queries left out of a page, by timeout or error',
+    ['query', 'reason'])
+
+
+def statement_type(sql):
+    """First keyword of a statement (select, insert, ...), used as a low-cardinality label"""
+    keyword = sql.lstrip().split(None, 1)[0].lower() if sql.strip() else ''
+    return keyword if keyword in ('select', 'insert', 'update', 'delete') else 'other'
+
+
+def register_cache_metrics(name, cache):
+    """Expose a FragmentCache's hit and miss counts and its hit ratio"""
+    hits = registry.function_counter(
+        f'airplanned_{name}_cache_hits_total', f'{name} cache lookups served from the cache',
+        lambda: cache.hits)
+    misses = registry.function_counter(
+        f'airplanned_{name}_cache_misses_total', f'{name} cache lookups that had to render',
+        lambda: cache.misses)
+    registry.ratio_gauge(
+        f'airplanned_{name}_cache_hit_ratio', f'Share of {name} cache lookups that were hits',
+        hits, misses)
+
+
+def init_metrics(app):
+    """Time every request and serve the registry at /metrics"""
+
+    def scrape_allowed():
+        if METRICS_PUBLIC or session.get('admin_logged_in'):
+            return True
+        supplied = request.headers.get('Authorization', '')
+        return bool(METRICS_TOKEN) and hmac.compare_digest(supplied.encode(), f"Bearer {METRICS_TOKEN}".encode())
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            endpoint = request.endpoint or 'unmatched'
+            REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, method=request.method)
+            REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        registry.flush()
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus scrape endpoint"""
+        if not scrape_allowed():
+            abort(403)
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,218 @@
+# migrations.py - Upgrade an existing database to the current airplanned_mysql.sql
+#
+# airplanned_mysql.sql creates a fresh database. One created from an older
+# copy is brought up to date in place, without losing its data, by
+#
+#   flask --app app upgrade-db [--dry-run]
+#
+# Each step adds one column, index or table. It is skipped when
+# information_schema shows the change is already there, so the command can
+# be run on every deploy, and run again after a failed step. An index whose
+# columns have changed is dropped and re-added in the same ALTER TABLE, so a
+# foreign key relying on it always has an index. A unique index is only
+# added once no duplicate rows remain; the command lists duplicates and
+# stops instead.
+#
+# Steps run in the order they are listed, which follows the schema's
+# history; append new ones at the end.
+
+import textwrap
+from collections import namedtuple
+
+import click
+from mysql.connector import Error
+
+# kind is 'column', 'index' or 'table'. For a column, spec is its definition;
+# for an index, its columns, unique=True for a unique index; for a table,
+# its CREATE TABLE statement.
+Step = namedtuple('Step', 'kind table name spec unique', defaults=(False,))
+
+UPDATED_AT = 'TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP'
+
+STEPS = [
+    # HTTP validators (ETags) and incremental jobs read MAX(updated_at)
+    Step('index', 'flights', 'idx_updated_at', ('updated_at',)),
+    Step('column', 'hotels', 'updated_at', f"{UPDATED_AT} AFTER `created_at`"),
+    Step('index', 'hotels', 'idx_updated_at', ('updated_at',)),
+    Step('column', 'car_rentals', 'updated_at', f"{UPDATED_AT} AFTER `created_at`"),
+    Step('index', 'car_rentals', 'idx_updated_at', ('updated_at',)),
+    Step('column', 'flight_bookings', 'updated_at', f"{UPDATED_AT} AFTER `created_at`"),
+
+    # Payment intents and the bookings each one pays for
+    Step('table', 'payment_intents', None, """
+        CREATE TABLE `payment_intents` (
+          `intent_id` INT NOT NULL AUTO_INCREMENT,
+          `user_id` INT NOT NULL,
+          `idempotency_key` VARCHAR(64) NOT NULL,
+          `amount` DECIMAL(10,2) NOT NULL,
+          `status` ENUM('queued', 'processing', 'succeeded', 'failed') NOT NULL DEFAULT 'queued',
+          `card_last4` CHAR(4) NOT NULL,
+          `gateway_reference` VARCHAR(100) NULL,
+          `error` VARCHAR(255) NULL,
+          `attempts` INT NOT NULL DEFAULT 0,
+          `created_at` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
+          `updated_at` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+          PRIMARY KEY (`intent_id`),
+          UNIQUE INDEX `idempotency_key_UNIQUE` (`user_id` ASC, `idempotency_key` ASC),
+          CONSTRAINT `fk_payment_intents_users`
+            FOREIGN KEY (`user_id`) REFERENCES `users` (`user_id`) ON DELETE CASCADE)
+        ENGINE = InnoDB
+    """),
+    Step('table', 'payments', None, """
+        CREATE TABLE `payments` (
+          `booking_type` ENUM('flight', 'hotel', 'car') NOT NULL,
+          `booking_id` INT NOT NULL,
+          `user_id` INT NOT NULL,
+          `intent_id` INT NOT NULL,
+          `amount` DECIMAL(10,2) NOT NULL,
+          `status` ENUM('processing', 'paid', 'failed') NOT NULL DEFAULT 'processing',
+          `paid_at` TIMESTAMP NULL,
+          `created_at` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
+          `updated_at` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+          PRIMARY KEY (`booking_type`, `booking_id`),
+          INDEX `fk_payments_intents_idx` (`intent_id` ASC),
+          INDEX `fk_payments_users_idx` (`user_id` ASC),
+          CONSTRAINT `fk_payments_intents`
+            FOREIGN KEY (`intent_id`) REFERENCES `payment_intents` (`intent_id`) ON DELETE CASCADE,
+          CONSTRAINT `fk_payments_users`
+            FOREIGN KEY (`user_id`) REFERENCES `users` (`user_id`) ON DELETE CASCADE)
+        ENGINE = InnoDB
+    """),
+    # Passengers booked together are paid for together
+    Step('column', 'flight_bookings', 'group_id', 'CHAR(32) NULL AFTER `payment_date`'),
+    Step('index', 'flight_bookings', 'idx_group_id', ('group_id',)),
+
+    # The hold sweeper finds expired unpaid bookings by status and age
+    Step('index', 'flight_bookings', 'idx_pending_holds', ('payment_status', 'booking_status', 'created_at')),
+    Step('index', 'hotel_bookings', 'idx_pending_holds', ('payment_status', 'booking_status', 'created_at')),
+    Step('index', 'car_bookings', 'idx_pending_holds', ('payment_status', 'booking_status', 'created_at')),
+
+    # Inventory reconciliation: capacities, per-item booking counts by
+    # status, and the rows changed since the last run
+    Step('column', 'hotels', 'total_rooms',
+         "INT NULL COMMENT 'NULL until the reconciler adopts availability plus held rooms' AFTER `availability`"),
+    Step('column', 'car_rentals', 'total_cars',
+         "INT NULL COMMENT 'NULL until the reconciler adopts availability plus held cars' AFTER `availability`"),
+    Step('column', 'hotel_bookings', 'updated_at', f"{UPDATED_AT} AFTER `created_at`"),
+    Step('column', 'car_bookings', 'updated_at', f"{UPDATED_AT} AFTER `created_at`"),
+    Step('index', 'flight_bookings', 'idx_updated_at', ('updated_at',)),
+    Step('index', 'hotel_bookings', 'idx_updated_at', ('updated_at',)),
+    Step('index', 'car_bookings', 'idx_updated_at', ('updated_at',)),
+    Step('index', 'flight_bookings', 'fk_flight_bookings_flights_idx', ('flight_id', 'booking_status')),
+    Step('index', 'hotel_bookings', 'fk_hotel_bookings_hotels_idx', ('hotel_id', 'booking_status')),
+    Step('index', 'car_bookings', 'fk_car_bookings_rentals_idx', ('rental_id', 'booking_status')),
+    Step('table', 'job_watermarks', None, """
+        CREATE TABLE `job_watermarks` (
+          `job_name` VARCHAR(64) NOT NULL,
+          `watermark` TIMESTAMP NOT NULL,
+          `updated_at` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+          PRIMARY KEY (`job_name`))
+        ENGINE = InnoDB
+    """),
+
+    # Imports upsert hotels and car rentals on their name and location
+    Step('index', 'hotels', 'uq_hotel_name_location', ('hotel_name', 'location'), unique=True),
+    Step('index', 'car_rentals', 'uq_company_location', ('company_name', 'location'), unique=True),
+]
+
+
+def _quoted(names):
+    return ', '.join(f"`{name}`" for name in names)
+
+
+def _index_columns(cursor, table, name):
+    cursor.execute("""
+        SELECT column_name FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        ORDER BY seq_in_index
+    """, (table, name))
+    return tuple(row[0] for row in cursor.fetchall())
+
+
+def _exists(cursor, source, table, column=None):
+    if column is None:
+        cursor.execute(f"SELECT COUNT(*) FROM information_schema.{source} "
+                       "WHERE table_schema = DATABASE() AND table_name = %s", (table,))
+    else:
+        cursor.execute(f"SELECT COUNT(*) FROM information_schema.{source} "
+                       "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s",
+                       (table, column))
+    return cursor.fetchone()[0] > 0
+
+
+def pending_statement(cursor, step):
+    """The DDL that applies step, or None when the database already has it"""
+    if step.kind == 'table':
+        return None if _exists(cursor, 'tables', step.table) else textwrap.dedent(step.spec).strip()
+    if step.kind == 'column':
+        if _exists(cursor, 'columns', step.table, step.name):
+            return None
+        return f"ALTER TABLE `{step.table}` ADD COLUMN `{step.name}` {step.spec}"
+    current = _index_columns(cursor, step.table, step.name)
+    if current == tuple(step.spec):
+        return None
+    add = f"ADD {'UNIQUE ' if step.unique else ''}INDEX `{step.name}` ({_quoted(step.spec)})"
+    if current:
+        return f"ALTER TABLE `{step.table}` DROP INDEX `{step.name}`, {add}"
+    return f"ALTER TABLE `{step.table}` {add}"
+
+
+def duplicates(cursor, step, limit=5):
+    """Up to limit value tuples that occur more than once in a unique index's columns"""
+    columns = _quoted(step.spec)
+    cursor.execute(f"""
+        SELECT {columns}, COUNT(*) FROM `{step.table}`
+        GROUP BY {columns} HAVING COUNT(*) > 1
+        LIMIT %s
+    """, (limit,))
+    return cursor.fetchall()
+
+
+def upgrade(connection, apply=True, echo=print):
+    """Apply (or with apply=False only list) every missing step; returns the statements"""
+    statements = []
+    cursor = connection.cursor()
+    try:
+        for step in STEPS:
+            statement = pending_statement(cursor, step)
+            if statement is None:
+                continue
+            if step.unique:
+                found = duplicates(cursor, step)
+                if found:
+                    shown = '; '.join(', '.join(str(v) for v in row[:-1]) + f" ({row[-1]} rows)" for row in found)
+                    raise ValueError(f"{step.table} has duplicate {', '.join(step.spec)} values "
+                                     f"for {step.name}: {shown}")
+            echo(statement)
+            if apply:
+                cursor.execute(statement)
+            statements.append(statement)
+    finally:
+        cursor.close()
+    return statements
+
+
+def init_migrations(app, connect):
+    """Register the upgrade-db command"""
+
+    @app.cli.command('upgrade-db')
+    @click.option('--dry-run', is_flag=True, help='List the changes without making them')
+    def upgrade_db_command(dry_run):
+        """Add the columns, indexes and tables an older database is missing."""
+        connection = connect()
+        if not connection:
+            raise click.ClickException('Database connection error')
+        try:
+            statements = upgrade(connection, apply=not dry_run, echo=click.echo)
+        except ValueError as e:
+            raise click.ClickException(f"{e}. Remove the duplicates and run upgrade-db again")
+        except Error as e:
+            raise click.ClickException(f"Database error: {e}")
+        finally:
+            connection.close()
+        if not statements:
+            click.echo('The database is up to date')
+        elif dry_run:
+            click.echo(f"{len(statements)} changes needed; run again without --dry-run to make them")
+        else:
+            click.echo(f"{len(statements)} changes made")
@@ -0,0 +1,443 @@
+# payments.py - Payment service for flight, hotel and car bookings
+#
+# Every booking type is paid the same way. The payment routes validate the
+# card form and record a payment intent covering one or more bookings, then
+# redirect to a status page that polls until the intent settles. A pool of
+# worker threads charges queued intents against the configured gateway and
+# settles all of an intent's bookings in one transaction, so slow gateway
+# calls never hold a web worker. Nor do they hold a database connection: a
+# worker returns its connection to the pool before calling the gateway and
+# checks out another to record the result.
+#
+# Tables:
+#   payment_intents - one charge attempt: amount, status, card_last4 and the
+#                     form's idempotency key (unique per user), so a retried
+#                     or double-clicked submit returns the existing intent
+#   payments        - one row per (booking_type, booking_id), pointing at the
+#                     intent that is paying (or paid) for the booking; its
+#                     primary key stops two intents paying the same booking
+#
+# Card numbers and CVVs are never written to the database: the card travels
+# to the workers through an in-process queue and only its last four digits
+# are kept on the intent. The gateway is called with the intent id as the
+# idempotency key, so a retried charge cannot bill twice. Intents stranded by
+# a restart (or a full queue) are failed after PAYMENT_INTENT_TIMEOUT seconds
+# so the user can simply pay again; a charge approved after its intent was
+# failed is refunded instead of settled.
+#
+# PAYMENT_GATEWAY selects the gateway: "stub" or "module:Class" for any
+# PaymentGateway implementation importable by the app. It must be set outside
+# debug mode, so a deployment cannot take bookings against the stub by
+# accident; in debug mode it defaults to the stub.
+
+import importlib
+import queue
+import random
+import re
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from mysql.connector import Error, IntegrityError
+
+from config import setting
+from metrics import PAYMENTS, PAYMENT_GATEWAY_SECONDS
+from tracing import app_logger, start_span, KIND_CLIENT
+
+PAYMENT_GATEWAY = setting('PAYMENT_GATEWAY', '')
+PAYMENT_WORKERS = setting('PAYMENT_WORKERS', 4)
+PAYMENT_QUEUE_SIZE = setting('PAYMENT_QUEUE_SIZE', 1000)
+PAYMENT_INTENT_TIMEOUT = setting('PAYMENT_INTENT_TIMEOUT', 600)
+PAYMENT_STUB_LATENCY_MS = setting('PAYMENT_STUB_LATENCY_MS', 300.0)
+
+# Booking table per booking type, and the extra columns set when it is paid
+BOOKING_TABLES = {
+    'flight': ('flight_bookings', ', b.payment_date = %s'),
+    'hotel': ('hotel_bookings', ''),
+    'car': ('car_bookings', ''),
+}
+
+Card = namedtuple('Card', 'number expiry cvv holder')
+GatewayResult = namedtuple('GatewayResult', 'approved reference message')
+
+
+def card_from_form(form):
+    """(Card, None) from the payment form fields, or (None, error message)"""
+    card = Card(form.get('card_number', '').replace(' ', ''), form.get('expiry_date', '').strip(),
+                form.get('cvv', '').strip(), form.get('cardholder_name', '').strip())
+    if not all(card):
+        return None, 'All payment fields are required'
+    if len(card.number) != 16 or not card.number.isdigit():
+        return None, 'Card number must be 16 digits'
+    if not re.match(r'^\d{2}/\d{2}$', card.expiry):
+        return None, 'Expiry date must be in MM/YY format'
+    if len(card.cvv) != 3 or not card.cvv.isdigit():
+        return None, 'CVV must be 3 digits'
+    return card, None
+
+
+# GATEWAYS
+
+class PaymentGateway:
+    """Interface for card processors; charge() must be safe to repeat with the same idempotency key"""
+
+    def charge(self, amount, card, idempotency_key):
+        raise NotImplementedError
+
+    def refund(self, reference, amount):
+        raise NotImplementedError
+
+
+class StubGateway(PaymentGateway):
+    """Local stand-in for a remote processor
+
+    Sleeps for roughly PAYMENT_STUB_LATENCY_MS per call and approves every
+    card except numbers ending in 0002 (declined) and 0119 (the call fails,
+    as on a gateway timeout).
+    """
+
+    def __init__(self, latency_ms=PAYMENT_STUB_LATENCY_MS):
+        self.latency = latency_ms / 1000
+        self._charges = {}
+        self._lock = threading.Lock()
+
+    def charge(self, amount, card, idempotency_key):
+        time.sleep(self.latency * random.uniform(0.5, 1.5))
+        with self._lock:
+            if idempotency_key in self._charges:
+                return self._charges[idempotency_key]
+            if card.number.endswith('0119'):
+                raise ConnectionError('stub gateway timed out')
+            if card.number.endswith('0002'):
+                result = GatewayResult(False, None, 'Your card was declined')
+            else:
+                result = GatewayResult(True, f"stub_{random.getrandbits(48):012x}", 'Approved')
+            self._charges[idempotency_key] = result
+        return result
+
+    def refund(self, reference, amount):
+        time.sleep(self.latency)
+        return GatewayResult(True, reference, 'Refunded')
+
+
+def load_gateway(spec=PAYMENT_GATEWAY, debug=False):
+    """The configured gateway; without PAYMENT_GATEWAY only debug mode gets the stub"""
+    if not spec:
+        if not debug:
+            raise RuntimeError('PAYMENT_GATEWAY is not set; use "module:Class" for a real gateway, '
+                               'or "stub" to accept every payment without charging')
+        spec = 'stub'
+    if spec == 'stub':
+        return StubGateway()
+    module_name, _, class_name = spec.partition(':')
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+# INTENTS
+
+def expire_stale_intents(cursor, where, params):
+    """Fail unfinished intents matching `where` (on i/p aliases) that have not moved for PAYMENT_INTENT_TIMEOUT"""
+    cursor.execute(f"""
+        UPDATE payment_intents i
+        JOIN payments p ON p.intent_id = i.intent_id
+        SET i.status = 'failed', i.error = 'Payment timed out. Please try again.', p.status = 'failed'
+        WHERE {where} AND i.status IN ('queued', 'processing')
+          AND i.updated_at < NOW() - INTERVAL %s SECOND
+    """, (*params, PAYMENT_INTENT_TIMEOUT))
+
+
+def create_intent(cursor, user_id, bookings, card, idempotency_key):
+    """Queue one intent paying for every (booking_type, booking_id) in bookings
+
+    Returns (intent_id, created). A submit repeating an idempotency key gets
+    the original intent back, and bookings already being paid by another
+    intent return that intent; in both cases created is False and the
+    caller should roll back. (None, False) means a booking is not payable.
+    Must run in a transaction the caller started, so that rolling back
+    removes a partly claimed intent.
+    """
+    cursor.execute("SELECT intent_id FROM payment_intents WHERE user_id = %s AND idempotency_key = %s",
+                   (user_id, idempotency_key))
+    existing = cursor.fetchone()
+    if existing:
+        return existing[0], False
+
+    by_type = {}
+    for booking_type, booking_id in bookings:
+        by_type.setdefault(booking_type, []).append(booking_id)
+    for booking_type, booking_ids in by_type.items():
+        placeholders = ', '.join(['%s'] * len(booking_ids))
+        expire_stale_intents(cursor, f"p.booking_type = %s AND p.booking_id IN ({placeholders})",
+                             (booking_type, *booking_ids))
+
+    try:
+        cursor.execute("""
+            INSERT INTO payment_intents (user_id, idempotency_key, amount, card_last4)
+            VALUES (%s, %s, 0, %s)
+        """, (user_id, idempotency_key, card.number[-4:]))
+    except IntegrityError:
+        # A concurrent submit with the same key won the insert; a locking read sees its
+        # committed row, which this transaction's snapshot does not
+        cursor.execute("""
+            SELECT intent_id FROM payment_intents WHERE user_id = %s AND idempotency_key = %s FOR SHARE
+        """, (user_id, idempotency_key))
+        existing = cursor.fetchone()
+        return (existing[0] if existing else None), False
+    intent_id = cursor.lastrowid
+
+    # Claim each pending booking; a row owned by a live intent keeps its owner
+    for booking_type, booking_ids in by_type.items():
+        table = BOOKING_TABLES[booking_type][0]
+        placeholders = ', '.join(['%s'] * len(booking_ids))
+        cursor.execute(f"""
+            INSERT INTO payments (booking_type, booking_id, user_id, intent_id, amount, status)
+            SELECT %s, b.booking_id, b.user_id, %s, b.total_amount, 'processing'
+            FROM {table} b
+            WHERE b.booking_id IN ({placeholders}) AND b.user_id = %s AND b.payment_status = 'Pending'
+            ON DUPLICATE KEY UPDATE
+                payments.intent_id = IF(payments.status = 'failed', VALUES(intent_id), payments.intent_id),
+                payments.amount = IF(payments.status = 'failed', VALUES(amount), payments.amount),
+                payments.status = IF(payments.status = 'failed', 'processing', payments.status)
+        """, (booking_type, intent_id, *booking_ids, user_id))
+
+    cursor.execute("SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM payments WHERE intent_id = %s", (intent_id,))
+    claimed, amount = cursor.fetchone()
+    if claimed != len(bookings):
+        booking_type, booking_id = bookings[0]
+        cursor.execute("""
+            SELECT intent_id FROM payments
+            WHERE booking_type = %s AND booking_id = %s AND user_id = %s AND status = 'processing'
+              AND intent_id <> %s
+            FOR SHARE
+        """, (booking_type, booking_id, user_id, intent_id))
+        in_flight = cursor.fetchone()
+        return (in_flight[0] if in_flight else None), False
+
+    cursor.execute("UPDATE payment_intents SET amount = %s WHERE intent_id = %s", (amount, intent_id))
+    return intent_id, True
+
+
+def fail_intent(cursor, intent_id, message):
+    """Mark an unfinished intent failed and release its bookings for another attempt"""
+    cursor.execute("""
+        UPDATE payment_intents i
+        JOIN payments p ON p.intent_id = i.intent_id
+        SET i.status = 'failed', i.error = %s, p.status = 'failed'
+        WHERE i.intent_id = %s AND i.status IN ('queued', 'processing')
+    """, (message, intent_id))
+
+
+def get_intent(cursor, intent_id, user_id):
+    """The user's intent as a dict with its (booking_type, booking_id) list, or None"""
+    expire_stale_intents(cursor, 'i.intent_id = %s', (intent_id,))
+    cursor.execute("""
+        SELECT intent_id, status, amount, card_last4, error, created_at
+        FROM payment_intents
+        WHERE intent_id = %s AND user_id = %s
+    """, (intent_id, user_id))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    intent = dict(zip(('intent_id', 'status', 'amount', 'card_last4', 'error', 'created_at'), row))
+    cursor.execute("""
+        SELECT booking_type, booking_id FROM payments WHERE intent_id = %s ORDER BY booking_type, booking_id
+    """, (intent_id,))
+    intent['bookings'] = cursor.fetchall()
+    return intent
+
+
+def settle(cursor, intent_id, reference):
+    """Mark the intent succeeded and its bookings paid, one UPDATE per booking table
+
+    Must run in a transaction the caller started. Returns False, and the
+    caller must roll back and refund the charge, when the intent is no
+    longer processing (it expired while the charge was in flight, and its
+    bookings may have moved to a newer intent), its claimed payments no
+    longer add up to the amount charged, or a booking was no longer pending.
+    """
+    cursor.execute("""
+        UPDATE payment_intents SET status = 'succeeded', gateway_reference = %s
+        WHERE intent_id = %s AND status = 'processing'
+    """, (reference, intent_id))
+    if cursor.rowcount != 1:
+        return False
+    cursor.execute("SELECT amount FROM payment_intents WHERE intent_id = %s", (intent_id,))
+    amount = cursor.fetchone()[0]
+    cursor.execute("""
+        SELECT booking_type, COUNT(*), SUM(amount) FROM payments
+        WHERE intent_id = %s AND status = 'processing'
+        GROUP BY booking_type
+        FOR UPDATE
+    """, (intent_id,))
+    claims = cursor.fetchall()
+    if not claims or sum(claimed for _, _, claimed in claims) != amount:
+        return False
+    for booking_type, count, _ in claims:
+        table, paid_columns = BOOKING_TABLES[booking_type]
+        params = (datetime.now().date(),) if paid_columns else ()
+        cursor.execute(f"""
+            UPDATE {table} b
+            JOIN payments p ON p.booking_type = %s AND p.booking_id = b.booking_id
+            SET b.payment_status = 'Paid'{paid_columns}
+            WHERE p.intent_id = %s AND b.user_id = p.user_id AND b.payment_status = 'Pending'
+        """, (booking_type, *params, intent_id))
+        if cursor.rowcount != count:
+            return False
+    cursor.execute("UPDATE payments SET status = 'paid', paid_at = NOW() WHERE intent_id = %s", (intent_id,))
+    return True
+
+
+# WORKERS
+
+class PaymentWorkerPool:
+    """Threads that take (intent_id, card) jobs off a bounded queue and settle them
+
+    Threads start on the first submit, so each process of a forking server
+    runs its own pool.
+    """
+
+    def __init__(self, connect, gateway, workers=PAYMENT_WORKERS, max_queue=PAYMENT_QUEUE_SIZE):
+        self.connect = connect
+        self.gateway = gateway
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, intent_id, card):
+        """Hand an intent to the workers; False when the queue is full"""
+        self._start()
+        try:
+            self._queue.put_nowait((intent_id, card))
+        except queue.Full:
+            return False
+        return True
+
+    def _start(self):
+        if self._threads:
+            return
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name=f"payment-worker-{len(self._threads)}",
+                                          daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            intent_id, card = self._queue.get()
+            try:
+                self.process(intent_id, card)
+            except Exception as e:
+                app_logger.exception(f"Payment worker error for intent {intent_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """Block until every submitted intent has been processed"""
+        self._queue.join()
+
+    def process(self, intent_id, card):
+        """Claim one intent, charge it and settle or release its bookings
+
+        No connection is held during the gateway call.
+        """
+        claimed = self.claim(intent_id)
+        if claimed is not None:
+            kind, amount = claimed
+            self.record(intent_id, kind, amount, self.charge(intent_id, kind, amount, card))
+
+    def claim(self, intent_id):
+        """Move a queued intent to processing; (kind, amount), or None when there is nothing to charge"""
+        connection = self.connect()
+        if not connection:
+            # The intent stays queued and expires; the user is asked to retry
+            return None
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.execute("""
+                UPDATE payment_intents SET status = 'processing', attempts = attempts + 1
+                WHERE intent_id = %s AND status = 'queued'
+            """, (intent_id,))
+            if cursor.rowcount == 0:
+                connection.commit()
+                return None
+            cursor.execute("SELECT amount FROM payment_intents WHERE intent_id = %s", (intent_id,))
+            amount = cursor.fetchone()[0]
+            cursor.execute("SELECT DISTINCT booking_type FROM payments WHERE intent_id = %s", (intent_id,))
+            kinds = [row[0] for row in cursor.fetchall()]
+            connection.commit()
+            return (kinds[0] if len(kinds) == 1 else 'mixed'), amount
+        except Error as e:
+            connection.rollback()
+            PAYMENTS.inc(kind='unknown', outcome='error')
+            app_logger.error(f"Database error claiming payment intent {intent_id}: {e}")
+            return None
+        finally:
+            if cursor is not None and connection.is_connected():
+                cursor.close()
+            connection.close()
+
+    def record(self, intent_id, kind, amount, result):
+        """Settle the intent on an approved charge, otherwise fail it; refunds a charge that cannot be settled"""
+        connection = self.connect()
+        if not connection:
+            # The intent expires and the user is asked to retry, so an approved charge must not stand
+            if result is not None and result.approved:
+                self.gateway.refund(result.reference, amount)
+            PAYMENTS.inc(kind=kind, outcome='error')
+            return
+        cursor = None
+        # An approved charge is refunded unless it is settled
+        refund_due = result is not None and result.approved
+        try:
+            cursor = connection.cursor()
+            if result is None:
+                fail_intent(cursor, intent_id, 'The payment service is unavailable. Please try again.')
+                PAYMENTS.inc(kind=kind, outcome='error')
+            elif not result.approved:
+                fail_intent(cursor, intent_id, result.message)
+                PAYMENTS.inc(kind=kind, outcome='declined')
+            else:
+                # Connections autocommit, so the settlement needs an explicit transaction to be all or nothing
+                connection.start_transaction()
+                if settle(cursor, intent_id, result.reference):
+                    connection.commit()
+                    refund_due = False
+                    PAYMENTS.inc(kind=kind, outcome='success')
+                else:
+                    # The intent expired, or a booking was paid or cancelled elsewhere, while the charge was in flight
+                    connection.rollback()
+                    refund_due = False
+                    self.gateway.refund(result.reference, amount)
+                    fail_intent(cursor, intent_id, 'Booking not found or payment already processed')
+                    PAYMENTS.inc(kind=kind, outcome='rejected')
+            connection.commit()
+
+        except Error as e:
+            connection.rollback()
+            if refund_due:
+                self.gateway.refund(result.reference, amount)
+            PAYMENTS.inc(kind=kind, outcome='error')
+            app_logger.error(f"Database error processing payment intent {intent_id}: {e}")
+        finally:
+            if cursor is not None and connection.is_connected():
+                cursor.close()
+            connection.close()
+
+    def charge(self, intent_id, kind, amount, card):
+        """Gateway call, traced and timed; None when the gateway could not be reached"""
+        started = time.perf_counter()
+        result = None
+        with start_span('payment.charge', kind=KIND_CLIENT, attributes={
+                'payment.intent_id': intent_id, 'payment.booking_type': kind}) as span:
+            try:
+                result = self.gateway.charge(amount, card, f"intent-{intent_id}")
+            except Exception as e:
+                span.record_error(e)
+                app_logger.warning(f"Payment gateway error for intent {intent_id}: {e}")
+        outcome = 'error' if result is None else 'approved' if result.approved else 'declined'
+        PAYMENT_GATEWAY_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
+        return result
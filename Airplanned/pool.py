@@ -0,0 +1,143 @@
+# pool.py - Bounded, blocking pool of MySQL connections for one endpoint
+#
+# mysql.connector's own pooling raises as soon as the pool is exhausted; this
+# pool instead waits up to DB_POOL_TIMEOUT seconds for a connection to come
+# back, so a burst of requests queues briefly instead of failing. Connections
+# are opened lazily up to DB_POOL_SIZE and kept open between requests.
+#
+# close() on a pooled connection returns it: any open transaction is rolled
+# back first, and connections that went away are dropped and replaced by a
+# fresh one on the next checkout. Views only close connections for which
+# is_connected() is true, so is_connected() returning false also gives the
+# dead connection back; otherwise every connection lost mid-request would
+# keep its slot and the pool would run dry. Each connection keeps its
+# StatementCache of prepared statements for as long as it stays in the pool.
+
+import queue
+import threading
+
+from mysql.connector import Error, PoolError
+
+from config import setting
+from statements import DB_STATEMENT_CACHE_SIZE, CachedPreparedCursor, StatementCache
+
+DB_POOL_SIZE = setting('DB_POOL_SIZE', 10)
+DB_POOL_TIMEOUT = setting('DB_POOL_TIMEOUT', 5.0)
+
+
+class PooledConnection:
+    """Checked-out connection whose close() hands it back to the pool"""
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise PoolError('Connection has been returned to the pool')
+        return getattr(self._connection, name)
+
+    def is_connected(self):
+        """Whether the connection is usable; a lost connection is given back to the pool"""
+        if self._connection is None:
+            return False
+        if self._connection.is_connected():
+            return True
+        self.close()
+        return False
+
+    def cursor(self, *args, prepared=False, **kwargs):
+        """A cursor; prepared=True reuses the connection's cached prepared statements"""
+        if not prepared or self._pool.statement_cache_size <= 0:
+            return self.__getattr__('cursor')(*args, **kwargs)
+        return CachedPreparedCursor(self._pool.statements(self._connection), self._connection)
+
+    def close(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            self._pool.release(connection)
+
+
+class ConnectionPool:
+    """Up to size connections opened with connect(**config)"""
+
+    def __init__(self, connect, config, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+                 statement_cache_size=DB_STATEMENT_CACHE_SIZE):
+        self._connect = connect
+        self.config = config
+        self.size = size
+        self.timeout = timeout
+        self.statement_cache_size = statement_cache_size
+        self._idle = queue.LifoQueue()
+        self._statements = {}
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Claim a slot for a new connection if the pool is not full"""
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                return True
+            return False
+
+    def statements(self, connection):
+        """The StatementCache of one of this pool's connections"""
+        cache = self._statements.get(id(connection))
+        if cache is None:
+            cache = self._statements[id(connection)] = StatementCache(connection, self.statement_cache_size)
+        return cache
+
+    def _discard(self, connection):
+        with self._lock:
+            self._opened -= 1
+        self._statements.pop(id(connection), None)
+        try:
+            connection.close()
+        except Error:
+            pass
+
+    def _open(self):
+        try:
+            return self._connect(**self.config)
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def get(self):
+        """A live connection, waiting up to timeout seconds for one to be released"""
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                if self._reserve():
+                    return PooledConnection(self, self._open())
+                try:
+                    connection = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise PoolError(f"No connection to {self.config['host']} free after "
+                                    f"{self.timeout}s (pool size {self.size})") from None
+            if connection.is_connected():
+                return PooledConnection(self, connection)
+            self._discard(connection)
+
+    def release(self, connection):
+        """Take back a checked-out connection, dropping it if it is no longer usable"""
+        try:
+            if not connection.is_connected():
+                self._discard(connection)
+                return
+            if connection.in_transaction:
+                connection.rollback()
+        except Error:
+            self._discard(connection)
+            return
+        self._idle.put(connection)
+
+    def stats(self):
+        caches = list(self._statements.values())
+        statements = {key: sum(cache.stats()[key] for cache in caches)
+                      for key in ('statements', 'hits', 'misses', 'evictions', 'reprepares')}
+        return {'size': self.size, 'opened': self._opened, 'idle': self._idle.qsize(),
+                'prepared': statements}
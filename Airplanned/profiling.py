@@ -0,0 +1,164 @@
+# profiling.py - Opt-in sampling profiler producing one flame graph file per request
+#
+# Profiling is off unless asked for:
+#   - an admin sends the header "X-Profile: 1" (or adds ?_profile=1), or
+#   - the endpoint is listed in PROFILE_ENDPOINTS (comma separated, "*" for all).
+#
+# While a profiled request runs, a background thread samples the request
+# thread's Python stack every PROFILE_INTERVAL_MS. Samples are written in
+# collapsed-stack format (one "frame;frame;frame count" line per unique
+# stack) to PROFILE_DIR/<time>-<endpoint>-<pid>-<thread>.folded (PROFILE_DIR
+# defaults to profiles/ in the app's instance folder), ready for
+# flamegraph.pl or speedscope, next to a .json summary with wall time, DB
+# time and template render time. DB wait shows up in the graph under the
+# cursor's _timed frame, rendering under jinja2 frames.
+#
+# The sampler follows the thread serving the request, which only describes
+# that request under WSGI. asgi.py marks the views it runs on the event
+# loop with EVENT_LOOP_KEY and they are never profiled: the loop thread
+# interleaves every in-flight request, and its stack mostly shows the loop
+# waiting. Requests asgi.py hands to its WSGI threads are profiled normally.
+
+import json
+import os
+import sys
+import threading
+import time
+
+from flask import before_render_template, g, request, session, template_rendered
+
+from config import setting
+
+PROFILE_DIR = setting('PROFILE_DIR', '')
+PROFILE_INTERVAL_MS = setting('PROFILE_INTERVAL_MS', 1.0)
+PROFILE_ENDPOINTS = {e.strip() for e in setting('PROFILE_ENDPOINTS', '').split(',') if e.strip()}
+
+# WSGI environ key set on requests served on the ASGI event loop
+EVENT_LOOP_KEY = 'airplanned.event_loop'
+
+# Set by init_profiling once the app's instance folder is known
+_profile_dir = PROFILE_DIR or 'profiles'
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's stack at a fixed interval until stopped"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name=f"profiler-{thread_id}", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            key = tuple(reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def should_profile():
+    if request.environ.get(EVENT_LOOP_KEY):
+        return False
+    if '*' in PROFILE_ENDPOINTS or request.endpoint in PROFILE_ENDPOINTS:
+        return True
+    if not session.get('admin_logged_in'):
+        return False
+    return request.headers.get('X-Profile') == '1' or request.args.get('_profile') == '1'
+
+
+def write_profile(profile, sampler, status):
+    """Write the collapsed stacks and the summary; returns the .folded path"""
+    os.makedirs(_profile_dir, exist_ok=True)
+    endpoint = request.endpoint or 'unmatched'
+    base = os.path.join(_profile_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{os.getpid()}-{threading.get_ident()}")
+    root = f"{request.method} {endpoint}"
+
+    with open(base + '.folded', 'w') as f:
+        for stack, count in sorted(sampler.stacks.items(), key=lambda item: item[1], reverse=True):
+            f.write(f"{root};{';'.join(stack)} {count}\n")
+
+    stats = g.get('query_stats')
+    summary = {
+        'endpoint': endpoint,
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'status': status,
+        'wall_ms': round(profile['wall_ms'], 3),
+        'samples': sampler.samples,
+        'interval_ms': PROFILE_INTERVAL_MS,
+        'db_ms': round(stats.duration_ms, 3) if stats else 0.0,
+        'db_queries': stats.count if stats else 0,
+        'render_ms': round(profile['render_ms'], 3),
+        'templates': profile['templates'],
+    }
+    with open(base + '.json', 'w') as f:
+        json.dump(summary, f, indent=2)
+    return base + '.folded'
+
+
+def init_profiling(app):
+    """Register the hooks that start and stop the sampler around profiled requests"""
+    global _profile_dir
+    _profile_dir = PROFILE_DIR or os.path.join(app.instance_path, 'profiles')
+
+    @app.before_request
+    def start_profiler():
+        if not should_profile():
+            return
+        sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+        g.profile = {'sampler': sampler, 'started': time.perf_counter(),
+                     'render_ms': 0.0, 'render_started': None, 'templates': []}
+        sampler.start()
+
+    @app.after_request
+    def stop_profiler(response):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+        sampler = profile['sampler']
+        sampler.stop()
+        profile['wall_ms'] = (time.perf_counter() - profile['started']) * 1000
+        path = write_profile(profile, sampler, response.status_code)
+        response.headers['X-Profile-File'] = os.path.basename(path)
+        return response
+
+    @app.teardown_request
+    def discard_profiler(exc):
+        # Requests that failed before after_request ran still stop their sampler
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profile['sampler'].stop()
+
+    def render_started(sender, template, context, **extra):
+        profile = g.get('profile')
+        if profile is not None:
+            profile['render_started'] = time.perf_counter()
+
+    def render_finished(sender, template, context, **extra):
+        profile = g.get('profile')
+        if profile is not None and profile['render_started'] is not None:
+            elapsed = (time.perf_counter() - profile['render_started']) * 1000
+            profile['render_ms'] += elapsed
+            profile['templates'].append({'name': template.name, 'ms': round(elapsed, 3)})
+            profile['render_started'] = None
+
+    before_render_template.connect(render_started, app, weak=False)
+    template_rendered.connect(render_finished, app, weak=False)
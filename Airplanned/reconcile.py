@@ -0,0 +1,207 @@
+# reconcile.py - Recompute inventory counters from the booking tables and repair drift
+#
+# The counters are maintained by separate UPDATEs in the booking, cancel and
+# hold-expiry paths, so they can drift from what the booking tables say:
+#
+#   flights.available_seats  = total_seats - 'Confirmed' flight_bookings
+#   hotels.availability      = total_rooms - 'Confirmed'/'Checked-In' hotel_bookings
+#   car_rentals.availability = total_cars  - 'Confirmed'/'Picked-Up' car_bookings
+#
+# total_rooms/total_cars are NULL for new rows and rows an admin has just
+# edited; the reconciler adopts them from the current availability plus
+# what is held instead of reporting drift.
+#
+# Work is done in chunks of RECONCILE_CHUNK inventory rows, each in its own
+# explicit transaction (connections otherwise autocommit): lock just those
+# inventory rows with FOR UPDATE, count their active bookings with a GROUP BY
+# on the (item, booking_status) index, and rewrite only the counters that
+# drifted, all before the commit releases the locks. The count is the
+# transaction's first plain read, so its snapshot is taken once the locks are
+# held. The booking paths commit a booking and then update its counter in a
+# separate statement; a booking counted between the two has its counter
+# update wait for the chunk's lock and then apply on top of the repaired
+# value. That update also moves the inventory row's updated_at, so the next
+# incremental run finds the item again and corrects it.
+#
+# Incremental runs (the default) only visit items whose bookings or
+# inventory rows changed since the previous run's watermark, less
+# RECONCILE_OVERLAP seconds for transactions that committed late. The first
+# run, and any run with --full, walks every row in primary key order.
+#
+#   flask --app app reconcile-inventory [--full] [--dry-run] [--chunk 500]
+
+from collections import namedtuple
+
+import click
+from mysql.connector import Error
+
+from config import setting
+from metrics import INVENTORY_DRIFT
+
+RECONCILE_CHUNK = setting('RECONCILE_CHUNK', 500)
+RECONCILE_OVERLAP = setting('RECONCILE_OVERLAP', 300)
+WATERMARK_JOB = 'reconcile_inventory'
+
+Inventory = namedtuple('Inventory', 'table key capacity counter bookings active cache')
+Drift = namedtuple('Drift', 'kind item_id capacity booked recorded expected adopted')
+
+INVENTORY = {
+    'flight': Inventory('flights', 'flight_id', 'total_seats', 'available_seats',
+                        'flight_bookings', ('Confirmed',), 'flights'),
+    'hotel': Inventory('hotels', 'hotel_id', 'total_rooms', 'availability',
+                       'hotel_bookings', ('Confirmed', 'Checked-In'), 'hotels'),
+    'car': Inventory('car_rentals', 'rental_id', 'total_cars', 'availability',
+                     'car_bookings', ('Confirmed', 'Picked-Up'), 'cars'),
+}
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def all_item_chunks(cursor, inv, chunk):
+    """Every inventory id, chunk by chunk in primary key order"""
+    last = 0
+    while True:
+        cursor.execute(f"SELECT {inv.key} FROM {inv.table} WHERE {inv.key} > %s ORDER BY {inv.key} LIMIT %s",
+                       (last, chunk))
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+
+def changed_items(cursor, inv, since):
+    """Inventory ids whose bookings or own row changed since the watermark (less the overlap)"""
+    cursor.execute(f"""
+        SELECT {inv.key} FROM {inv.bookings} WHERE updated_at >= %s - INTERVAL %s SECOND
+        UNION
+        SELECT {inv.key} FROM {inv.table} WHERE updated_at >= %s - INTERVAL %s SECOND
+    """, (since, RECONCILE_OVERLAP, since, RECONCILE_OVERLAP))
+    return sorted(row[0] for row in cursor.fetchall())
+
+
+def check_chunk(cursor, kind, ids, repair):
+    """Compare one chunk's counters with its bookings and, when repairing, rewrite the drifted rows
+
+    Must run in a transaction the caller started, so the repair's row locks
+    last until its commit.
+    """
+    inv = INVENTORY[kind]
+    cursor.execute(f"""
+        SELECT {inv.key}, {inv.capacity}, {inv.counter} FROM {inv.table}
+        WHERE {inv.key} IN ({_placeholders(ids)})
+        {'FOR UPDATE' if repair else ''}
+    """, ids)
+    items = cursor.fetchall()
+    cursor.execute(f"""
+        SELECT {inv.key}, COUNT(*) FROM {inv.bookings}
+        WHERE {inv.key} IN ({_placeholders(ids)}) AND booking_status IN ({_placeholders(inv.active)})
+        GROUP BY {inv.key}
+    """, (*ids, *inv.active))
+    held = dict(cursor.fetchall())
+
+    drift = []
+    for item_id, capacity, recorded in items:
+        booked = held.get(item_id, 0)
+        if capacity is None:
+            drift.append(Drift(kind, item_id, recorded + booked, booked, recorded, recorded, True))
+        elif recorded != max(capacity - booked, 0):
+            drift.append(Drift(kind, item_id, capacity, booked, recorded, max(capacity - booked, 0), False))
+
+    if repair and drift:
+        capacity_cases = ' '.join(['WHEN %s THEN %s'] * len(drift))
+        counter_cases = ' '.join(['WHEN %s THEN %s'] * len(drift))
+        cursor.execute(f"""
+            UPDATE {inv.table}
+            SET {inv.capacity} = CASE {inv.key} {capacity_cases} ELSE {inv.capacity} END,
+                {inv.counter} = CASE {inv.key} {counter_cases} ELSE {inv.counter} END
+            WHERE {inv.key} IN ({_placeholders(drift)})
+        """, (*[v for d in drift for v in (d.item_id, d.capacity)],
+              *[v for d in drift for v in (d.item_id, d.expected)],
+              *[d.item_id for d in drift]))
+    return drift
+
+
+def load_watermark(cursor):
+    cursor.execute("SELECT watermark FROM job_watermarks WHERE job_name = %s", (WATERMARK_JOB,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def reconcile(connection, full=False, repair=True, chunk=RECONCILE_CHUNK, cache=None):
+    """Check (and optionally repair) every counter that may have drifted
+
+    Returns (checked per kind, list of Drift). The watermark only advances
+    on repairing runs.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT NOW()")
+        started = cursor.fetchone()[0]
+        since = None if full else load_watermark(cursor)
+
+        checked, found = {}, []
+        for kind, inv in INVENTORY.items():
+            if since is None:
+                chunks = all_item_chunks(cursor, inv, chunk)
+            else:
+                ids = changed_items(cursor, inv, since)
+                chunks = (ids[i:i + chunk] for i in range(0, len(ids), chunk))
+            checked[kind] = 0
+            kind_drift = []
+            for ids in chunks:
+                connection.start_transaction()
+                kind_drift.extend(check_chunk(cursor, kind, ids, repair))
+                connection.commit()
+                checked[kind] += len(ids)
+            repaired = [d for d in kind_drift if not d.adopted]
+            if repair and repaired:
+                INVENTORY_DRIFT.inc(len(repaired), kind=kind)
+            if repair and kind_drift and cache is not None:
+                cache.bump(inv.cache)
+            found.extend(kind_drift)
+
+        if repair:
+            cursor.execute("""
+                INSERT INTO job_watermarks (job_name, watermark) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE watermark = VALUES(watermark)
+            """, (WATERMARK_JOB, started))
+            connection.commit()
+        return checked, found
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def init_reconcile(app, connect, cache=None):
+    """Register the reconcile-inventory command"""
+
+    @app.cli.command('reconcile-inventory')
+    @click.option('--full', is_flag=True, help='Check every row instead of only rows changed since the last run')
+    @click.option('--dry-run', is_flag=True, help='Report drift without repairing it')
+    @click.option('--chunk', default=RECONCILE_CHUNK, show_default=True, help='Inventory rows per transaction')
+    def reconcile_inventory_command(full, dry_run, chunk):
+        """Recompute seat, room and car counters from the booking tables."""
+        connection = connect()
+        if not connection:
+            raise click.ClickException('Database connection error')
+        try:
+            checked, drift = reconcile(connection, full, not dry_run, chunk, cache)
+        finally:
+            connection.close()
+        for d in drift:
+            inv = INVENTORY[d.kind]
+            if d.adopted:
+                click.echo(f"{d.kind} {d.item_id}: {inv.capacity} set to {d.capacity} "
+                           f"({d.recorded} available + {d.booked} held)")
+            else:
+                click.echo(f"{d.kind} {d.item_id}: {inv.counter} {d.recorded} -> {d.expected} "
+                           f"({d.booked} held of {d.capacity})")
+        for kind, count in checked.items():
+            drifted = sum(1 for d in drift if d.kind == kind and not d.adopted)
+            click.echo(f"{kind}: {count} checked, {drifted} drifted"
+                       f"{'' if dry_run else ', repaired'}")
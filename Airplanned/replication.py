@@ -0,0 +1,155 @@
+# replication.py - Send read-only routes to MySQL replicas and everything else to the primary
+#
+# Listing and search pages (READ_ONLY_ENDPOINTS) open their connection on
+# one of the DB_REPLICAS, picked round-robin; every other endpoint, the
+# payment workers, the hold sweeper and CLI commands use the primary.
+#
+# Replicas lag the primary, so a user who has just written must not be sent
+# to one: any request that ran an INSERT/UPDATE/DELETE pins the user's
+# session to the primary for REPLICA_STICKY_SECONDS, and routes that observe
+# a write made elsewhere (an asynchronously settled payment) can pin it
+# explicitly with pin_to_primary(). Other users may see a change up to the
+# replication lag later, except in the shared fragment cache: a read-only
+# route that is about to fill it switches the request to the primary with
+# use_primary(), so a listing read before a write reached the replica is not
+# cached after that write bumped the cache.
+#
+# A replica that refuses connections is skipped for REPLICA_RETRY_SECONDS;
+# with none reachable, reads fall back to the primary. Each endpoint has its
+# own ConnectionPool unless DB_POOL_SIZE is 0.
+#
+#   DB_REPLICAS=replica1:3307,replica2:3307
+
+import itertools
+import threading
+import time
+
+import mysql.connector
+from flask import g, has_request_context, request, session
+from mysql.connector import Error, PoolError
+
+from config import setting
+from metrics import DB_CONNECTIONS, statement_type
+from pool import DB_POOL_SIZE, ConnectionPool
+from tracing import app_logger
+
+DB_REPLICAS = setting('DB_REPLICAS', '')
+REPLICA_STICKY_SECONDS = setting('REPLICA_STICKY_SECONDS', 30)
+REPLICA_RETRY_SECONDS = setting('REPLICA_RETRY_SECONDS', 30)
+
+READ_ONLY_ENDPOINTS = {
+    'index', 'search_flights', 'hotels', 'cars', 'dashboard',
+    'admin_dashboard', 'admin_flights', 'admin_hotels', 'admin_cars', 'admin_global_search',
+}
+
+WRITE_STATEMENTS = ('insert', 'update', 'delete')
+STICKY_SESSION_KEY = 'db_primary_until'
+
+
+def parse_endpoints(value, default_port):
+    """[(host, port)] from a comma-separated host[:port] list"""
+    endpoints = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.rpartition(':') if ':' in item else (item, '', '')
+        endpoints.append((host, int(port) if port else default_port))
+    return endpoints
+
+
+class ConnectionRouter:
+    """Opens connections on the primary or on the next healthy replica"""
+
+    def __init__(self, primary, replicas=(), connect=None, pool_size=DB_POOL_SIZE):
+        self.primary = dict(primary)
+        self.replicas = [dict(primary, host=host, port=port) for host, port in replicas]
+        self.pool_size = pool_size
+        self._connect = connect or mysql.connector.connect
+        self._turn = itertools.count()
+        self._down_until = {}
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _open(self, config):
+        if self.pool_size <= 0:
+            return self._connect(**config)
+        endpoint = (config['host'], config['port'])
+        with self._lock:
+            pool = self._pools.get(endpoint)
+            if pool is None:
+                pool = self._pools[endpoint] = ConnectionPool(self._connect, config, self.pool_size)
+        return pool.get()
+
+    def pool_stats(self):
+        """{'host:port': pool stats} for every endpoint opened so far"""
+        with self._lock:
+            return {f"{host}:{port}": pool.stats() for (host, port), pool in self._pools.items()}
+
+    def _replica_order(self):
+        """Replicas to try, starting with the next in round-robin order and skipping any marked down"""
+        if not self.replicas:
+            return []
+        start = next(self._turn)
+        now = time.monotonic()
+        with self._lock:
+            return [index for index in ((start + i) % len(self.replicas) for i in range(len(self.replicas)))
+                    if self._down_until.get(index, 0) <= now]
+
+    def connect(self, role='primary'):
+        """A raw connection for role ('primary' or 'replica'); replica errors fall back to the primary"""
+        if role == 'replica':
+            for index in self._replica_order():
+                config = self.replicas[index]
+                try:
+                    connection = self._open(config)
+                    DB_CONNECTIONS.inc(role='replica')
+                    return connection
+                except PoolError:
+                    continue
+                except Error as e:
+                    with self._lock:
+                        self._down_until[index] = time.monotonic() + REPLICA_RETRY_SECONDS
+                    app_logger.warning(f"Replica {config['host']}:{config['port']} unavailable, "
+                          f"skipping for {REPLICA_RETRY_SECONDS}s: {e}")
+        connection = self._open(self.primary)
+        DB_CONNECTIONS.inc(role='primary')
+        return connection
+
+
+def pin_to_primary(seconds=REPLICA_STICKY_SECONDS):
+    """Read this user's requests from the primary for the next seconds"""
+    session[STICKY_SESSION_KEY] = max(session.get(STICKY_SESSION_KEY, 0), time.time() + seconds)
+
+
+def use_primary():
+    """Open this request's remaining connections on the primary"""
+    if has_request_context():
+        g.db_role = 'primary'
+
+
+def current_db_role():
+    """'replica' inside a read-only route of an unpinned session, otherwise 'primary'"""
+    if not has_request_context():
+        return 'primary'
+    return g.get('db_role', 'primary')
+
+
+def init_replication(app, router):
+    """Choose each request's database role and pin sessions that wrote"""
+
+    @app.before_request
+    def choose_db_role():
+        if (router.replicas and request.endpoint in READ_ONLY_ENDPOINTS
+                and session.get(STICKY_SESSION_KEY, 0) <= time.time()):
+            g.db_role = 'replica'
+        else:
+            g.db_role = 'primary'
+
+    @app.after_request
+    def pin_after_write(response):
+        stats = g.get('query_stats')
+        if router.replicas and stats is not None and any(
+                statement_type(query['sql']) in WRITE_STATEMENTS for query in stats.queries):
+            pin_to_primary()
+        return response
@@ -0,0 +1,161 @@
+# statements.py - Server-side prepared statements cached per pooled connection
+#
+# A cursor opened with connection.cursor(prepared=True) on a pooled
+# connection runs every statement through a prepared cursor taken from that
+# connection's StatementCache, so MySQL parses and plans each SQL text once
+# per connection instead of on every call. The cache keeps the
+# DB_STATEMENT_CACHE_SIZE most recently used statements and deallocates the
+# least recently used one beyond that (the server caps prepared statements
+# at max_prepared_stmt_count across all sessions).
+#
+# Prepared statements belong to a server session: when the connection
+# reconnects (its connection_id changes) or the server reports an unknown
+# statement handler, the cached statements are dropped and prepared again.
+#
+# DB_STATEMENT_CACHE_SIZE=0 turns prepared=True cursors back into plain
+# text-protocol cursors.
+#
+#   python benchmarks/prepared_benchmark.py --iterations 2000
+
+from collections import OrderedDict
+
+from mysql.connector import Error
+
+from config import setting
+
+DB_STATEMENT_CACHE_SIZE = setting('DB_STATEMENT_CACHE_SIZE', 64)
+
+ER_UNKNOWN_STMT_HANDLER = 1243
+
+
+class StatementCache:
+    """LRU of prepared cursors on one connection, keyed by SQL text"""
+
+    def __init__(self, connection, size=DB_STATEMENT_CACHE_SIZE):
+        self._connection = connection
+        self.size = size
+        self._cursors = OrderedDict()
+        self._connection_id = connection.connection_id
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.reprepares = 0
+
+    def __len__(self):
+        return len(self._cursors)
+
+    def _check_session(self):
+        """Forget every statement if the connection has been re-established since they were prepared"""
+        if self._connection.connection_id != self._connection_id:
+            # The statements died with the old session; there is nothing to deallocate
+            self._cursors.clear()
+            self._connection_id = self._connection.connection_id
+            self.reprepares += 1
+
+    def get(self, sql):
+        """(prepared cursor, cached SQL string) for sql
+
+        The cursor only skips re-preparing when it is given the very string
+        object it was prepared with, so callers must execute the returned
+        string rather than their own copy.
+        """
+        self._check_session()
+        entry = self._cursors.get(sql)
+        if entry is not None:
+            self._cursors.move_to_end(sql)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        entry = self._cursors[sql] = (self._connection.cursor(prepared=True), sql)
+        while len(self._cursors) > self.size:
+            _, (cursor, _) = self._cursors.popitem(last=False)
+            self.evictions += 1
+            try:
+                cursor.close()
+            except Error:
+                pass
+        return entry
+
+    def discard(self, sql):
+        """Drop one statement so the next get() prepares it again"""
+        self._cursors.pop(sql, None)
+        self.reprepares += 1
+
+    def close(self):
+        for cursor, _ in self._cursors.values():
+            try:
+                cursor.close()
+            except Error:
+                pass
+        self._cursors.clear()
+
+    def stats(self):
+        return {'statements': len(self._cursors), 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'reprepares': self.reprepares}
+
+
+class CachedPreparedCursor:
+    """DB-API cursor that executes each statement on the cache's prepared cursor for it
+
+    close() leaves the prepared statements allocated for the next checkout
+    of the connection; it only drains any rows left unread.
+    """
+
+    def __init__(self, cache, connection):
+        self._cache = cache
+        self._connection = connection
+        self._current = None
+
+    def __getattr__(self, name):
+        if self._current is None:
+            raise AttributeError(name)
+        return getattr(self._current, name)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    @property
+    def rowcount(self):
+        return self._current.rowcount if self._current is not None else -1
+
+    @property
+    def lastrowid(self):
+        return self._current.lastrowid if self._current is not None else None
+
+    @property
+    def description(self):
+        return self._current.description if self._current is not None else None
+
+    def _drain(self):
+        if self._current is not None and self._connection.unread_result:
+            self._current.fetchall()
+
+    def execute(self, operation, params=None):
+        self._drain()
+        self._current, sql = self._cache.get(operation)
+        try:
+            self._current.execute(sql, params)
+        except Error as e:
+            if e.errno != ER_UNKNOWN_STMT_HANDLER:
+                raise
+            self._cache.discard(operation)
+            self._current, sql = self._cache.get(operation)
+            self._current.execute(sql, params)
+
+    def executemany(self, operation, seq_params):
+        self._drain()
+        self._current, sql = self._cache.get(operation)
+        self._current.executemany(sql, seq_params)
+
+    def fetchone(self):
+        return self._current.fetchone()
+
+    def fetchmany(self, size=1):
+        return self._current.fetchmany(size)
+
+    def fetchall(self):
+        return self._current.fetchall()
+
+    def close(self):
+        self._drain()
+        self._current = None
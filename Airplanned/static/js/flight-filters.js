@@ -0,0 +1,91 @@
+/* ========== static/js/flight-filters.js ========== */
+/* AirPlanned - Client-side filtering of flight cards */
+
+document.addEventListener('DOMContentLoaded', function() {
+    initializeSearchFilters();
+});
+
+/**
+ * Initialize search filters
+ */
+function initializeSearchFilters() {
+    // Real-time flight filtering
+    const filterInputs = document.querySelectorAll('#min_price, #max_price, select[name="airline"]');
+    filterInputs.forEach(input => {
+        input.addEventListener('change', filterFlights);
+    });
+    
+    // Airline filter
+    populateAirlineFilter();
+}
+
+/**
+ * Filter flights based on current filter values
+ */
+function filterFlights() {
+    const minPrice = parseFloat(document.getElementById('min_price')?.value) || 0;
+    const maxPrice = parseFloat(document.getElementById('max_price')?.value) || Infinity;
+    const selectedAirline = document.querySelector('select[name="airline"]')?.value || '';
+    
+    const flightCards = document.querySelectorAll('.flight-card');
+    
+    flightCards.forEach(card => {
+        const priceElement = card.querySelector('.price');
+        const airlineElement = card.querySelector('.airline');
+        
+        if (!priceElement || !airlineElement) return;
+        
+        const price = parseFloat(priceElement.textContent.replace(/[$,]/g, ''));
+        const airline = airlineElement.textContent.trim();
+        
+        const priceMatch = price >= minPrice && price <= maxPrice;
+        const airlineMatch = !selectedAirline || airline.includes(selectedAirline);
+        
+        if (priceMatch && airlineMatch) {
+            card.style.display = 'block';
+            card.style.animation = 'fadeIn 0.3s ease';
+        } else {
+            card.style.display = 'none';
+        }
+    });
+    
+    updateFlightCount();
+}
+
+/**
+ * Populate airline filter dropdown
+ */
+function populateAirlineFilter() {
+    const airlineSelect = document.querySelector('select[name="airline"]');
+    if (!airlineSelect) return;
+    
+    const airlines = new Set();
+    document.querySelectorAll('.airline').forEach(element => {
+        airlines.add(element.textContent.trim());
+    });
+    
+    airlines.forEach(airline => {
+        if (airline) {
+            const option = document.createElement('option');
+            option.value = airline;
+            option.textContent = airline;
+            airlineSelect.appendChild(option);
+        }
+    });
+}
+
+/**
+ * Update flight count display
+ */
+function updateFlightCount() {
+    const visibleFlights = document.querySelectorAll('.flight-card[style*="display: block"], .flight-card:not([style*="display: none"])').length;
+    const countElement = document.querySelector('.flights-count');
+    
+    if (countElement) {
+        countElement.textContent = `${visibleFlights} flights found`;
+    }
+}
+
+// Keep filterFlights reachable through the shared namespace
+window.AirPlanned = window.AirPlanned || {};
+window.AirPlanned.filterFlights = filterFlights;
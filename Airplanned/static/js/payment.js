@@ -0,0 +1,65 @@
+/* ========== static/js/payment.js ========== */
+/* AirPlanned - Card field formatting for the payment pages */
+
+document.addEventListener('DOMContentLoaded', function() {
+    initializePaymentFormatting();
+});
+
+/**
+ * Initialize payment form formatting
+ */
+function initializePaymentFormatting() {
+    // Card number formatting
+    const cardNumberInput = document.getElementById('card_number');
+    if (cardNumberInput) {
+        cardNumberInput.addEventListener('input', function(e) {
+            let value = e.target.value.replace(/\s/g, '');
+            let formattedValue = value.replace(/(.{4})/g, '$1 ').trim();
+            if (formattedValue.length > 19) {
+                formattedValue = formattedValue.substring(0, 19);
+            }
+            e.target.value = formattedValue;
+        });
+        
+        cardNumberInput.addEventListener('keypress', function(e) {
+            // Allow only numbers and backspace
+            if (!/[\d\s]/.test(e.key) && e.key !== 'Backspace') {
+                e.preventDefault();
+            }
+        });
+    }
+    
+    // Expiry date formatting
+    const expiryDateInput = document.getElementById('expiry_date');
+    if (expiryDateInput) {
+        expiryDateInput.addEventListener('input', function(e) {
+            let value = e.target.value.replace(/\D/g, '');
+            if (value.length >= 2) {
+                value = value.substring(0, 2) + '/' + value.substring(2, 4);
+            }
+            e.target.value = value;
+        });
+        
+        expiryDateInput.addEventListener('keypress', function(e) {
+            // Allow only numbers and backspace
+            if (!/\d/.test(e.key) && e.key !== 'Backspace') {
+                e.preventDefault();
+            }
+        });
+    }
+    
+    // CVV formatting
+    const cvvInput = document.getElementById('cvv');
+    if (cvvInput) {
+        cvvInput.addEventListener('input', function(e) {
+            e.target.value = e.target.value.replace(/\D/g, '');
+        });
+        
+        cvvInput.addEventListener('keypress', function(e) {
+            // Allow only numbers and backspace
+            if (!/\d/.test(e.key) && e.key !== 'Backspace') {
+                e.preventDefault();
+            }
+        });
+    }
+}
@@ -10,7 +10,6 @@ document.addEventListener('DOMContentLoaded', function() {
     initializeFormValidations();
     initializeInteractiveElements();
     autoHideFlashMessages();
-    initializeSearchFilters();
     initializeAnimations();
 });
 
@@ -209,11 +208,9 @@ function isValidPhone(phone) {
  * Initialize interactive elements
  */
 function initializeInteractiveElements() {
-    // Seat selection functionality
-    initializeSeatSelection();
-    
-    // Payment form formatting
-    initializePaymentFormatting();
+    // Seat selection, payment formatting and flight filters live in
+    // seat-selection.js, payment.js and flight-filters.js and are only
+    // loaded by the pages that use them
     
     // Search form enhancements
     initializeSearchEnhancements();
@@ -228,146 +225,6 @@ function initializeInteractiveElements() {
     initializeCardHoverEffects();
 }
 
-/**
- * Initialize seat selection functionality
- */
-function initializeSeatSelection() {
-    const seatMap = document.getElementById('seatMap');
-    if (!seatMap) return;
-    
-    // Get seat selection elements
-    const selectedSeatInput = document.getElementById('selectedSeat');
-    const confirmButton = document.getElementById('confirmBooking');
-    
-    // Handle seat selection
-    seatMap.addEventListener('click', function(e) {
-        if (e.target.classList.contains('seat') && e.target.classList.contains('available')) {
-            // Remove previous selection
-            const previouslySelected = seatMap.querySelector('.seat.selected');
-            if (previouslySelected) {
-                previouslySelected.classList.remove('selected');
-            }
-            
-            // Select new seat
-            e.target.classList.add('selected');
-            
-            // Update form
-            if (selectedSeatInput) {
-                selectedSeatInput.value = e.target.dataset.seatNumber;
-            }
-            
-            if (confirmButton) {
-                confirmButton.disabled = false;
-                const price = confirmButton.dataset.price || '0';
-                confirmButton.textContent = `Confirm Booking - Seat ${e.target.dataset.seatNumber} - $${price}`;
-            }
-            
-            // Visual feedback
-            showSeatSelectionFeedback(e.target.dataset.seatNumber);
-        }
-    });
-}
-
-/**
- * Show seat selection feedback
- */
-function showSeatSelectionFeedback(seatNumber) {
-    // Create or update feedback message
-    let feedback = document.getElementById('seat-feedback');
-    if (!feedback) {
-        feedback = document.createElement('div');
-        feedback.id = 'seat-feedback';
-        feedback.className = 'seat-feedback';
-        feedback.style.cssText = `
-            position: fixed;
-            top: 20px;
-            right: 20px;
-            background: #10b981;
-            color: white;
-            padding: 1rem;
-            border-radius: 8px;
-            z-index: 1000;
-            animation: slideIn 0.3s ease;
-            box-shadow: 0 4px 12px rgba(0, 0, 0, 0.15);
-        `;
-        document.body.appendChild(feedback);
-    }
-    
-    feedback.textContent = `✓ Seat ${seatNumber} selected!`;
-    feedback.style.display = 'block';
-    
-    // Auto-hide after 3 seconds
-    setTimeout(() => {
-        if (feedback) {
-            feedback.style.animation = 'slideOut 0.3s ease';
-            setTimeout(() => {
-                if (feedback.parentNode) {
-                    feedback.parentNode.removeChild(feedback);
-                }
-            }, 300);
-        }
-    }, 3000);
-}
-
-/**
- * Initialize payment form formatting
- */
-function initializePaymentFormatting() {
-    // Card number formatting
-    const cardNumberInput = document.getElementById('card_number');
-    if (cardNumberInput) {
-        cardNumberInput.addEventListener('input', function(e) {
-            let value = e.target.value.replace(/\s/g, '');
-            let formattedValue = value.replace(/(.{4})/g, '$1 ').trim();
-            if (formattedValue.length > 19) {
-                formattedValue = formattedValue.substring(0, 19);
-            }
-            e.target.value = formattedValue;
-        });
-        
-        cardNumberInput.addEventListener('keypress', function(e) {
-            // Allow only numbers and backspace
-            if (!/[\d\s]/.test(e.key) && e.key !== 'Backspace') {
-                e.preventDefault();
-            }
-        });
-    }
-    
-    // Expiry date formatting
-    const expiryDateInput = document.getElementById('expiry_date');
-    if (expiryDateInput) {
-        expiryDateInput.addEventListener('input', function(e) {
-            let value = e.target.value.replace(/\D/g, '');
-            if (value.length >= 2) {
-                value = value.substring(0, 2) + '/' + value.substring(2, 4);
-            }
-            e.target.value = value;
-        });
-        
-        expiryDateInput.addEventListener('keypress', function(e) {
-            // Allow only numbers and backspace
-            if (!/\d/.test(e.key) && e.key !== 'Backspace') {
-                e.preventDefault();
-            }
-        });
-    }
-    
-    // CVV formatting
-    const cvvInput = document.getElementById('cvv');
-    if (cvvInput) {
-        cvvInput.addEventListener('input', function(e) {
-            e.target.value = e.target.value.replace(/\D/g, '');
-        });
-        
-        cvvInput.addEventListener('keypress', function(e) {
-            // Allow only numbers and backspace
-            if (!/\d/.test(e.key) && e.key !== 'Backspace') {
-                e.preventDefault();
-            }
-        });
-    }
-}
-
 /**
  * Initialize search form enhancements
  */
@@ -517,87 +374,6 @@ function autoHideFlashMessages() {
     });
 }
 
-/**
- * Initialize search filters
- */
-function initializeSearchFilters() {
-    // Real-time flight filtering
-    const filterInputs = document.querySelectorAll('#min_price, #max_price, select[name="airline"]');
-    filterInputs.forEach(input => {
-        input.addEventListener('change', filterFlights);
-    });
-    
-    // Airline filter
-    populateAirlineFilter();
-}
-
-/**
- * Filter flights based on current filter values
- */
-function filterFlights() {
-    const minPrice = parseFloat(document.getElementById('min_price')?.value) || 0;
-    const maxPrice = parseFloat(document.getElementById('max_price')?.value) || Infinity;
-    const selectedAirline = document.querySelector('select[name="airline"]')?.value || '';
-    
-    const flightCards = document.querySelectorAll('.flight-card');
-    
-    flightCards.forEach(card => {
-        const priceElement = card.querySelector('.price');
-        const airlineElement = card.querySelector('.airline');
-        
-        if (!priceElement || !airlineElement) return;
-        
-        const price = parseFloat(priceElement.textContent.replace(/[$,]/g, ''));
-        const airline = airlineElement.textContent.trim();
-        
-        const priceMatch = price >= minPrice && price <= maxPrice;
-        const airlineMatch = !selectedAirline || airline.includes(selectedAirline);
-        
-        if (priceMatch && airlineMatch) {
-            card.style.display = 'block';
-            card.style.animation = 'fadeIn 0.3s ease';
-        } else {
-            card.style.display = 'none';
-        }
-    });
-    
-    updateFlightCount();
-}
-
-/**
- * Populate airline filter dropdown
- */
-function populateAirlineFilter() {
-    const airlineSelect = document.querySelector('select[name="airline"]');
-    if (!airlineSelect) return;
-    
-    const airlines = new Set();
-    document.querySelectorAll('.airline').forEach(element => {
-        airlines.add(element.textContent.trim());
-    });
-    
-    airlines.forEach(airline => {
-        if (airline) {
-            const option = document.createElement('option');
-            option.value = airline;
-            option.textContent = airline;
-            airlineSelect.appendChild(option);
-        }
-    });
-}
-
-/**
- * Update flight count display
- */
-function updateFlightCount() {
-    const visibleFlights = document.querySelectorAll('.flight-card[style*="display: block"], .flight-card:not([style*="display: none"])').length;
-    const countElement = document.querySelector('.flights-count');
-    
-    if (countElement) {
-        countElement.textContent = `${visibleFlights} flights found`;
-    }
-}
-
 /**
  * Initialize animations
  */
@@ -981,6 +757,5 @@ window.AirPlanned = {
     showLoading,
     hideLoading,
     showToast,
-    validateForm,
-    filterFlights
+    validateForm
 };
\ No newline at end of file
@@ -0,0 +1,87 @@
+/* ========== static/js/seat-selection.js ========== */
+/* AirPlanned - Seat map selection for the booking page */
+
+document.addEventListener('DOMContentLoaded', function() {
+    initializeSeatSelection();
+});
+
+/**
+ * Initialize seat selection functionality
+ */
+function initializeSeatSelection() {
+    const seatMap = document.getElementById('seatMap');
+    if (!seatMap) return;
+    
+    // Get seat selection elements
+    const selectedSeatInput = document.getElementById('selectedSeat');
+    const confirmButton = document.getElementById('confirmBooking');
+    
+    // Handle seat selection
+    seatMap.addEventListener('click', function(e) {
+        if (e.target.classList.contains('seat') && e.target.classList.contains('available')) {
+            // Remove previous selection
+            const previouslySelected = seatMap.querySelector('.seat.selected');
+            if (previouslySelected) {
+                previouslySelected.classList.remove('selected');
+            }
+            
+            // Select new seat
+            e.target.classList.add('selected');
+            
+            // Update form
+            if (selectedSeatInput) {
+                selectedSeatInput.value = e.target.dataset.seatNumber;
+            }
+            
+            if (confirmButton) {
+                confirmButton.disabled = false;
+                const price = confirmButton.dataset.price || '0';
+                confirmButton.textContent = `Confirm Booking - Seat ${e.target.dataset.seatNumber} - $${price}`;
+            }
+            
+            // Visual feedback
+            showSeatSelectionFeedback(e.target.dataset.seatNumber);
+        }
+    });
+}
+
+/**
+ * Show seat selection feedback
+ */
+function showSeatSelectionFeedback(seatNumber) {
+    // Create or update feedback message
+    let feedback = document.getElementById('seat-feedback');
+    if (!feedback) {
+        feedback = document.createElement('div');
+        feedback.id = 'seat-feedback';
+        feedback.className = 'seat-feedback';
+        feedback.style.cssText = `
+            position: fixed;
+            top: 20px;
+            right: 20px;
+            background: #10b981;
+            color: white;
+            padding: 1rem;
+            border-radius: 8px;
+            z-index: 1000;
+            animation: slideIn 0.3s ease;
+            box-shadow: 0 4px 12px rgba(0, 0, 0, 0.15);
+        `;
+        document.body.appendChild(feedback);
+    }
+    
+    feedback.textContent = `✓ Seat ${seatNumber} selected!`;
+    feedback.style.display = 'block';
+    
+    // Auto-hide after 3 seconds
+    setTimeout(() => {
+        if (feedback) {
+            feedback.style.animation = 'slideOut 0.3s ease';
+            setTimeout(() => {
+                if (feedback.parentNode) {
+                    feedback.parentNode.removeChild(feedback);
+                }
+            }, 300);
+        }
+    }, 3000);
+}
@@ -0,0 +1,374 @@
+# tracing.py - Lightweight request tracing: spans for routes, queries and template renders
+#
+# Every request gets a root span (continuing an incoming W3C traceparent
+# header when present). Connection acquisition, each query run through the
+# instrumented cursor and each render_template call become child spans. The
+# active span lives in a contextvar. The app logger's handler stamps each
+# record with the active trace_id and span_id, so log lines can be joined to
+# traces; the views and background workers report errors through that logger
+# (app_logger below, for modules without the app object).
+#
+# Finished spans are exported in the background according to TRACE_EXPORTER:
+#   none  - spans are created for log correlation only (default)
+#   file  - JSON lines appended to TRACE_FILE (traces.jsonl in the app's
+#           instance folder by default)
+#   otlp  - OTLP/HTTP JSON batches POSTed to TRACE_OTLP_ENDPOINT
+#
+# `python tracing.py collect` runs a stand-in OTLP collector that accepts
+# those batches and appends the spans to a JSON-lines file.
+
+import argparse
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from flask import before_render_template, g, request, template_rendered
+from flask.logging import default_handler
+
+from config import setting
+
+SERVICE_NAME = setting('TRACE_SERVICE_NAME', 'airplanned')
+TRACE_EXPORTER = setting('TRACE_EXPORTER', 'none')
+TRACE_FILE = setting('TRACE_FILE', '')
+TRACE_OTLP_ENDPOINT = setting('TRACE_OTLP_ENDPOINT', 'http://127.0.0.1:4318/v1/traces')
+TRACE_SAMPLE_RATE = setting('TRACE_SAMPLE_RATE', 1.0)
+
+# OTLP span kinds
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+def _new_id(bits):
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span:
+    """One timed operation within a trace"""
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'kind', 'sampled',
+                 'start_ns', 'end_ns', 'attributes', 'status', 'status_message', '_token')
+
+    def __init__(self, name, parent=None, kind=KIND_INTERNAL, attributes=None,
+                 trace_id=None, parent_id=None, sampled=None):
+        self.trace_id = parent.trace_id if parent else trace_id or _new_id(128)
+        self.parent_id = parent.span_id if parent else parent_id
+        self.sampled = parent.sampled if parent else (random.random() < TRACE_SAMPLE_RATE
+                                                       if sampled is None else sampled)
+        self.span_id = _new_id(64)
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_UNSET
+        self.status_message = ''
+        self._token = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_error(self, error):
+        self.status = STATUS_ERROR
+        self.status_message = str(error)
+        self.attributes['error.type'] = type(error).__name__
+
+    def end(self):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if self._token is not None:
+            _current_span.reset(self._token)
+            self._token = None
+        if self.sampled:
+            exporter.export(self)
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'kind': self.kind,
+            'start_ns': self.start_ns,
+            'end_ns': self.end_ns,
+            'duration_ms': round((self.end_ns - self.start_ns) / 1e6, 3),
+            'attributes': self.attributes,
+            'status': self.status,
+            'status_message': self.status_message,
+            'service': SERVICE_NAME,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.record_error(exc)
+        self.end()
+
+
+def current_span():
+    return _current_span.get()
+
+
+def start_span(name, kind=KIND_INTERNAL, attributes=None, activate=True):
+    """Start a child of the current span; with activate it becomes current until it ends"""
+    span = Span(name, parent=current_span(), kind=kind, attributes=attributes)
+    if activate:
+        span._token = _current_span.set(span)
+    return span
+
+
+def parse_traceparent(header):
+    """(trace_id, parent_id, sampled) from a W3C traceparent header, or None"""
+    parts = (header or '').strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16), int(parts[3], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(int(parts[3], 16) & 1)
+
+
+def traceparent(span):
+    return f"00-{span.trace_id}-{span.span_id}-{'01' if span.sampled else '00'}"
+
+
+# EXPORTERS
+
+def otlp_attributes(attributes):
+    converted = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            typed = {'boolValue': value}
+        elif isinstance(value, int):
+            typed = {'intValue': str(value)}
+        elif isinstance(value, float):
+            typed = {'doubleValue': value}
+        else:
+            typed = {'stringValue': str(value)}
+        converted.append({'key': key, 'value': typed})
+    return converted
+
+
+def otlp_payload(spans):
+    """OTLP/HTTP JSON request body for a batch of spans"""
+    return {'resourceSpans': [{
+        'resource': {'attributes': otlp_attributes({'service.name': SERVICE_NAME})},
+        'scopeSpans': [{
+            'scope': {'name': 'airplanned.tracing'},
+            'spans': [{
+                'traceId': span.trace_id,
+                'spanId': span.span_id,
+                'parentSpanId': span.parent_id or '',
+                'name': span.name,
+                'kind': span.kind,
+                'startTimeUnixNano': str(span.start_ns),
+                'endTimeUnixNano': str(span.end_ns),
+                'attributes': otlp_attributes(span.attributes),
+                'status': {'code': span.status, 'message': span.status_message},
+            } for span in spans],
+        }],
+    }]}
+
+
+class BatchExporter:
+    """Queues finished spans and writes them from a background thread
+
+    Requests never wait on the exporter: when the queue is full new spans
+    are dropped and counted instead.
+    """
+
+    def __init__(self, kind, max_queue=10000, batch_size=512, interval=2.0):
+        self.kind = kind
+        # Set by init_tracing once the app's instance folder is known
+        self.path = TRACE_FILE or 'traces.jsonl'
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        if self.kind == 'none':
+            return
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self.write(batch)
+            except Exception as e:
+                app_logger.warning(f"Trace export error: {e}")
+
+    def flush(self, timeout=5.0):
+        """Wait until queued spans have been handed to write()"""
+        deadline = time.monotonic() + timeout
+        while not self._queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def write(self, spans):
+        if self.kind == 'file':
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a') as f:
+                for span in spans:
+                    f.write(json.dumps(span.to_dict(), default=str) + '\n')
+        elif self.kind == 'otlp':
+            body = json.dumps(otlp_payload(spans), default=str).encode('utf-8')
+            req = urllib.request.Request(TRACE_OTLP_ENDPOINT, body, {'Content-Type': 'application/json'})
+            with urllib.request.urlopen(req, timeout=5) as response:
+                response.read()
+
+
+exporter = BatchExporter(TRACE_EXPORTER)
+
+
+# LOG CORRELATION
+
+# The logger Flask creates as app.logger (it is named after the app), for
+# modules that have no app object
+app_logger = logging.getLogger('app')
+
+
+class TraceContextFilter(logging.Filter):
+    """Adds the active span's trace_id and span_id to every record a handler emits"""
+
+    def filter(self, record):
+        span = _current_span.get()
+        record.trace_id = span.trace_id if span else '-'
+        record.span_id = span.span_id if span else '-'
+        return True
+
+
+# FLASK INTEGRATION
+
+def init_tracing(app):
+    """Root span per request plus child spans for every render_template call"""
+    exporter.path = TRACE_FILE or os.path.join(app.instance_path, 'traces.jsonl')
+    default_handler.addFilter(TraceContextFilter())
+    default_handler.setFormatter(logging.Formatter(
+        '[%(asctime)s] %(levelname)s in %(module)s [trace=%(trace_id)s span=%(span_id)s]: %(message)s'))
+
+    @app.before_request
+    def start_request_span():
+        incoming = parse_traceparent(request.headers.get('traceparent'))
+        trace_id, parent_id, sampled = incoming if incoming else (None, None, None)
+        span = Span(request.endpoint or 'unmatched', kind=KIND_SERVER, trace_id=trace_id,
+                    parent_id=parent_id, sampled=sampled, attributes={
+                        'http.method': request.method,
+                        'http.target': request.full_path.rstrip('?'),
+                        'http.route': request.url_rule.rule if request.url_rule else '',
+                    })
+        span._token = _current_span.set(span)
+        g.trace_span = span
+
+    @app.after_request
+    def tag_response(response):
+        span = g.get('trace_span')
+        if span is not None:
+            span.set_attribute('http.status_code', response.status_code)
+            if response.status_code >= 500:
+                span.status = STATUS_ERROR
+            response.headers['traceparent'] = traceparent(span)
+        return response
+
+    @app.teardown_request
+    def end_request_span(exc):
+        span = g.pop('trace_span', None)
+        if span is None:
+            return
+        if exc is not None:
+            span.record_error(exc)
+        # Clear instead of resetting the token: error paths can leave child spans open
+        span._token = None
+        span.end()
+        _current_span.set(None)
+
+    def render_started(sender, template, context, **extra):
+        g.setdefault('render_spans', []).append(
+            start_span('render_template', attributes={'template': template.name}, activate=False))
+
+    def render_finished(sender, template, context, **extra):
+        spans = g.get('render_spans')
+        if spans:
+            spans.pop().end()
+
+    before_render_template.connect(render_started, app, weak=False)
+    template_rendered.connect(render_finished, app, weak=False)
+
+
+# COLLECTOR STAND-IN
+
+class _CollectorHandler(BaseHTTPRequestHandler):
+    output = 'traces.jsonl'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            self.send_response(400)
+            self.end_headers()
+            return
+        count = 0
+        with open(self.output, 'a') as f:
+            for resource_spans in payload.get('resourceSpans', []):
+                for scope_spans in resource_spans.get('scopeSpans', []):
+                    for span in scope_spans.get('spans', []):
+                        f.write(json.dumps(span) + '\n')
+                        count += 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'{}')
+        print(f"received {count} spans")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in OTLP/HTTP JSON trace collector')
+    parser.add_argument('command', choices=['collect'])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=4318)
+    parser.add_argument('--out', default='traces.jsonl')
+    args = parser.parse_args()
+
+    _CollectorHandler.output = args.out
+    server = ThreadingHTTPServer((args.host, args.port), _CollectorHandler)
+    print(f"Collecting spans on http://{args.host}:{args.port}/v1/traces into {args.out}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()